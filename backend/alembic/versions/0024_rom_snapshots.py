@@ -0,0 +1,46 @@
+"""Add rom filesystem snapshots.
+
+Revision ID: 0024_rom_snapshots
+Revises: 0023_make_columns_non_nullable
+Create Date: 2024-07-14 10:21:37.402631
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0024_rom_snapshots"
+down_revision = "0023_make_columns_non_nullable"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rom_snapshots",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("st_size", sa.BigInteger(), nullable=False),
+        sa.Column("st_mtime_ns", sa.BigInteger(), nullable=False),
+        sa.Column("st_ino", sa.BigInteger(), nullable=False),
+        sa.Column("rom_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["rom_id"], ["roms.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("rom_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rom_snapshots")
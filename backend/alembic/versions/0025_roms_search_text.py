@@ -0,0 +1,60 @@
+"""Add full-text indexed search text to roms.
+
+Revision ID: 0025_roms_search_text
+Revises: 0024_rom_snapshots
+Create Date: 2024-07-20 18:02:11.530124
+
+"""
+
+import json
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0025_roms_search_text"
+down_revision = "0024_rom_snapshots"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _search_text(rom) -> str:
+    igdb_metadata = json.loads(rom.igdb_metadata or "{}") or {}
+    moby_metadata = json.loads(rom.moby_metadata or "{}") or {}
+    alternative_names = igdb_metadata.get(
+        "alternative_names", None
+    ) or moby_metadata.get("alternate_titles", [])
+
+    return "\n".join(filter(None, [rom.name, rom.file_name, *alternative_names]))
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("roms", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("search_text", sa.Text(), nullable=True))
+
+    connection = op.get_bind()
+    roms = connection.execute(
+        sa.text("SELECT id, name, file_name, igdb_metadata, moby_metadata FROM roms")
+    ).fetchall()
+
+    for start in range(0, len(roms), BATCH_SIZE):
+        connection.execute(
+            sa.text("UPDATE roms SET search_text = :search_text WHERE id = :id"),
+            [
+                {"id": rom.id, "search_text": _search_text(rom)}
+                for rom in roms[start : start + BATCH_SIZE]
+            ],
+        )
+
+    op.create_index(
+        "roms_search_text_idx", "roms", ["search_text"], mysql_prefix="FULLTEXT"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("roms_search_text_idx", table_name="roms")
+
+    with op.batch_alter_table("roms", schema=None) as batch_op:
+        batch_op.drop_column("search_text")
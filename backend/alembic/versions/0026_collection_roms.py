@@ -0,0 +1,99 @@
+"""Move collection roms to a join table.
+
+Revision ID: 0026_collection_roms
+Revises: 0025_roms_search_text
+Create Date: 2024-07-22 21:14:48.903317
+
+"""
+
+import json
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0026_collection_roms"
+down_revision = "0025_roms_search_text"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "collection_roms",
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("collection_id", sa.Integer(), nullable=False),
+        sa.Column("rom_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["collection_id"], ["collections.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["rom_id"], ["roms.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("collection_id", "rom_id"),
+    )
+    op.create_index(
+        "collection_roms_rom_id_collection_id_idx",
+        "collection_roms",
+        ["rom_id", "collection_id"],
+    )
+
+    connection = op.get_bind()
+    rom_ids = {
+        row.id for row in connection.execute(sa.text("SELECT id FROM roms")).all()
+    }
+    collections = connection.execute(
+        sa.text("SELECT id, roms FROM collections")
+    ).fetchall()
+
+    collection_roms = [
+        {"collection_id": collection.id, "rom_id": rom_id}
+        for collection in collections
+        # Ids of roms deleted since they were added are dropped
+        for rom_id in set(json.loads(collection.roms or "[]")) & rom_ids
+    ]
+    if collection_roms:
+        connection.execute(
+            sa.text(
+                "INSERT INTO collection_roms (collection_id, rom_id) VALUES (:collection_id, :rom_id)"
+            ),
+            collection_roms,
+        )
+
+    with op.batch_alter_table("collections", schema=None) as batch_op:
+        batch_op.drop_column("roms")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("collections", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("roms", sa.JSON(), nullable=True))
+
+    connection = op.get_bind()
+    collection_roms: dict[int, list[int]] = {}
+    for row in connection.execute(
+        sa.text("SELECT collection_id, rom_id FROM collection_roms")
+    ).all():
+        collection_roms.setdefault(row.collection_id, []).append(row.rom_id)
+
+    for collection in connection.execute(sa.text("SELECT id FROM collections")).all():
+        connection.execute(
+            sa.text("UPDATE collections SET roms = :roms WHERE id = :id"),
+            {
+                "id": collection.id,
+                "roms": json.dumps(collection_roms.get(collection.id, [])),
+            },
+        )
+
+    op.drop_index(
+        "collection_roms_rom_id_collection_id_idx", table_name="collection_roms"
+    )
+    op.drop_table("collection_roms")
@@ -0,0 +1,61 @@
+"""Add indexes for the rom and asset lookups.
+
+Revision ID: 0027_lookup_indexes
+Revises: 0026_collection_roms
+Create Date: 2024-07-25 09:47:30.118265
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0027_lookup_indexes"
+down_revision = "0026_collection_roms"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("roms_platform_id_file_name_idx", "roms", ["platform_id", "file_name"]),
+    ("roms_platform_id_igdb_id_idx", "roms", ["platform_id", "igdb_id"]),
+    ("roms_platform_id_moby_id_idx", "roms", ["platform_id", "moby_id"]),
+    ("roms_file_name_no_tags_idx", "roms", ["file_name_no_tags"]),
+    ("roms_file_name_no_ext_idx", "roms", ["file_name_no_ext"]),
+    (
+        "saves_rom_id_user_id_file_name_idx",
+        "saves",
+        ["rom_id", "user_id", "file_name"],
+    ),
+    (
+        "states_rom_id_user_id_file_name_idx",
+        "states",
+        ["rom_id", "user_id", "file_name"],
+    ),
+    (
+        "screenshots_rom_id_user_id_file_name_idx",
+        "screenshots",
+        ["rom_id", "user_id", "file_name"],
+    ),
+)
+
+
+# MariaDB drops the index it created for a foreign key once another index
+# covers the column, so it has to be restored before downgrading
+FOREIGN_KEY_INDEXES = (
+    ("roms_platform_id_idx", "roms", ["platform_id"]),
+    ("saves_rom_id_idx", "saves", ["rom_id"]),
+    ("states_rom_id_idx", "states", ["rom_id"]),
+    ("screenshots_rom_id_idx", "screenshots", ["rom_id"]),
+)
+
+
+def upgrade() -> None:
+    for index_name, table_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns)
+
+
+def downgrade() -> None:
+    for index_name, table_name, columns in FOREIGN_KEY_INDEXES:
+        op.create_index(index_name, table_name, columns)
+
+    for index_name, table_name, _columns in reversed(INDEXES):
+        op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,58 @@
+"""Add precomputed sibling roms.
+
+Revision ID: 0028_sibling_roms
+Revises: 0027_lookup_indexes
+Create Date: 2024-07-27 16:38:05.772940
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0028_sibling_roms"
+down_revision = "0027_lookup_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sibling_roms",
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("rom_id", sa.Integer(), nullable=False),
+        sa.Column("sibling_rom_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["rom_id"], ["roms.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["sibling_rom_id"], ["roms.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("rom_id", "sibling_rom_id"),
+    )
+
+    op.execute(
+        """
+        INSERT INTO sibling_roms (rom_id, sibling_rom_id)
+        SELECT r.id, s.id
+        FROM roms r
+        JOIN roms s
+            ON s.platform_id = r.platform_id
+            AND s.id != r.id
+            AND (
+                (s.igdb_id = r.igdb_id AND r.igdb_id IS NOT NULL)
+                OR (s.moby_id = r.moby_id AND r.moby_id IS NOT NULL)
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sibling_roms")
@@ -0,0 +1,27 @@
+"""Add the CRCs of the files of multi-file roms.
+
+Revision ID: 0029_rom_file_crcs
+Revises: 0028_sibling_roms
+Create Date: 2024-07-29 20:41:37.218455
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0029_rom_file_crcs"
+down_revision = "0028_sibling_roms"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by the next scan of each rom, computed on download until then
+    with op.batch_alter_table("roms", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("file_crcs", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("roms", schema=None) as batch_op:
+        batch_op.drop_column("file_crcs")
@@ -12,6 +12,12 @@ DEV_HOST: Final = "127.0.0.1"
 ROMM_HOST: Final = os.environ.get("ROMM_HOST", DEV_HOST)
 GUNICORN_WORKERS: Final = int(os.environ.get("GUNICORN_WORKERS", 2))
 
+# NGINX
+# Files are sent by nginx once the backend authorized the download
+ENABLE_NGINX_ACCEL_REDIRECT: Final = (
+    os.environ.get("ENABLE_NGINX_ACCEL_REDIRECT", "false") == "true"
+)
+
 # PATHS
 ROMM_BASE_PATH: Final = os.environ.get("ROMM_BASE_PATH", "/romm")
 LIBRARY_BASE_PATH: Final = f"{ROMM_BASE_PATH}/library"
@@ -25,6 +31,13 @@ DB_PORT: Final = int(os.environ.get("DB_PORT", 3306))
 DB_USER: Final = os.environ.get("DB_USER")
 DB_PASSWD: Final = os.environ.get("DB_PASSWD")
 DB_NAME: Final = os.environ.get("DB_NAME", "romm")
+DB_POOL_SIZE: Final = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW: Final = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE: Final = int(os.environ.get("DB_POOL_RECYCLE", 3600))  # 1 hour
+DB_POOL_TIMEOUT: Final = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_STATEMENT_TIMEOUT: Final = float(
+    os.environ.get("DB_STATEMENT_TIMEOUT", 0)  # seconds, 0 to disable
+)
 
 # REDIS
 REDIS_HOST: Final = os.environ.get("REDIS_HOST", "127.0.0.1")
@@ -40,12 +53,16 @@ IGDB_CLIENT_ID: Final = os.environ.get(
 IGDB_CLIENT_SECRET: Final = os.environ.get(
     "IGDB_CLIENT_SECRET", os.environ.get("CLIENT_SECRET", "")
 )
+IGDB_RATE_LIMIT: Final = float(os.environ.get("IGDB_RATE_LIMIT", 4))  # req/s
 
 # STEAMGRIDDB
 STEAMGRIDDB_API_KEY: Final = os.environ.get("STEAMGRIDDB_API_KEY", "")
 
 # MOBYGAMES
 MOBYGAMES_API_KEY: Final = os.environ.get("MOBYGAMES_API_KEY", "")
+MOBYGAMES_RATE_LIMIT: Final = float(
+    os.environ.get("MOBYGAMES_RATE_LIMIT", 1)  # req/s
+)
 
 # DB DRIVERS
 ROMM_DB_DRIVER: Final = os.environ.get("ROMM_DB_DRIVER", "mariadb")
@@ -60,9 +77,25 @@ DISABLE_CSRF_PROTECTION = os.environ.get("DISABLE_CSRF_PROTECTION", "false") ==
 DISABLE_DOWNLOAD_ENDPOINT_AUTH = (
     os.environ.get("DISABLE_DOWNLOAD_ENDPOINT_AUTH", "false") == "true"
 )
+USER_CACHE_TTL: Final = float(os.environ.get("USER_CACHE_TTL", 10))
+BASIC_AUTH_CACHE_TTL: Final = float(os.environ.get("BASIC_AUTH_CACHE_TTL", 300))
+USER_LAST_ACTIVE_INTERVAL: Final = float(
+    os.environ.get("USER_LAST_ACTIVE_INTERVAL", 60)
+)
 
 # SCANS
 SCAN_TIMEOUT: Final = int(os.environ.get("SCAN_TIMEOUT", 60 * 60 * 4))  # 4 hours
+SCAN_WORKERS: Final = int(os.environ.get("SCAN_WORKERS", 1))
+SCAN_IGDB_CONCURRENCY: Final = int(os.environ.get("SCAN_IGDB_CONCURRENCY", 4))
+SCAN_MOBY_CONCURRENCY: Final = int(os.environ.get("SCAN_MOBY_CONCURRENCY", 1))
+SCAN_WRITE_BATCH_SIZE: Final = int(os.environ.get("SCAN_WRITE_BATCH_SIZE", 500))
+SCAN_ARTWORK_CONCURRENCY: Final = int(os.environ.get("SCAN_ARTWORK_CONCURRENCY", 4))
+SEARCH_CACHE_TTL: Final = int(
+    os.environ.get("SEARCH_CACHE_TTL", 60 * 60 * 24 * 30)  # 30 days
+)
+SEARCH_CACHE_MISS_TTL: Final = int(
+    os.environ.get("SEARCH_CACHE_MISS_TTL", 60 * 60 * 24 * 7)  # 7 days
+)
 
 # TASKS
 ENABLE_RESCAN_ON_FILESYSTEM_CHANGE: Final = (
@@ -10,7 +10,7 @@ from exceptions.endpoint_exceptions import (
     CollectionNotFoundInDatabaseException,
     CollectionPermissionError,
 )
-from fastapi import APIRouter, Request, UploadFile
+from fastapi import APIRouter, HTTPException, Request, UploadFile, status
 from handler.database import db_collection_handler
 from handler.filesystem import fs_resource_handler
 from handler.filesystem.base_handler import CoverSize
@@ -21,6 +21,25 @@ from sqlalchemy.inspection import inspect
 router = APIRouter()
 
 
+async def _get_rom_ids(request: Request) -> list[int]:
+    """Rom ids listed in the body of a request, as {"roms": [...]}"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    rom_ids = data.get("roms") if isinstance(data, dict) else None
+    if not isinstance(rom_ids, list) or not all(
+        isinstance(rom_id, int) and not isinstance(rom_id, bool) for rom_id in rom_ids
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a list of rom ids in roms",
+        )
+
+    return rom_ids
+
+
 @protected_route(router.post, "/collections", ["collections.write"])
 async def add_collection(
     request: Request,
@@ -70,7 +89,7 @@ async def add_collection(
         with open(file_location_l, "wb+") as artwork_l:
             artwork_l.write(artwork_file)
     else:
-        path_cover_s, path_cover_l = fs_resource_handler.get_cover(
+        path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
             overwrite=True,
             entity=_added_collection,
             url_cover=_added_collection.url_cover,
@@ -159,7 +178,6 @@ async def update_collection(
     cleaned_data = {
         "name": data.get("name", collection.name),
         "description": data.get("description", collection.description),
-        "roms": list(set(roms)),
         "is_public": data.get("is_public", collection.is_public),
         "user_id": request.user.id,
     }
@@ -198,7 +216,7 @@ async def update_collection(
                 cleaned_data.update(
                     {"url_cover": data.get("url_cover", collection.url_cover)}
                 )
-                path_cover_s, path_cover_l = fs_resource_handler.get_cover(
+                path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
                     overwrite=True,
                     entity=collection,
                     url_cover=data.get("url_cover", ""),
@@ -207,7 +225,61 @@ async def update_collection(
                     {"path_cover_s": path_cover_s, "path_cover_l": path_cover_l}
                 )
 
-    return db_collection_handler.update_collection(id, cleaned_data)
+    return db_collection_handler.update_collection(
+        id, cleaned_data, rom_ids=list(set(roms))
+    )
+
+
+@protected_route(router.post, "/collections/{id}/roms", ["collections.write"])
+async def add_collection_roms(request: Request, id: int) -> CollectionSchema:
+    """Add roms to collection endpoint
+
+    Args:
+        request (Request): Fastapi Request object
+        {
+            "roms": List of rom's ids to add
+        }
+
+    Returns:
+        CollectionSchema: Updated collection
+    """
+
+    rom_ids = await _get_rom_ids(request)
+    collection = db_collection_handler.get_collection(id)
+
+    if not collection:
+        raise CollectionNotFoundInDatabaseException(id)
+
+    if collection.user_id != request.user.id:
+        raise CollectionPermissionError(id)
+
+    return db_collection_handler.add_collection_roms(id, rom_ids)
+
+
+@protected_route(router.post, "/collections/{id}/roms/delete", ["collections.write"])
+async def remove_collection_roms(request: Request, id: int) -> CollectionSchema:
+    """Remove roms from collection endpoint
+
+    Args:
+        request (Request): Fastapi Request object
+        {
+            "roms": List of rom's ids to remove
+        }
+
+    Returns:
+        CollectionSchema: Updated collection
+    """
+
+    rom_ids = await _get_rom_ids(request)
+    collection = db_collection_handler.get_collection(id)
+
+    if not collection:
+        raise CollectionNotFoundInDatabaseException(id)
+
+    if collection.user_id != request.user.id:
+        raise CollectionPermissionError(id)
+
+    return db_collection_handler.remove_collection_roms(id, rom_ids)
 
 
 @protected_route(router.delete, "/collections/{id}", ["collections.write"])
@@ -1,9 +1,9 @@
 from config import DISABLE_DOWNLOAD_ENDPOINT_AUTH, LIBRARY_BASE_PATH
 from decorators.auth import protected_route
 from endpoints.responses import MessageResponse
+from endpoints.responses.content import file_content_response
 from endpoints.responses.firmware import AddFirmwareResponse, FirmwareSchema
 from fastapi import APIRouter, File, HTTPException, Request, UploadFile, status
-from fastapi.responses import FileResponse
 from handler.database import db_firmware_handler, db_platform_handler
 from handler.filesystem import fs_firmware_handler
 from handler.scan_handler import scan_firmware
@@ -123,19 +123,13 @@ def head_firmware_content(request: Request, id: int, file_name: str):
         file_name (str): Required due to a bug in emulatorjs
 
     Returns:
-        FileResponse: Returns the response with headers
+        Response: Returns the response with headers
     """
 
     firmware = db_firmware_handler.get_firmware(id)
     firmware_path = f"{LIBRARY_BASE_PATH}/{firmware.full_path}"
 
-    return FileResponse(
-        path=firmware_path,
-        filename=file_name,
-        headers={
-            "Content-Length": str(firmware.file_size_bytes),
-        },
-    )
+    return file_content_response(path=firmware_path, filename=firmware.file_name)
 
 
 @protected_route(router.get, "/firmware/{id}/content/{file_name}", ["firmware.read"])
@@ -152,13 +146,13 @@ def get_firmware_content(
         file_name (str): Required due to a bug in emulatorjs
 
     Returns:
-        FileResponse: Returns the firmware file
+        Response: Returns the firmware file, or the requested range of it
     """
 
     firmware = db_firmware_handler.get_firmware(id)
     firmware_path = f"{LIBRARY_BASE_PATH}/{firmware.full_path}"
 
-    return FileResponse(path=firmware_path, filename=firmware.file_name)
+    return file_content_response(path=firmware_path, filename=firmware.file_name)
 
 
 @protected_route(router.post, "/firmware/delete", ["firmware.write"])
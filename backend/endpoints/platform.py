@@ -33,7 +33,7 @@ async def add_platforms(request: Request) -> PlatformSchema:
         fs_platform_handler.add_platforms(fs_slug=fs_slug)
     except PlatformAlreadyExistsException:
         log.info(f"Detected platform: {fs_slug}")
-    scanned_platform = scan_platform(fs_slug, [fs_slug])
+    scanned_platform = await scan_platform(fs_slug, [fs_slug])
     return db_platform_handler.add_platform(scanned_platform)
 
 
@@ -1,5 +1,6 @@
-from config import ASSETS_BASE_PATH
+from config import ASSETS_BASE_PATH, ENABLE_NGINX_ACCEL_REDIRECT
 from decorators.auth import protected_route
+from endpoints.responses.content import AccelRedirectResponse
 from fastapi import APIRouter, Request
 from fastapi.responses import FileResponse
 
@@ -9,6 +10,9 @@ router = APIRouter()
 @protected_route(router.head, "/raw/assets/{path:path}", ["assets.read"])
 def head_raw_asset(request: Request, path: str):
     asset_path = f"{ASSETS_BASE_PATH}/{path}"
+    if ENABLE_NGINX_ACCEL_REDIRECT:
+        return AccelRedirectResponse(asset_path, filename=path.split("/")[-1])
+
     return FileResponse(path=asset_path, filename=path.split("/")[-1])
 
 
@@ -20,8 +24,11 @@ def get_raw_asset(request: Request, path: str):
         request (Request): Fastapi Request object
 
     Returns:
-        FileResponse: Returns a single asset file
+        FileResponse: Returns a single asset file, or hands it over to nginx
     """
 
     asset_path = f"{ASSETS_BASE_PATH}/{path}"
+    if ENABLE_NGINX_ACCEL_REDIRECT:
+        return AccelRedirectResponse(asset_path, filename=path.split("/")[-1])
+
     return FileResponse(path=asset_path, filename=path.split("/")[-1])
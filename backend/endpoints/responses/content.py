@@ -0,0 +1,299 @@
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from typing import Final
+from urllib.parse import quote
+
+import anyio
+from config import ASSETS_BASE_PATH, ENABLE_NGINX_ACCEL_REDIRECT, LIBRARY_BASE_PATH
+from fastapi import HTTPException, status
+from handler.socket_handler import socket_handler
+from starlette.concurrency import iterate_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from utils.filesystem import FileRange, iter_file_range
+from utils.zip import StoredZip
+
+# Internal nginx locations serving each base path, see docker/nginx/default.conf
+INTERNAL_LOCATIONS: Final = (
+    (LIBRARY_BASE_PATH, "/_internal/library/"),
+    (ASSETS_BASE_PATH, "/_internal/assets/"),
+)
+
+
+def _content_disposition(filename: str) -> str:
+    content_disposition_filename = quote(filename)
+    if content_disposition_filename != filename:
+        return f"attachment; filename*=utf-8''{content_disposition_filename}"
+
+    return f'attachment; filename="{filename}"'
+
+
+def _parse_http_date(value: str | None) -> int | None:
+    if not value:
+        return None
+
+    try:
+        return int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class ContentResponse(Response, ABC):
+    """Download of content which size is known before it's sent
+
+    Answers conditional requests (If-None-Match, If-Modified-Since) with a 304,
+    and single byte ranges (Range, If-Range) with a 206, so interrupted
+    downloads can be resumed. Requests for several ranges get the full content.
+
+    File contents are handed to the server to be sent with sendfile when it
+    supports the zero-copy send extension, and read in chunks otherwise.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        mtime: float,
+        etag: str,
+        filename: str,
+        media_type: str = "application/octet-stream",
+        emit_body: dict | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.size = size
+        self.mtime = int(mtime)
+        self.etag = etag
+        self.status_code = 200
+        self.media_type = media_type
+        self.background = None
+        self.emit_body = emit_body
+        self.init_headers(headers)
+
+        self.headers.setdefault("content-disposition", _content_disposition(filename))
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("etag", etag)
+        self.headers.setdefault("last-modified", formatdate(self.mtime, usegmt=True))
+
+    @abstractmethod
+    def iter_parts(self, start: int, stop: int) -> Iterator[bytes | FileRange]:
+        pass
+
+    def _not_modified(self, headers: Headers) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            etags = [
+                etag.strip().removeprefix("W/") for etag in if_none_match.split(",")
+            ]
+            return "*" in etags or self.etag in etags
+
+        if_modified_since = _parse_http_date(headers.get("if-modified-since"))
+        return if_modified_since is not None and self.mtime <= if_modified_since
+
+    def _range(self, headers: Headers) -> tuple[int, int] | None:
+        range_header = headers.get("range")
+        if not range_header:
+            return None
+
+        # The range only applies to the representation the client already has
+        if_range = headers.get("if-range")
+        if (
+            if_range
+            and if_range != self.etag
+            and _parse_http_date(if_range) != self.mtime
+        ):
+            return None
+
+        unit, _, byte_range = range_header.partition("=")
+        if unit.strip().lower() != "bytes" or "," in byte_range:
+            return None
+
+        first, sep, last = byte_range.strip().partition("-")
+        try:
+            if not sep or not (first or last):
+                return None
+            if first:
+                start = int(first)
+                stop = int(last) + 1 if last else self.size
+                if stop <= start:
+                    return None
+            else:
+                start = max(self.size - int(last), 0)
+                stop = self.size
+                if int(last) == 0:
+                    raise RangeNotSatisfiable
+        except ValueError:
+            return None
+
+        if start >= self.size:
+            raise RangeNotSatisfiable
+
+        return start, min(stop, self.size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_headers = Headers(scope=scope)
+        send_body = scope["method"].upper() != "HEAD"
+        start, stop = 0, self.size
+
+        if self._not_modified(request_headers):
+            self.status_code = 304
+            send_body = False
+            for header in ("content-disposition", "content-type", "accept-ranges"):
+                del self.headers[header]
+        else:
+            try:
+                byte_range = self._range(request_headers)
+            except RangeNotSatisfiable:
+                byte_range = None
+                self.status_code = 416
+                send_body = False
+                self.headers["content-range"] = f"bytes */{self.size}"
+                self.headers["content-length"] = "0"
+
+            if byte_range:
+                start, stop = byte_range
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{stop - 1}/{self.size}"
+
+            if self.status_code != 416:
+                self.headers["content-length"] = str(stop - start)
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+
+        if not send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        # Stops reading the file as soon as the client goes away
+        async with anyio.create_task_group() as task_group:
+
+            async def wrap(func) -> None:
+                await func()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(
+                wrap, partial(self._stream, scope, send, start, stop)
+            )
+            await wrap(partial(self._listen_for_disconnect, receive))
+
+    async def _listen_for_disconnect(self, receive: Receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+
+    async def _stream(self, scope: Scope, send: Send, start: int, stop: int) -> None:
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+
+        async for part in iterate_in_threadpool(self.iter_parts(start, stop)):
+            if not isinstance(part, FileRange):
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+            elif zerocopy:
+                async with await anyio.open_file(part.path, "rb") as f:
+                    await send(
+                        {
+                            "type": "http.response.zerocopysend",
+                            "file": f.wrapped,
+                            "offset": part.start,
+                            "count": part.stop - part.start,
+                            "more_body": True,
+                        }
+                    )
+            else:
+                async for chunk in iterate_in_threadpool(iter_file_range(*part)):
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        # Resumed downloads complete with the range reaching the end
+        if self.emit_body is not None and stop == self.size:
+            await socket_handler.socket_server.emit("download:complete", self.emit_body)
+
+
+class FileContentResponse(ContentResponse):
+    def __init__(self, path: str, filename: str, **kwargs) -> None:
+        stat = os.stat(path)
+        self.path = path
+        super().__init__(
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            etag=f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            filename=filename,
+            **kwargs,
+        )
+
+    def iter_parts(self, start: int, stop: int) -> Iterator[bytes | FileRange]:
+        yield FileRange(self.path, start, stop)
+
+
+class ZipContentResponse(ContentResponse):
+    def __init__(self, stored_zip: StoredZip, filename: str, **kwargs) -> None:
+        self.stored_zip = stored_zip
+        super().__init__(
+            size=stored_zip.size,
+            mtime=stored_zip.mtime,
+            etag=stored_zip.etag,
+            filename=filename,
+            media_type="application/zip",
+            **kwargs,
+        )
+
+    def iter_parts(self, start: int, stop: int) -> Iterator[bytes | FileRange]:
+        return self.stored_zip.iter_parts(start, stop)
+
+
+class AccelRedirectResponse(Response):
+    """Hands a file over to nginx, which sends it along with its ranges
+
+    The download:complete event is emitted once nginx takes over the download,
+    as the backend isn't told when it ends.
+    """
+
+    def __init__(
+        self, path: str, filename: str, emit_body: dict | None = None
+    ) -> None:
+        path = os.path.normpath(path)
+        for base_path, location in INTERNAL_LOCATIONS:
+            relative_path = os.path.relpath(path, os.path.normpath(base_path))
+            if relative_path.split(os.sep)[0] != os.pardir:
+                break
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
+            )
+
+        super().__init__(
+            headers={
+                "X-Accel-Redirect": location + quote(relative_path),
+                "Content-Disposition": _content_disposition(filename),
+            }
+        )
+        self.emit_body = emit_body
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await super().__call__(scope, receive, send)
+
+        if self.emit_body is not None:
+            await socket_handler.socket_server.emit("download:complete", self.emit_body)
+
+
+def file_content_response(
+    path: str, filename: str, emit_body: dict | None = None
+) -> Response:
+    if ENABLE_NGINX_ACCEL_REDIRECT:
+        return AccelRedirectResponse(path, filename, emit_body=emit_body)
+
+    return FileContentResponse(path, filename, emit_body=emit_body)
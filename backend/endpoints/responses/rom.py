@@ -7,10 +7,8 @@ from typing import NotRequired, get_type_hints
 from endpoints.responses.assets import SaveSchema, ScreenshotSchema, StateSchema
 from endpoints.responses.collection import CollectionSchema
 from fastapi import Request
-from fastapi.responses import StreamingResponse
 from handler.metadata.igdb_handler import IGDBMetadata
 from handler.metadata.moby_handler import MobyMetadata
-from handler.socket_handler import socket_handler
 from models.rom import Rom
 from pydantic import BaseModel, Field, computed_field
 from typing_extensions import TypedDict
@@ -140,6 +138,63 @@ class RomSchema(BaseModel):
         )
 
 
+class CompactRomSchema(BaseModel):
+    """Subset of RomSchema used to list roms, without summary and metadata"""
+
+    id: int
+    igdb_id: int | None
+    sgdb_id: int | None
+    moby_id: int | None
+
+    platform_id: int
+    platform_slug: str
+    platform_name: str
+
+    file_name: str
+    file_name_no_tags: str
+    file_name_no_ext: str
+    file_extension: str
+    file_size_bytes: int
+
+    name: str | None
+    slug: str | None
+
+    path_cover_s: str | None
+    path_cover_l: str | None
+    has_cover: bool
+
+    revision: str | None
+    regions: list[str]
+    languages: list[str]
+    tags: list[str]
+
+    multi: bool
+
+    rom_user: RomUserSchema | None = Field(default=None)
+
+    class Config:
+        from_attributes = True
+
+    @classmethod
+    def from_orm_with_request(cls, db_rom: Rom, request: Request) -> CompactRomSchema:
+        rom = cls.model_validate(db_rom)
+        rom.rom_user = RomUserSchema.for_user(db_rom, request.user.id)
+
+        return rom
+
+    @computed_field  # type: ignore
+    @property
+    def sort_comparator(self) -> str:
+        return (
+            SORT_COMPARE_REGEX.sub(
+                "",
+                self.name or self.file_name_no_tags,
+            )
+            .strip()
+            .lower()
+        )
+
+
 class DetailedRomSchema(RomSchema):
     merged_screenshots: list[str]
     rom_user: RomUserSchema | None = Field(default=None)
@@ -187,13 +242,3 @@ class UserNotesSchema(TypedDict):
 class AddRomsResponse(TypedDict):
     uploaded_roms: list[str]
     skipped_roms: list[str]
-
-
-class CustomStreamingResponse(StreamingResponse):
-    def __init__(self, *args, **kwargs) -> None:
-        self.emit_body = kwargs.pop("emit_body", None)
-        super().__init__(*args, **kwargs)
-
-    async def stream_response(self, *args, **kwargs) -> None:
-        await super().stream_response(*args, **kwargs)
-        await socket_handler.socket_server.emit("download:complete", self.emit_body)
@@ -1,11 +1,14 @@
+import asyncio
+import base64
+import binascii
+import fcntl
+import hashlib
+import json
 import os
-from collections.abc import Iterator
-from datetime import datetime
-from shutil import rmtree
-from stat import S_IFREG
-from typing import Annotated
-from urllib.parse import quote
+from shutil import copyfileobj, rmtree
+from typing import Annotated, Final
 
+import anyio
 from config import (
     DISABLE_DOWNLOAD_ENDPOINT_AUTH,
     LIBRARY_BASE_PATH,
@@ -13,26 +16,57 @@ from config import (
 )
 from decorators.auth import protected_route
 from endpoints.responses import MessageResponse
+from endpoints.responses.content import ZipContentResponse, file_content_response
 from endpoints.responses.rom import (
     AddRomsResponse,
-    CustomStreamingResponse,
+    CompactRomSchema,
     DetailedRomSchema,
     RomSchema,
     RomUserSchema,
 )
 from exceptions.endpoint_exceptions import RomNotFoundInDatabaseException
 from exceptions.fs_exceptions import RomAlreadyExistsException
-from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile, status
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
 from handler.database import db_platform_handler, db_rom_handler
 from handler.filesystem import fs_resource_handler, fs_rom_handler
 from handler.filesystem.base_handler import CoverSize
 from handler.metadata import meta_igdb_handler, meta_moby_handler
 from logger.logger import log
-from stream_zip import ZIP_AUTO, stream_zip  # type: ignore[import]
+from models.rom import Rom
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from utils.zip import StoredZip, ZipMember
 
 router = APIRouter()
 
+MAX_PAGE_SIZE: Final = 500
+UPLOAD_BUFFER_SIZE: Final = 8 * 1024 * 1024
+UPLOAD_CHECKSUM_ALGORITHMS: Final = ("md5", "sha1", "sha256")
+
+
+def _encode_cursor(keyset: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(keyset).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        sort_value, rom_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+    return sort_value, rom_id
+
 
 @protected_route(router.post, "/roms", ["roms.write"])
 def add_roms(
@@ -78,11 +112,7 @@ def add_roms(
         file_location = f"{roms_path}/{rom.filename}"
 
         with open(file_location, "wb+") as f:
-            while True:
-                chunk = rom.file.read(1024)
-                if not chunk:
-                    break
-                f.write(chunk)
+            copyfileobj(rom.file, f, UPLOAD_BUFFER_SIZE)
 
         uploaded_roms.append(rom.filename)
 
@@ -92,26 +122,311 @@ def add_roms(
     }
 
 
+def _upload_paths(platform_id: int, file_name: str) -> tuple[str, str, str]:
+    """Paths of the uploaded file, of its partial file and of its declared length"""
+    if file_name in (".", "..") or os.path.basename(file_name) != file_name:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file name"
+        )
+
+    platform = db_platform_handler.get_platform(platform_id)
+    if not platform:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Platform with id {platform_id} not found",
+        )
+
+    roms_path = fs_rom_handler.build_upload_file_path(platform.fs_slug)
+    file_path = f"{roms_path}/{file_name}"
+    if os.path.exists(file_path):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{file_name} already exists",
+        )
+
+    return (
+        file_path,
+        fs_rom_handler.build_upload_part_path(roms_path, file_name),
+        fs_rom_handler.build_upload_length_path(roms_path, file_name),
+    )
+
+
+def _upload_header(request: Request, header: str) -> int:
+    try:
+        value = int(request.headers[header])
+    except (KeyError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing or invalid {header} header",
+        ) from exc
+
+    if value < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {header} header"
+        )
+
+    return value
+
+
+def _lock_part_file(f) -> None:
+    """Lock a partial upload file, raising BlockingIOError if it's already locked
+
+    The lock is held by the open file, so it's released once the file is closed.
+    """
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _file_digest(path: str, algorithm: str) -> bytes:
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.digest()
+
+
+@protected_route(router.head, "/roms/upload/{platform_id}/{file_name}", ["roms.write"])
+def head_rom_upload(request: Request, platform_id: int, file_name: str) -> Response:
+    """Resumable rom upload status endpoint
+
+    Args:
+        request (Request): Fastapi Request object
+        platform_id (int): Id of the platform where the rom is uploaded
+        file_name (str): Name of the uploaded file
+
+    Raises:
+        HTTPException: The file already exists
+
+    Returns:
+        Response: Upload-Offset header with the number of bytes already received,
+            and Upload-Length header with the declared length of the file, if any
+    """
+
+    _, part_path, length_path = _upload_paths(platform_id, file_name)
+
+    headers = {
+        "Upload-Offset": str(fs_rom_handler.get_upload_offset(part_path)),
+        "Cache-Control": "no-store",
+    }
+    upload_length = fs_rom_handler.get_upload_length(length_path)
+    if upload_length is not None:
+        headers["Upload-Length"] = str(upload_length)
+
+    return Response(headers=headers)
+
+
+@protected_route(
+    router.patch, "/roms/upload/{platform_id}/{file_name}", ["roms.write"]
+)
+async def upload_rom(request: Request, platform_id: int, file_name: str) -> Response:
+    """Resumable rom upload endpoint, receiving the file in one or more chunks
+
+    The body of each request is written straight to a partial file next to the
+    final one, which is renamed once Upload-Length bytes were received. The
+    Upload-Length of the first request is stored, the following ones must send
+    the same. An interrupted upload is resumed from the Upload-Offset of the
+    status endpoint.
+
+    Args:
+        request (Request): Fastapi Request object, with the Upload-Offset of the
+            chunk and the Upload-Length of the file as headers, and optionally an
+            Upload-Checksum of the whole file ("<algorithm> <base64 digest>")
+        platform_id (int): Id of the platform where the rom is uploaded
+        file_name (str): Name of the uploaded file
+
+    Raises:
+        HTTPException: The offset or length doesn't match the upload, another
+            request is uploading the file, the file is larger than announced or
+            its checksum doesn't match
+
+    Returns:
+        Response: Upload-Offset header with the number of bytes received
+    """
+
+    file_path, part_path, length_path = await run_in_threadpool(
+        _upload_paths, platform_id, file_name
+    )
+    upload_offset = _upload_header(request, "Upload-Offset")
+    upload_length = _upload_header(request, "Upload-Length")
+
+    async with await anyio.open_file(part_path, "ab") as f:
+        # A single request appends to the partial file at a time, a retry
+        # would otherwise write the same bytes as a request still running
+        try:
+            _lock_part_file(f.wrapped)
+        except BlockingIOError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_423_LOCKED,
+                detail=f"Upload of {file_name} is already in progress",
+            ) from exc
+
+        offset = os.fstat(f.wrapped.fileno()).st_size
+        if upload_offset != offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload offset is {offset}",
+                headers={"Upload-Offset": str(offset)},
+            )
+
+        # The length can't change once the upload started, so the file is only
+        # renamed once it has the length first declared
+        stored_length = fs_rom_handler.get_upload_length(length_path)
+        if stored_length is None or offset == 0:
+            fs_rom_handler.set_upload_length(length_path, upload_length)
+        elif upload_length != stored_length:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload length is {stored_length}",
+                headers={"Upload-Length": str(stored_length)},
+            )
+
+        # Chunks from the server are small, they are written to disk in large blocks
+        buffer = bytearray()
+        try:
+            async for chunk in request.stream():
+                buffer += chunk
+                if offset + len(buffer) > upload_length:
+                    del buffer[upload_length - offset :]
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail="Upload is larger than its Upload-Length",
+                    )
+
+                if len(buffer) >= UPLOAD_BUFFER_SIZE:
+                    await f.write(buffer)
+                    offset += len(buffer)
+                    buffer.clear()
+        except ClientDisconnect:
+            log.warning(f"Upload of {file_name} interrupted at {offset + len(buffer)}")
+        finally:
+            await f.write(buffer)
+            await f.flush()
+            offset += len(buffer)
+
+        if offset < upload_length:
+            return Response(
+                status_code=status.HTTP_204_NO_CONTENT,
+                headers={"Upload-Offset": str(offset)},
+            )
+
+        # Still locked, so the complete file is the one being renamed
+        upload_checksum = request.headers.get("Upload-Checksum")
+        if upload_checksum:
+            algorithm, _, checksum = upload_checksum.partition(" ")
+            if algorithm not in UPLOAD_CHECKSUM_ALGORITHMS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unsupported checksum algorithm {algorithm}",
+                )
+
+            digest = await asyncio.to_thread(_file_digest, part_path, algorithm)
+            if base64.b64encode(digest).decode() != checksum.strip():
+                fs_rom_handler.remove_upload_files(part_path, length_path)
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Checksum mismatch",
+                )
+
+        os.rename(part_path, file_path)
+        fs_rom_handler.remove_upload_files(length_path)
+
+    log.info(f"Uploaded {file_name} ({upload_length} bytes)")
+
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        headers={"Upload-Offset": str(offset)},
+    )
+
+
+@protected_route(
+    router.delete, "/roms/upload/{platform_id}/{file_name}", ["roms.write"]
+)
+def cancel_rom_upload(
+    request: Request, platform_id: int, file_name: str
+) -> MessageResponse:
+    """Cancel a resumable rom upload, removing the bytes received so far
+
+    Args:
+        request (Request): Fastapi Request object
+        platform_id (int): Id of the platform where the rom is uploaded
+        file_name (str): Name of the uploaded file
+
+    Returns:
+        MessageResponse: Standard message response
+    """
+
+    _, part_path, length_path = _upload_paths(platform_id, file_name)
+    try:
+        with open(part_path, "rb") as f:
+            _lock_part_file(f)
+            fs_rom_handler.remove_upload_files(part_path, length_path)
+    except FileNotFoundError:
+        fs_rom_handler.remove_upload_files(length_path)
+    except BlockingIOError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_423_LOCKED,
+            detail=f"Upload of {file_name} is in progress",
+        ) from exc
+
+    return {"msg": f"Upload of {file_name} cancelled"}
+
+
 @protected_route(router.get, "/roms", ["roms.read"])
 def get_roms(
     request: Request,
+    response: Response,
     platform_id: int | None = None,
     collection_id: int | None = None,
     search_term: str = "",
     limit: int | None = None,
     order_by: str = "name",
     order_dir: str = "asc",
-) -> list[RomSchema]:
+    page_size: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: str | None = None,
+    view: str = "full",
+) -> list[RomSchema | CompactRomSchema]:
     """Get roms endpoint
 
+    Pagination is enabled by passing page_size and/or cursor. The total number of
+    roms is returned in the X-Total-Count header, and the cursor of the next page
+    in the X-Next-Cursor header.
+
     Args:
         request (Request): Fastapi Request object
-        id (int, optional): Rom internal id
+        page_size (int, optional): Max number of roms in the page
+        cursor (str, optional): Cursor returned with the previous page
+        view (str, optional): "compact" to skip the summary and metadata fields
 
     Returns:
-        list[RomSchema]: List of roms stored in the database
+        list[RomSchema | CompactRomSchema]: List of roms stored in the database
     """
 
+    compact = view.lower() == "compact"
+    schema = CompactRomSchema if compact else RomSchema
+
+    if page_size or cursor:
+        roms, next_keyset = db_rom_handler.get_roms_page(
+            platform_id=platform_id,
+            collection_id=collection_id,
+            search_term=search_term.lower(),
+            order_by=order_by.lower(),
+            order_dir=order_dir.lower(),
+            page_size=page_size or MAX_PAGE_SIZE,
+            keyset=_decode_cursor(cursor) if cursor else None,
+            compact=compact,
+        )
+
+        response.headers["X-Total-Count"] = str(
+            db_rom_handler.count_roms(
+                platform_id=platform_id,
+                collection_id=collection_id,
+                search_term=search_term.lower(),
+            )
+        )
+        if next_keyset:
+            response.headers["X-Next-Cursor"] = _encode_cursor(next_keyset)
+
+        return [schema.from_orm_with_request(rom, request) for rom in roms]
+
     roms = db_rom_handler.get_roms(
         platform_id=platform_id,
         collection_id=collection_id,
@@ -119,9 +434,10 @@ def get_roms(
         order_by=order_by.lower(),
         order_dir=order_dir.lower(),
         limit=limit,
+        compact=compact,
     )
 
-    return [RomSchema.from_orm_with_request(rom, request) for rom in roms]
+    return [schema.from_orm_with_request(rom, request) for rom in roms]
 
 
 @protected_route(
@@ -148,21 +464,69 @@ def get_rom(request: Request, id: int) -> DetailedRomSchema:
     return DetailedRomSchema.from_orm_with_request(rom, request)
 
 
+def _rom_content_response(
+    rom: Rom, file_name: str, files: list[str] | None
+) -> Response:
+    rom_path = f"{LIBRARY_BASE_PATH}/{rom.full_path}"
+    files_to_download = files or rom.files or []
+
+    if not rom.multi:
+        return file_content_response(
+            path=rom_path, filename=rom.file_name, emit_body={"id": rom.id}
+        )
+
+    if len(files_to_download) == 1:
+        return file_content_response(
+            path=f"{rom_path}/{files_to_download[0]}",
+            filename=files_to_download[0],
+            emit_body={"id": rom.id},
+        )
+
+    # Zips are built on the fly, so they can't be sent by nginx
+
+    try:
+        file_crcs = rom.file_crcs or {}
+        members = [
+            ZipMember.from_path(f, f"{rom_path}/{f}", file_crcs.get(f))
+            for f in files_to_download
+        ]
+    except FileNotFoundError as exc:
+        log.error(f"File {exc.filename} not found!")
+        raise
+
+    m3u_file = "".join(f"{f}\n" for f in files_to_download).encode()
+    members.append(
+        ZipMember.from_bytes(
+            f"{file_name}.m3u", m3u_file, mtime=max(m.mtime for m in members)
+        )
+    )
+
+    return ZipContentResponse(
+        StoredZip(members), filename=f"{file_name}.zip", emit_body={"id": rom.id}
+    )
+
+
 @protected_route(
     router.head,
     "/roms/{id}/content/{file_name}",
     [] if DISABLE_DOWNLOAD_ENDPOINT_AUTH else ["roms.read"],
 )
-def head_rom_content(request: Request, id: int, file_name: str):
+def head_rom_content(
+    request: Request,
+    id: int,
+    file_name: str,
+    files: Annotated[list[str] | None, Query()] = None,
+):
     """Head rom content endpoint
 
     Args:
         request (Request): Fastapi Request object
         id (int): Rom internal id
         file_name (str): Required due to a bug in emulatorjs
+        files (Annotated[list[str]  |  None, Query, optional): List of files to download for multi-part roms. Defaults to None.
 
     Returns:
-        FileResponse: Returns the response with headers
+        Response: Returns the headers of the matching download
     """
 
     rom = db_rom_handler.get_rom(id)
@@ -170,17 +534,7 @@ def head_rom_content(request: Request, id: int, file_name: str):
     if not rom:
         raise RomNotFoundInDatabaseException(id)
 
-    rom_path = f"{LIBRARY_BASE_PATH}/{rom.full_path}"
-
-    return FileResponse(
-        path=rom_path if not rom.multi else f"{rom_path}/{rom.files[0]}",
-        filename=file_name,
-        headers={
-            "Content-Disposition": f'attachment; filename="{quote(rom.name)}.zip"',
-            "Content-Type": "application/zip",
-            "Content-Length": str(rom.file_size_bytes),
-        },
-    )
+    return _rom_content_response(rom, file_name, files)
 
 
 @protected_route(router.get, "/roms/{id}/content/{file_name}", ["roms.read"])
@@ -192,16 +546,20 @@ def get_rom_content(
 ):
     """Download rom endpoint (one single file or multiple zipped files for multi-part roms)
 
+    Byte ranges are supported in both cases, multi-part roms being zipped
+    uncompressed with a layout that only depends on their files. Single files
+    are sent by nginx when ENABLE_NGINX_ACCEL_REDIRECT is set.
+
     Args:
         request (Request): Fastapi Request object
         id (int): Rom internal id
         files (Annotated[list[str]  |  None, Query, optional): List of files to download for multi-part roms. Defaults to None.
 
     Returns:
-        FileResponse: Returns one file for single file roms
+        Response: Returns one file for single file roms
 
     Yields:
-        CustomStreamingResponse: Streams a file for multi-part roms
+        ZipContentResponse: Streams a zip file for multi-part roms
     """
 
     rom = db_rom_handler.get_rom(id)
@@ -209,61 +567,7 @@ def get_rom_content(
     if not rom:
         raise RomNotFoundInDatabaseException(id)
 
-    rom_path = f"{LIBRARY_BASE_PATH}/{rom.full_path}"
-    files_to_download = files or rom.files or []
-
-    if not rom.multi:
-        return FileResponse(path=rom_path, filename=rom.file_name)
-
-    if len(files_to_download) == 1:
-        return FileResponse(
-            path=f"{rom_path}/{files_to_download[0]}", filename=files_to_download[0]
-        )
-
-    # Builds a generator of tuples for each member file
-    def local_files():
-        def contents(filename: str) -> Iterator[bytes]:
-            try:
-                with open(f"{rom_path}/{filename}", "rb") as f:
-                    while chunk := f.read(65536):
-                        yield chunk
-            except FileNotFoundError:
-                log.error(f"File {rom_path}/{filename} not found!")
-                raise
-
-        m3u_file = [str.encode(f"{file}\n") for file in files_to_download]
-        now = datetime.now()
-
-        return [
-            (
-                f,
-                now,
-                S_IFREG | 0o600,
-                ZIP_AUTO(os.path.getsize(f"{rom_path}/{f}"), level=0),
-                contents(f),
-            )
-            for f in files_to_download
-        ] + [
-            (
-                f"{file_name}.m3u",
-                now,
-                S_IFREG | 0o600,
-                ZIP_AUTO(sum([len(f) for f in m3u_file]), level=0),
-                m3u_file,
-            )
-        ]
-
-    zipped_chunks = stream_zip(local_files())
-
-    # Streams the zip file to the client
-    return CustomStreamingResponse(
-        zipped_chunks,
-        media_type="application/zip",
-        headers={
-            "Content-Disposition": f'attachment; filename="{quote(file_name)}.zip"'
-        },
-        emit_body={"id": rom.id},
-    )
+    return _rom_content_response(rom, file_name, files)
 
 
 @protected_route(router.put, "/roms/{id}", ["roms.write"])
@@ -305,9 +609,9 @@ async def update_rom(
         cleaned_data.get("moby_id", "")
         and int(cleaned_data.get("moby_id", "")) != rom.moby_id
     ):
-        moby_rom = meta_moby_handler.get_rom_by_id(cleaned_data["moby_id"])
+        moby_rom = await meta_moby_handler.get_rom_by_id(cleaned_data["moby_id"])
         cleaned_data.update(moby_rom)
-        path_screenshots = fs_resource_handler.get_rom_screenshots(
+        path_screenshots = await fs_resource_handler.get_rom_screenshots(
             rom=rom,
             url_screenshots=cleaned_data.get("url_screenshots", []),
         )
@@ -317,9 +621,9 @@ async def update_rom(
         cleaned_data.get("igdb_id", "")
         and int(cleaned_data.get("igdb_id", "")) != rom.igdb_id
     ):
-        igdb_rom = meta_igdb_handler.get_rom_by_id(cleaned_data["igdb_id"])
+        igdb_rom = await meta_igdb_handler.get_rom_by_id(cleaned_data["igdb_id"])
         cleaned_data.update(igdb_rom)
-        path_screenshots = fs_resource_handler.get_rom_screenshots(
+        path_screenshots = await fs_resource_handler.get_rom_screenshots(
             rom=rom,
             url_screenshots=cleaned_data.get("url_screenshots", []),
         )
@@ -398,7 +702,7 @@ async def update_rom(
                 rom, CoverSize.BIG
             ):
                 cleaned_data.update({"url_cover": data.get("url_cover", rom.url_cover)})
-                path_cover_s, path_cover_l = fs_resource_handler.get_cover(
+                path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
                     overwrite=True,
                     entity=rom,
                     url_cover=data.get("url_cover", ""),
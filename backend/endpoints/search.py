@@ -1,9 +1,11 @@
 import emoji
 from decorators.auth import protected_route
+from endpoints.responses import MessageResponse
 from endpoints.responses.search import SearchCoverSchema, SearchRomSchema
 from fastapi import APIRouter, HTTPException, Request, status
 from handler.database import db_rom_handler
 from handler.metadata import meta_igdb_handler, meta_moby_handler, meta_sgdb_handler
+from handler.metadata.base_hander import purge_search_cache
 from handler.metadata.igdb_handler import IGDB_API_ENABLED
 from handler.metadata.moby_handler import MOBY_API_ENABLED
 from handler.metadata.sgdb_handler import STEAMGRIDDB_API_ENABLED
@@ -58,10 +60,10 @@ async def search_rom(
     log.info(emoji.emojize(f":video_game: {rom.platform_slug}: {rom.file_name}"))
     if search_by.lower() == "id":
         try:
-            igdb_matched_roms = meta_igdb_handler.get_matched_roms_by_id(
+            igdb_matched_roms = await meta_igdb_handler.get_matched_roms_by_id(
                 int(search_term)
             )
-            moby_matched_roms = meta_moby_handler.get_matched_roms_by_id(
+            moby_matched_roms = await meta_moby_handler.get_matched_roms_by_id(
                 int(search_term)
             )
         except ValueError as exc:
@@ -71,10 +73,10 @@ async def search_rom(
                 detail=f"Tried searching by ID, but '{search_term}' is not a valid ID",
             ) from exc
     elif search_by.lower() == "name":
-        igdb_matched_roms = meta_igdb_handler.get_matched_roms_by_name(
-            search_term, _get_main_platform_igdb_id(rom.platform)
+        igdb_matched_roms = await meta_igdb_handler.get_matched_roms_by_name(
+            search_term, await _get_main_platform_igdb_id(rom.platform)
         )
-        moby_matched_roms = meta_moby_handler.get_matched_roms_by_name(
+        moby_matched_roms = await meta_moby_handler.get_matched_roms_by_name(
             search_term, rom.platform.moby_id
         )
 
@@ -128,3 +130,19 @@ async def search_cover(
     )
 
     return [SearchCoverSchema.model_validate(cover) for cover in covers]
+
+
+@protected_route(router.delete, "/search/cache", ["tasks.run"])
+def clear_search_cache(request: Request) -> MessageResponse:
+    """Delete the cached search responses of the metadata providers
+
+    Args:
+        request (Request): Fastapi Request object
+    Returns:
+        MessageResponse: Standard message response
+    """
+
+    deleted = purge_search_cache()
+    log.info(f"Purged {deleted} cached search responses")
+
+    return {"msg": f"{deleted} cached search responses deleted"}
@@ -1,8 +1,17 @@
+import asyncio
+import time
 from typing import Final
 
 import emoji
 import socketio  # type: ignore
-from config import SCAN_TIMEOUT
+from config import (
+    SCAN_ARTWORK_CONCURRENCY,
+    SCAN_IGDB_CONCURRENCY,
+    SCAN_MOBY_CONCURRENCY,
+    SCAN_TIMEOUT,
+    SCAN_WORKERS,
+    SCAN_WRITE_BATCH_SIZE,
+)
 from endpoints.responses.platform import PlatformSchema
 from endpoints.responses.rom import RomSchema
 from exceptions.fs_exceptions import (
@@ -23,12 +32,21 @@ from handler.redis_handler import high_prio_queue, redis_client, redis_url
 from handler.scan_handler import ScanType, scan_firmware, scan_platform, scan_rom
 from handler.socket_handler import socket_handler
 from logger.logger import log
+from models.platform import Platform
 from models.rom import Rom
 from rq import Worker
 from rq.job import Job
-from sqlalchemy.inspection import inspect
+from sqlalchemy import Row
+from utils.context import initialize_context
+from utils.iterators import batched
 
 STOP_SCAN_FLAG: Final = "scan:stop"
+SCAN_JOB_FUNC_NAMES: Final = {
+    "endpoints.sockets.scan.scan_platforms",
+    "endpoints.sockets.scan.scan_roms",
+}
+# Seconds between database writes, so clients keep receiving progress
+SCAN_FLUSH_INTERVAL: Final = 2
 
 
 class ScanStats:
@@ -48,11 +66,174 @@ def _get_socket_manager():
     return socketio.AsyncRedisManager(redis_url, write_only=True)
 
 
-def _should_scan_rom(scan_type: ScanType, rom: Rom, selected_roms: list):
+def _snapshot_changed(fs_rom: dict, rom_snapshot) -> bool:
+    """Check if a rom changed on disk since it was last scanned"""
+
+    return not rom_snapshot or (
+        rom_snapshot.st_size != fs_rom["st_size"]
+        or rom_snapshot.st_mtime_ns != fs_rom["st_mtime_ns"]
+        or rom_snapshot.st_ino != fs_rom["st_ino"]
+    )
+
+
+def _build_rom_snapshot(rom_id: int, fs_rom: dict) -> dict:
+    return {
+        "rom_id": rom_id,
+        "st_size": fs_rom["st_size"],
+        "st_mtime_ns": fs_rom["st_mtime_ns"],
+        "st_ino": fs_rom["st_ino"],
+    }
+
+
+def _rom_event(platform: Platform, rom: Rom) -> dict:
+    return {
+        "platform_name": platform.name,
+        "platform_slug": platform.slug,
+        **RomSchema.model_validate(rom).model_dump(
+            exclude={"created_at", "updated_at", "rom_user"}
+        ),
+    }
+
+
+async def _build_rom_update(platform: Platform, fs_rom: dict, rom_row: Row) -> dict:
+    """File details of a rom that changed on disk, leaving its metadata alone"""
+
+    roms_path = fs_rom_handler.get_roms_fs_structure(platform.fs_slug)
+    return {
+        "id": rom_row.id,
+        "files": fs_rom["files"],
+        "file_size_bytes": fs_rom_handler.get_rom_file_size(
+            roms_path=roms_path,
+            file_name=fs_rom["file_name"],
+            multi=fs_rom["multi"],
+            multi_files=fs_rom["files"],
+        ),
+        "file_crcs": (
+            await asyncio.to_thread(
+                fs_rom_handler.get_rom_files_crcs,
+                roms_path=roms_path,
+                file_name=fs_rom["file_name"],
+                multi_files=fs_rom["files"],
+                previous_crcs=rom_row.file_crcs,
+            )
+            if fs_rom["multi"]
+            else {}
+        ),
+        "multi": fs_rom["multi"],
+    }
+
+
+async def _fetch_artwork(
+    sm: socketio.AsyncRedisManager, platform: Platform, rom: Rom
+) -> None:
+    """Download the cover and screenshots of a rom and notify the clients"""
+
+    (path_cover_s, path_cover_l), path_screenshots = await asyncio.gather(
+        fs_resource_handler.get_cover(
+            overwrite=True,
+            entity=rom,
+            url_cover=rom.url_cover,
+        ),
+        fs_resource_handler.get_rom_screenshots(
+            rom=rom,
+            url_screenshots=rom.url_screenshots,
+        ),
+    )
+
+    rom.path_cover_s = path_cover_s
+    rom.path_cover_l = path_cover_l
+    rom.path_screenshots = path_screenshots
+    db_rom_handler.update_rom(
+        rom.id,
+        {
+            "path_cover_s": path_cover_s,
+            "path_cover_l": path_cover_l,
+            "path_screenshots": path_screenshots,
+        },
+    )
+
+    await sm.emit("scan:scanning_rom_artwork", _rom_event(platform, rom))
+    await sm.emit("", None)
+
+
+async def _artwork_worker(
+    sm: socketio.AsyncRedisManager, artwork_queue: asyncio.Queue
+) -> None:
+    """Consume the artwork queue until cancelled"""
+
+    while True:
+        platform, rom = await artwork_queue.get()
+        try:
+            await _fetch_artwork(sm, platform, rom)
+        except Exception as e:
+            log.error(f"Unable to fetch artwork for {rom.file_name}: {e}")
+        finally:
+            artwork_queue.task_done()
+
+
+def _drop_artwork(
+    artwork_queue: asyncio.Queue, artwork_workers: list[asyncio.Task]
+) -> None:
+    """Drop the artwork left to fetch and stop the workers, so a scan stops promptly"""
+
+    while True:
+        try:
+            artwork_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        artwork_queue.task_done()
+
+    for worker in artwork_workers:
+        worker.cancel()
+
+
+async def _store_scanned_roms(
+    sm: socketio.AsyncRedisManager,
+    artwork_queue: asyncio.Queue,
+    platform: Platform,
+    scanned_roms: list[tuple[dict, Rom]],
+    rom_updates: list[dict],
+    rom_snapshots: list[dict],
+) -> list[Rom]:
+    """Write a chunk of scanned roms, queue their artwork and notify the clients
+
+    Args:
+        scanned_roms: filesystem details and scan result of each rom
+        rom_updates: file details of roms that didn't need to be scanned again
+        rom_snapshots: snapshots of the roms in rom_updates
+    Returns:
+        the stored scanned roms
+    """
+
+    db_rom_handler.bulk_update_roms(rom_updates)
+
+    stored_roms = db_rom_handler.bulk_upsert_roms([rom for _, rom in scanned_roms])
+
+    for rom in stored_roms:
+        await sm.emit("scan:scanning_rom", _rom_event(platform, rom))
+        await sm.emit("", None)
+
+        # Artwork is downloaded in the background, identification goes on
+        artwork_queue.put_nowait((platform, rom))
+
+    # Only stored once the roms are saved, so a stopped scan picks them up again
+    db_rom_handler.upsert_rom_snapshots(
+        rom_snapshots
+        + [
+            _build_rom_snapshot(rom.id, fs_rom)
+            for (fs_rom, _), rom in zip(scanned_roms, stored_roms)
+        ]
+    )
+
+    return stored_roms
+
+
+def _should_scan_rom(scan_type: ScanType, rom: Row | None, selected_roms: list):
     """Decide if a rom should be scanned or not
 
     Args:
         scan_type (str): Type of scan to be performed.
+        rom (Row, optional): Existing rom with at least its id, igdb_id and moby_id.
         selected_roms (list[str], optional): List of selected roms to be scanned.
         metadata_sources (list[str], optional): List of metadata sources to be used
     """
@@ -78,6 +259,7 @@ def _should_scan_rom(scan_type: ScanType, rom: Rom, selected_roms: list):
     )
 
 
+@initialize_context()
 async def scan_platforms(
     platform_ids: list[int],
     scan_type: ScanType = ScanType.QUICK,
@@ -115,8 +297,22 @@ async def scan_platforms(
 
     scan_stats = ScanStats()
 
+    # Caps the number of lookups in flight against each metadata provider
+    metadata_semaphores = {
+        "igdb": asyncio.Semaphore(SCAN_IGDB_CONCURRENCY),
+        "moby": asyncio.Semaphore(SCAN_MOBY_CONCURRENCY),
+    }
+
+    # Covers and screenshots are fetched by a pool of workers
+    artwork_queue: asyncio.Queue = asyncio.Queue()
+    artwork_workers = [
+        asyncio.create_task(_artwork_worker(sm, artwork_queue))
+        for _ in range(SCAN_ARTWORK_CONCURRENCY)
+    ]
+
     async def stop_scan():
         log.info(emoji.emojize(":stop_sign: Scan stopped manually"))
+        _drop_artwork(artwork_queue, artwork_workers)
         await sm.emit("scan:done", scan_stats.__dict__)
         redis_client.delete(STOP_SCAN_FLAG)
 
@@ -136,13 +332,13 @@ async def scan_platforms(
             # Stop the scan if the flag is set
             if redis_client.get(STOP_SCAN_FLAG):
                 await stop_scan()
-                break
+                return
 
             platform = db_platform_handler.get_platform_by_fs_slug(platform_slug)
             if platform and scan_type == ScanType.NEW_PLATFORMS:
                 continue
 
-            scanned_platform = scan_platform(
+            scanned_platform = await scan_platform(
                 platform_slug, fs_platforms, metadata_sources=metadata_sources
             )
             if platform:
@@ -203,7 +399,7 @@ async def scan_platforms(
 
             # Scanning roms
             try:
-                fs_roms = fs_rom_handler.get_roms(platform)
+                fs_roms = fs_rom_handler.get_roms_snapshot(platform)
             except RomsNotFoundException as e:
                 log.error(e)
                 continue
@@ -215,76 +411,129 @@ async def scan_platforms(
             else:
                 log.info(f"  {len(fs_roms)} roms found")
 
-            for fs_rom in fs_roms:
+            # Stats of the roms on disk when they were last scanned
+            rom_snapshots = db_rom_handler.get_rom_snapshots(platform.id)
+            platform_roms = db_rom_handler.get_roms_by_file_name(platform.id)
+
+            # Quick scans don't touch roms that didn't change on disk
+            fs_roms_to_check = [
+                fs_rom
+                for fs_rom in fs_roms
+                if scan_type != ScanType.QUICK
+                or _snapshot_changed(fs_rom, rom_snapshots.get(fs_rom["file_name"]))
+                or rom_snapshots[fs_rom["file_name"]].id in selected_roms
+            ]
+            if scan_type == ScanType.QUICK:
+                log.info(f"  {len(fs_roms_to_check)} roms changed since last scan")
+
+            # Scanned roms are written to the database in chunks
+            pending_roms: list[tuple[dict, Rom]] = []
+            pending_updates: list[dict] = []
+            pending_snapshots: list[dict] = []
+            flushed_at = time.monotonic()
+            roms_changed = False
+
+            for fs_roms_batch in batched(fs_roms_to_check, SCAN_WORKERS):
                 # Break early if the flag is set
                 if redis_client.get(STOP_SCAN_FLAG):
                     break
 
-                rom = db_rom_handler.get_rom_by_filename(
-                    platform.id, fs_rom["file_name"]
-                )
-
-                if _should_scan_rom(
-                    scan_type=scan_type, rom=rom, selected_roms=selected_roms
-                ):
-                    scanned_rom = await scan_rom(
-                        platform=platform,
-                        rom_attrs=fs_rom,
-                        scan_type=scan_type,
-                        rom=rom,
-                        metadata_sources=metadata_sources,
+                roms_to_scan = []
+                for fs_rom in fs_roms_batch:
+                    changed = _snapshot_changed(
+                        fs_rom, rom_snapshots.get(fs_rom["file_name"])
                     )
+                    fs_rom = fs_rom_handler.add_rom_files(platform, fs_rom)
+                    rom_row = platform_roms.get(fs_rom["file_name"])
+
+                    if _should_scan_rom(
+                        scan_type=scan_type, rom=rom_row, selected_roms=selected_roms
+                    ):
+                        roms_to_scan.append((fs_rom, rom_row))
+                    elif rom_row and changed:
+                        # Refresh the file details without fetching metadata again
+                        pending_updates.append(
+                            await _build_rom_update(platform, fs_rom, rom_row)
+                        )
+                        pending_snapshots.append(
+                            _build_rom_snapshot(rom_row.id, fs_rom)
+                        )
+
+                # Only the roms that need new metadata are fully loaded
+                existing_roms = {
+                    rom.id: rom
+                    for rom in db_rom_handler.get_roms_by_ids(
+                        [rom_row.id for _, rom_row in roms_to_scan if rom_row]
+                    )
+                }
+
+                # Metadata lookups for the whole batch run concurrently
+                scanned_roms = await asyncio.gather(
+                    *[
+                        scan_rom(
+                            platform=platform,
+                            rom_attrs={
+                                "file_name": fs_rom["file_name"],
+                                "multi": fs_rom["multi"],
+                                "files": fs_rom["files"],
+                            },
+                            scan_type=scan_type,
+                            rom=existing_roms.get(rom_row.id) if rom_row else None,
+                            metadata_sources=metadata_sources,
+                            metadata_semaphores=metadata_semaphores,
+                        )
+                        for fs_rom, rom_row in roms_to_scan
+                    ]
+                )
 
+                for (fs_rom, rom_row), scanned_rom in zip(roms_to_scan, scanned_roms):
                     scan_stats.scanned_roms += 1
-                    scan_stats.added_roms += 1 if not rom else 0
+                    scan_stats.added_roms += 1 if not rom_row else 0
                     scan_stats.metadata_roms += (
                         1 if scanned_rom.igdb_id or scanned_rom.moby_id else 0
                     )
+                    pending_roms.append((fs_rom, scanned_rom))
 
-                    _added_rom = db_rom_handler.add_rom(scanned_rom)
-
-                    path_cover_s, path_cover_l = fs_resource_handler.get_cover(
-                        overwrite=True,
-                        entity=_added_rom,
-                        url_cover=_added_rom.url_cover,
-                    )
-
-                    path_screenshots = fs_resource_handler.get_rom_screenshots(
-                        rom=_added_rom,
-                        url_screenshots=_added_rom.url_screenshots,
-                    )
-
-                    _added_rom.path_cover_s = path_cover_s
-                    _added_rom.path_cover_l = path_cover_l
-                    _added_rom.path_screenshots = path_screenshots
-                    # Update the scanned rom with the cover and screenshots paths and update database
-                    db_rom_handler.update_rom(
-                        _added_rom.id,
-                        {
-                            c: getattr(_added_rom, c)
-                            for c in inspect(_added_rom).mapper.column_attrs.keys()
-                        },
-                    )
-
-                    await sm.emit(
-                        "scan:scanning_rom",
-                        {
-                            "platform_name": platform.name,
-                            "platform_slug": platform.slug,
-                            **RomSchema.model_validate(_added_rom).model_dump(
-                                exclude={"created_at", "updated_at", "rom_user"}
-                            ),
-                        },
+                if (
+                    len(pending_roms) + len(pending_updates) >= SCAN_WRITE_BATCH_SIZE
+                    or time.monotonic() - flushed_at >= SCAN_FLUSH_INTERVAL
+                ):
+                    roms_changed = roms_changed or bool(pending_roms or pending_updates)
+                    await _store_scanned_roms(
+                        sm,
+                        artwork_queue,
+                        platform,
+                        pending_roms,
+                        pending_updates,
+                        pending_snapshots,
                     )
-                    await sm.emit("", None)
+                    pending_roms, pending_updates, pending_snapshots = [], [], []
+                    flushed_at = time.monotonic()
+
+            # Also stores what was scanned before a manual stop
+            roms_changed = roms_changed or bool(pending_roms or pending_updates)
+            await _store_scanned_roms(
+                sm,
+                artwork_queue,
+                platform,
+                pending_roms,
+                pending_updates,
+                pending_snapshots,
+            )
 
             # Only purge entries if there are some file remaining in the library
             # This protects against accidental deletion of entries when
             # the folder structure is not correct or the drive is not mounted
             if len(fs_roms) > 0:
-                db_rom_handler.purge_roms(
+                purged_roms = db_rom_handler.purge_roms(
                     platform.id, [rom["file_name"] for rom in fs_roms]
                 )
+                roms_changed = roms_changed or purged_roms > 0
+
+            # Siblings are rebuilt once the roms of the platform are stored,
+            # unless none of them changed
+            if roms_changed:
+                db_rom_handler.refresh_sibling_roms(platform.id)
 
             # Same protection for firmware
             if len(fs_firmware) > 0:
@@ -292,10 +541,18 @@ async def scan_platforms(
                     platform.id, [fw for fw in fs_firmware]
                 )
 
+        # Also stops promptly when the last platform was being scanned
+        if redis_client.get(STOP_SCAN_FLAG):
+            await stop_scan()
+            return
+
         # Same protection for platforms
         if len(fs_platforms) > 0:
             db_platform_handler.purge_platforms(fs_platforms)
 
+        # Wait for the remaining artwork before reporting the scan as done
+        await artwork_queue.join()
+
         log.info(emoji.emojize(":check_mark: Scan completed "))
         await sm.emit("scan:done", scan_stats.__dict__)
     except Exception as e:
@@ -303,6 +560,154 @@ async def scan_platforms(
         # Catch all exceptions and emit error to the client
         await sm.emit("scan:done_ko", str(e))
         return
+    finally:
+        for worker in artwork_workers:
+            worker.cancel()
+
+
+@initialize_context()
+async def scan_roms(
+    platform_id: int,
+    file_names: list[str],
+    metadata_sources: list[str] | None = None,
+):
+    """Scan a few roms of a platform, such as the ones just uploaded
+
+    The platform folder isn't listed and the other roms of the platform aren't
+    loaded nor purged, so the roms show up within seconds whatever the size of
+    the platform. New roms are fully scanned, known ones that changed on disk
+    only get their file details refreshed, and missing ones are removed.
+
+    Args:
+        platform_id (int): Id of the platform the roms belong to
+        file_names (list[str]): File names of the roms in the platform folder
+        metadata_sources (list[str], optional): List of metadata sources to be used. Defaults to all sources.
+    """
+
+    if not metadata_sources:
+        metadata_sources = ["igdb", "moby"]
+
+    sm = _get_socket_manager()
+
+    if not IGDB_API_ENABLED and not MOBY_API_ENABLED:
+        log.error("Search error: No metadata providers enabled")
+        await sm.emit("scan:done_ko", "No metadata providers enabled")
+        return
+
+    platform = db_platform_handler.get_platform(platform_id)
+    if not platform:
+        log.error(f"Platform with id {platform_id} not found")
+        await sm.emit("scan:done_ko", f"Platform with id {platform_id} not found")
+        return
+
+    scan_stats = ScanStats()
+    metadata_semaphores = {
+        "igdb": asyncio.Semaphore(SCAN_IGDB_CONCURRENCY),
+        "moby": asyncio.Semaphore(SCAN_MOBY_CONCURRENCY),
+    }
+    artwork_queue: asyncio.Queue = asyncio.Queue()
+    artwork_workers = [
+        asyncio.create_task(_artwork_worker(sm, artwork_queue))
+        for _ in range(SCAN_ARTWORK_CONCURRENCY)
+    ]
+
+    try:
+        try:
+            fs_roms = fs_rom_handler.get_roms_snapshot(platform, file_names)
+        except RomsNotFoundException as e:
+            log.error(e)
+            await sm.emit("scan:done_ko", e.message)
+            return
+
+        log.info(
+            emoji.emojize(
+                f":magnifying_glass_tilted_right: Scanning {len(fs_roms)} roms of {platform.fs_slug}"
+            )
+        )
+
+        # Only the listed roms are removed when they're gone from disk
+        found_file_names = {fs_rom["file_name"] for fs_rom in fs_roms}
+        missing_file_names = [f for f in file_names if f not in found_file_names]
+        if missing_file_names:
+            db_rom_handler.delete_roms_by_file_name(platform.id, missing_file_names)
+
+        rom_snapshots = db_rom_handler.get_rom_snapshots(platform.id, file_names)
+        platform_roms = db_rom_handler.get_roms_by_file_name(platform.id, file_names)
+
+        stored_rom_ids: list[int] = []
+        for fs_roms_batch in batched(fs_roms, SCAN_WORKERS):
+            if redis_client.get(STOP_SCAN_FLAG):
+                log.info(emoji.emojize(":stop_sign: Scan stopped manually"))
+                _drop_artwork(artwork_queue, artwork_workers)
+                redis_client.delete(STOP_SCAN_FLAG)
+                break
+
+            fs_roms_to_scan: list[dict] = []
+            rom_updates: list[dict] = []
+            rom_update_snapshots: list[dict] = []
+            for fs_rom in fs_roms_batch:
+                rom_row = platform_roms.get(fs_rom["file_name"])
+                if rom_row and not _snapshot_changed(
+                    fs_rom, rom_snapshots.get(fs_rom["file_name"])
+                ):
+                    continue
+
+                fs_rom = fs_rom_handler.add_rom_files(platform, fs_rom)
+                if rom_row:
+                    rom_updates.append(
+                        await _build_rom_update(platform, fs_rom, rom_row)
+                    )
+                    rom_update_snapshots.append(_build_rom_snapshot(rom_row.id, fs_rom))
+                else:
+                    fs_roms_to_scan.append(fs_rom)
+
+            scanned_roms = await asyncio.gather(
+                *[
+                    scan_rom(
+                        platform=platform,
+                        rom_attrs={
+                            "file_name": fs_rom["file_name"],
+                            "multi": fs_rom["multi"],
+                            "files": fs_rom["files"],
+                        },
+                        scan_type=ScanType.QUICK,
+                        metadata_sources=metadata_sources,
+                        metadata_semaphores=metadata_semaphores,
+                    )
+                    for fs_rom in fs_roms_to_scan
+                ]
+            )
+
+            for scanned_rom in scanned_roms:
+                scan_stats.scanned_roms += 1
+                scan_stats.added_roms += 1
+                scan_stats.metadata_roms += (
+                    1 if scanned_rom.igdb_id or scanned_rom.moby_id else 0
+                )
+
+            stored_roms = await _store_scanned_roms(
+                sm,
+                artwork_queue,
+                platform,
+                list(zip(fs_roms_to_scan, scanned_roms)),
+                rom_updates,
+                rom_update_snapshots,
+            )
+            stored_rom_ids.extend(rom.id for rom in stored_roms)
+
+        # Only the new roms can have gained siblings
+        db_rom_handler.refresh_roms_sibling_roms(stored_rom_ids)
+
+        await artwork_queue.join()
+
+        log.info(emoji.emojize(":check_mark: Scan completed "))
+        await sm.emit("scan:done", scan_stats.__dict__)
+    except Exception as e:
+        log.error(e)
+        await sm.emit("scan:done_ko", str(e))
+    finally:
+        for worker in artwork_workers:
+            worker.cancel()
 
 
 @socket_handler.socket_server.on("scan")
@@ -331,6 +736,38 @@ async def scan_handler(_sid: str, options: dict):
     )
 
 
+@socket_handler.socket_server.on("scan:roms")
+async def scan_roms_handler(sid: str, options: dict):
+    """Targeted scan socket endpoint
+
+    Args:
+        options (dict): Socket options, with the platform id and the file names
+            of the roms to scan
+    """
+
+    platform_id = options.get("platform")
+    if not isinstance(platform_id, int) or isinstance(platform_id, bool):
+        log.error(f"Invalid platform id to scan: {platform_id}")
+        await socket_handler.socket_server.emit(
+            "scan:done_ko", f"Invalid platform id {platform_id}", to=sid
+        )
+        return None
+
+    file_names = options.get("roms", [])
+    if not file_names:
+        return None
+
+    log.info(emoji.emojize(":magnifying_glass_tilted_right: Scanning roms "))
+
+    return high_prio_queue.enqueue(
+        scan_roms,
+        platform_id,
+        file_names,
+        options.get("apis", []),
+        job_timeout=SCAN_TIMEOUT,
+    )
+
+
 @socket_handler.socket_server.on("scan:stop")
 async def stop_scan_handler(_sid: str):
     """Stop scan socket endpoint"""
@@ -344,7 +781,7 @@ async def stop_scan_handler(_sid: str):
 
     existing_jobs = high_prio_queue.get_jobs()
     for job in existing_jobs:
-        if job.func_name == "scan_platform" and job.is_started:
+        if job.func_name in SCAN_JOB_FUNC_NAMES and job.is_started:
             return await cancel_job(job)
 
     workers = Worker.all(connection=redis_client)
@@ -352,7 +789,7 @@ async def stop_scan_handler(_sid: str):
         current_job = worker.get_current_job()
         if (
             current_job
-            and current_job.func_name == "endpoints.sockets.scan.scan_platforms"
+            and current_job.func_name in SCAN_JOB_FUNC_NAMES
             and current_job.is_started
         ):
             return await cancel_job(current_job)
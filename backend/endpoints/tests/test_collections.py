@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+from handler.database import db_collection_handler
+from main import app
+from models.collection import Collection
+
+client = TestClient(app)
+
+
+def test_add_and_remove_collection_roms(access_token, admin_user, editor_user, rom):
+    collection = db_collection_handler.add_collection(
+        Collection(name="test_collection", description="", user_id=admin_user.id)
+    )
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = client.post(
+        f"/collections/{collection.id}/roms", headers=headers, json={"roms": [rom.id]}
+    )
+    assert response.status_code == 200
+    assert response.json()["rom_count"] == 1
+
+    response = client.post(
+        f"/collections/{collection.id}/roms/delete",
+        headers=headers,
+        json={"roms": [rom.id]},
+    )
+    assert response.status_code == 200
+    assert response.json()["rom_count"] == 0
+
+    # The body has to list the rom ids
+    for body in ({}, {"roms": "1"}, {"roms": ["1"]}, [rom.id]):
+        for url in (
+            f"/collections/{collection.id}/roms",
+            f"/collections/{collection.id}/roms/delete",
+        ):
+            response = client.post(url, headers=headers, json=body)
+            assert response.status_code == 400
+
+    # Only the owner can change the roms of a collection
+    other_collection = db_collection_handler.add_collection(
+        Collection(name="other_collection", description="", user_id=editor_user.id)
+    )
+    for url in (
+        f"/collections/{other_collection.id}/roms",
+        f"/collections/{other_collection.id}/roms/delete",
+    ):
+        response = client.post(url, headers=headers, json={"roms": [rom.id]})
+        assert response.status_code == 403
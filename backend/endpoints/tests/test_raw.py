@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from fastapi.testclient import TestClient
 from main import app
 
@@ -17,3 +19,22 @@ def test_get_raw_asset(access_token):
     assert response.status_code == 200
     assert "SUPER_MARIO_64_SAVE_FILE" in response.text
     assert response.headers["content-type"] == "text/plain; charset=utf-8"
+
+
+def test_get_raw_asset_accel_redirect(access_token):
+    with patch("endpoints.raw.ENABLE_NGINX_ACCEL_REDIRECT", True):
+        response = client.get(
+            "/raw/assets/users/557365723a31/saves/n64/mupen64/Super Mario 64 (J) (Rev A).sav",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        assert response.status_code == 200
+        assert response.content == b""
+        assert response.headers["x-accel-redirect"] == (
+            "/_internal/assets/users/557365723a31/saves/n64/mupen64/Super%20Mario%2064%20%28J%29%20%28Rev%20A%29.sav"
+        )
+
+        response = client.get(
+            "/raw/assets/%2E%2E/library/n64/roms/Paper Mario (USA).z64",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        assert response.status_code == 404
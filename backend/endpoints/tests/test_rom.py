@@ -1,7 +1,18 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import zipfile
 from unittest.mock import patch
 
+import httpx
+from config import LIBRARY_BASE_PATH
 from fastapi.testclient import TestClient
+from handler.database import db_platform_handler, db_rom_handler
 from main import app
+from models.platform import Platform
+from models.rom import Rom
 
 client = TestClient(app)
 
@@ -30,6 +41,44 @@ def test_get_all_roms(access_token, rom, platform):
     assert body[0]["id"] == rom.id
 
 
+def test_get_roms_page(access_token, rom, platform):
+    response = client.get(
+        "/roms",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={"platform_id": platform.id, "page_size": 1},
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "1"
+    assert "X-Next-Cursor" not in response.headers
+
+    body = response.json()
+    assert len(body) == 1
+    assert body[0]["id"] == rom.id
+
+    response = client.get(
+        "/roms",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={"platform_id": platform.id, "cursor": "invalid"},
+    )
+    assert response.status_code == 400
+
+
+def test_get_roms_compact(access_token, rom, platform):
+    response = client.get(
+        "/roms",
+        headers={"Authorization": f"Bearer {access_token}"},
+        params={"platform_id": platform.id, "view": "compact"},
+    )
+    assert response.status_code == 200
+
+    body = response.json()
+    assert len(body) == 1
+    assert body[0]["id"] == rom.id
+    assert body[0]["platform_slug"] == platform.slug
+    assert "igdb_metadata" not in body[0]
+    assert "summary" not in body[0]
+
+
 @patch("endpoints.rom.fs_rom_handler.rename_file")
 @patch("endpoints.rom.meta_igdb_handler.get_rom_by_id")
 def test_update_rom(rename_file_mock, get_rom_by_id_mock, access_token, rom):
@@ -77,3 +126,188 @@ def test_delete_roms(access_token, rom):
 
     body = response.json()
     assert body["msg"] == "1 roms deleted successfully!"
+
+
+def test_get_rom_content_ranges(access_token, platform):
+    rom = db_rom_handler.add_rom(
+        Rom(
+            platform_id=platform.id,
+            name="Super Mario 64",
+            file_name="Super Mario 64 (J) (Rev A)",
+            file_name_no_tags="Super Mario 64",
+            file_name_no_ext="Super Mario 64 (J) (Rev A)",
+            file_extension="",
+            file_path="n64/roms",
+            multi=True,
+            files=[
+                "Super Mario 64 (J) (Rev A) [Part 1].z64",
+                "Super Mario 64 (J) (Rev A) [Part 2].z64",
+            ],
+        )
+    )
+    url = f"/roms/{rom.id}/content/Super Mario 64"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+        assert zip_file.testzip() is None
+        assert len(zip_file.namelist()) == 3
+
+    head_response = client.head(url, headers=headers)
+    assert head_response.headers["content-length"] == str(len(response.content))
+
+    response_range = client.get(url, headers={**headers, "Range": "bytes=1000-"})
+    assert response_range.status_code == 206
+    assert response_range.content == response.content[1000:]
+    assert response_range.headers["content-range"] == (
+        f"bytes 1000-{len(response.content) - 1}/{len(response.content)}"
+    )
+
+    response_not_modified = client.get(
+        url, headers={**headers, "If-None-Match": response.headers["etag"]}
+    )
+    assert response_not_modified.status_code == 304
+
+    response_unsatisfiable = client.get(
+        url, headers={**headers, "Range": f"bytes={len(response.content)}-"}
+    )
+    assert response_unsatisfiable.status_code == 416
+
+
+def test_upload_rom_resumable(access_token):
+    platform = db_platform_handler.add_platform(
+        Platform(name="Nintendo 64", slug="n64", fs_slug="n64")
+    )
+    url = f"/roms/upload/{platform.id}/test_upload.z64"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    content = b"0123456789"
+
+    response = client.head(url, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["Upload-Offset"] == "0"
+
+    response = client.patch(
+        url,
+        headers={**headers, "Upload-Offset": "0", "Upload-Length": "10"},
+        content=content[:4],
+    )
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "4"
+
+    # Chunks must follow the bytes already received
+    response = client.patch(
+        url,
+        headers={**headers, "Upload-Offset": "2", "Upload-Length": "10"},
+        content=content[2:],
+    )
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "4"
+
+    checksum = base64.b64encode(hashlib.sha256(content).digest()).decode()
+    response = client.patch(
+        url,
+        headers={
+            **headers,
+            "Upload-Offset": "4",
+            "Upload-Length": "10",
+            "Upload-Checksum": f"sha256 {checksum}",
+        },
+        content=content[4:],
+    )
+    assert response.status_code == 204
+    assert response.headers["Upload-Offset"] == "10"
+
+    file_path = f"{LIBRARY_BASE_PATH}/n64/roms/test_upload.z64"
+    try:
+        with open(file_path, "rb") as f:
+            assert f.read() == content
+
+        response = client.head(url, headers=headers)
+        assert response.status_code == 409
+    finally:
+        os.remove(file_path)
+
+
+def test_upload_rom_length_mismatch(access_token):
+    platform = db_platform_handler.add_platform(
+        Platform(name="Nintendo 64", slug="n64", fs_slug="n64")
+    )
+    url = f"/roms/upload/{platform.id}/test_upload.z64"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = client.patch(
+        url,
+        headers={**headers, "Upload-Offset": "0", "Upload-Length": "10"},
+        content=b"0123",
+    )
+    assert response.status_code == 204
+
+    response = client.head(url, headers=headers)
+    assert response.headers["Upload-Length"] == "10"
+
+    # The rest of the upload must declare the same length
+    response = client.patch(
+        url,
+        headers={**headers, "Upload-Offset": "4", "Upload-Length": "6"},
+        content=b"45",
+    )
+    assert response.status_code == 409
+    assert response.headers["Upload-Length"] == "10"
+
+    response = client.head(url, headers=headers)
+    assert response.headers["Upload-Offset"] == "4"
+
+    response = client.delete(url, headers=headers)
+    assert response.status_code == 200
+
+    response = client.head(url, headers=headers)
+    assert response.headers["Upload-Offset"] == "0"
+    assert "Upload-Length" not in response.headers
+
+
+async def test_upload_rom_overlapping_requests(access_token):
+    platform = db_platform_handler.add_platform(
+        Platform(name="Nintendo 64", slug="n64", fs_slug="n64")
+    )
+    url = f"/roms/upload/{platform.id}/test_upload.z64"
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Upload-Offset": "0",
+        "Upload-Length": "10",
+    }
+    first_chunk_sent = asyncio.Event()
+    resume_upload = asyncio.Event()
+
+    async def slow_content():
+        yield b"01234"
+        first_chunk_sent.set()
+        await resume_upload.wait()
+        yield b"56789"
+
+    # The ASGI transport streams the body, so both requests run at once
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        first_request = asyncio.create_task(
+            c.patch(url, headers=headers, content=slow_content())
+        )
+        await first_chunk_sent.wait()
+
+        # A retry at the same offset while the first request is still running
+        response = await c.patch(url, headers=headers, content=b"0123456789")
+        assert response.status_code == 423
+
+        response = await c.delete(url, headers=headers)
+        assert response.status_code == 423
+
+        resume_upload.set()
+        response = await first_request
+        assert response.status_code == 204
+        assert response.headers["Upload-Offset"] == "10"
+
+    file_path = f"{LIBRARY_BASE_PATH}/n64/roms/test_upload.z64"
+    try:
+        with open(file_path, "rb") as f:
+            assert f.read() == b"0123456789"
+    finally:
+        os.remove(file_path)
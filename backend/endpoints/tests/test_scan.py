@@ -0,0 +1,100 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from endpoints.sockets.scan import (
+    _artwork_worker,
+    _drop_artwork,
+    scan_roms,
+    scan_roms_handler,
+)
+from handler.database import db_rom_handler
+from handler.filesystem import fs_resource_handler
+from handler.socket_handler import socket_handler
+from models.platform import Platform
+from models.rom import Rom
+
+
+async def test_artwork_worker(platform: Platform, rom: Rom):
+    sm = AsyncMock()
+    artwork_queue: asyncio.Queue = asyncio.Queue()
+    worker = asyncio.create_task(_artwork_worker(sm, artwork_queue))
+
+    with patch.object(
+        fs_resource_handler,
+        "get_cover",
+        AsyncMock(return_value=("cover_s.png", "cover_l.png")),
+    ), patch.object(
+        fs_resource_handler,
+        "get_rom_screenshots",
+        AsyncMock(side_effect=[Exception("Unreachable"), ["screenshot.png"]]),
+    ):
+        # A failed download doesn't stop the worker
+        artwork_queue.put_nowait((platform, rom))
+        artwork_queue.put_nowait((platform, rom))
+        await asyncio.wait_for(artwork_queue.join(), 5)
+
+    worker.cancel()
+
+    rom = db_rom_handler.get_rom(rom.id)
+    assert rom.path_cover_s == "cover_s.png"
+    assert rom.path_cover_l == "cover_l.png"
+    assert rom.path_screenshots == ["screenshot.png"]
+
+    [artwork_event] = [
+        call.args[1]
+        for call in sm.emit.await_args_list
+        if call.args[0] == "scan:scanning_rom_artwork"
+    ]
+    assert artwork_event["id"] == rom.id
+
+
+async def _never_done(*_args) -> None:
+    await asyncio.Event().wait()
+
+
+async def test_drop_artwork(platform: Platform, rom: Rom):
+    sm = AsyncMock()
+    artwork_queue: asyncio.Queue = asyncio.Queue()
+    artwork_workers = [asyncio.create_task(_artwork_worker(sm, artwork_queue))]
+
+    # Downloads never complete
+    with patch("endpoints.sockets.scan._fetch_artwork", _never_done):
+        for _ in range(3):
+            artwork_queue.put_nowait((platform, rom))
+        await asyncio.sleep(0)
+
+        _drop_artwork(artwork_queue, artwork_workers)
+
+        # Neither the queued nor the running downloads are waited for
+        await asyncio.wait_for(artwork_queue.join(), 1)
+
+    assert artwork_queue.empty()
+    assert all(worker.cancelled() for worker in artwork_workers)
+
+
+async def test_scan_roms_handler(platform: Platform):
+    emit_mock = AsyncMock()
+    with patch("endpoints.sockets.scan.high_prio_queue") as queue_mock:
+        with patch.object(socket_handler.socket_server, "emit", emit_mock):
+            # The platform id is required
+            for platform_id in (None, "1", True):
+                options = {"platform": platform_id, "roms": ["rom.z64"]}
+                assert await scan_roms_handler("sid", options) is None
+
+            # Nothing to scan
+            assert await scan_roms_handler("sid", {"platform": platform.id}) is None
+
+            await scan_roms_handler(
+                "sid", {"platform": platform.id, "roms": ["rom.z64"]}
+            )
+
+    assert emit_mock.await_count == 3
+    assert emit_mock.await_args.args[0] == "scan:done_ko"
+    assert emit_mock.await_args.kwargs["to"] == "sid"
+
+    queue_mock.enqueue.assert_called_once()
+    assert queue_mock.enqueue.call_args.args[:3] == (
+        scan_roms,
+        platform.id,
+        ["rom.z64"],
+    )
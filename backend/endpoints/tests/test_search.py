@@ -0,0 +1,20 @@
+from fastapi.testclient import TestClient
+from handler.metadata.base_hander import SEARCH_CACHE_KEY
+from handler.redis_handler import cache
+from main import app
+
+client = TestClient(app)
+
+
+def test_clear_search_cache(access_token):
+    cache.set(f"{SEARCH_CACHE_KEY}:igdb:games:4:papermario", "[]")
+
+    response = client.delete("/search/cache")
+    assert response.status_code == 403
+
+    response = client.delete(
+        "/search/cache", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["msg"] == "1 cached search responses deleted"
+    assert not cache.exists(f"{SEARCH_CACHE_KEY}:igdb:games:4:papermario")
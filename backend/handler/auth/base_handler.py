@@ -1,7 +1,10 @@
+import hashlib
+import hmac
+import secrets
 from datetime import datetime, timedelta
 from typing import Final
 
-from config import ROMM_AUTH_SECRET_KEY
+from config import BASIC_AUTH_CACHE_TTL, ROMM_AUTH_SECRET_KEY
 from exceptions.auth_exceptions import OAuthCredentialsException
 from fastapi import HTTPException, status
 from joserfc import jwt
@@ -9,6 +12,7 @@ from joserfc.errors import BadSignatureError
 from joserfc.jwk import OctKey
 from passlib.context import CryptContext
 from starlette.requests import HTTPConnection
+from utils.cache import TTLCache
 
 ALGORITHM: Final = "HS256"
 DEFAULT_OAUTH_TOKEN_EXPIRY: Final = 15
@@ -47,6 +51,12 @@ FULL_SCOPES: Final = WRITE_SCOPES + list(FULL_SCOPES_MAP.keys())
 class AuthHandler:
     def __init__(self) -> None:
         self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        # Credentials that passed the bcrypt check, so clients sending them on
+        # every request (basic auth) don't pay for it each time
+        self._credentials_key = secrets.token_bytes(32)
+        self._verified_credentials: TTLCache[str, tuple[int, str]] = TTLCache(
+            ttl=BASIC_AUTH_CACHE_TTL
+        )
 
     def verify_password(self, plain_password, hashed_password):
         return self.pwd_context.verify(plain_password, hashed_password)
@@ -54,16 +64,34 @@ class AuthHandler:
     def get_password_hash(self, password):
         return self.pwd_context.hash(password)
 
+    def _credentials_digest(self, username: str, password: str) -> str:
+        return hmac.new(
+            self._credentials_key,
+            f"{username}:{password}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+
     def authenticate_user(self, username: str, password: str):
         from handler.database import db_user_handler
 
-        user = db_user_handler.get_user_by_username(username)
+        user = db_user_handler.get_cached_user_by_username(username)
         if not user:
             return None
 
+        # Changing the password changes the hash, which discards the cached entry
+        credentials_digest = self._credentials_digest(username, password)
+        if self._verified_credentials.get(credentials_digest) == (
+            user.id,
+            user.hashed_password,
+        ):
+            return user
+
         if not self.verify_password(password, user.hashed_password):
             return None
 
+        self._verified_credentials.set(
+            credentials_digest, (user.id, user.hashed_password)
+        )
         return user
 
     async def get_current_active_user_from_session(self, conn: HTTPConnection):
@@ -78,7 +106,7 @@ class AuthHandler:
             return None
 
         # Key exists therefore user is probably authenticated
-        user = db_user_handler.get_user_by_username(username)
+        user = db_user_handler.get_cached_user_by_username(username)
         if user is None:
             conn.session.clear()
 
@@ -100,7 +128,11 @@ class AuthHandler:
 
 class OAuthHandler:
     def __init__(self) -> None:
-        pass
+        self._secret_key = OctKey.import_key(ROMM_AUTH_SECRET_KEY)
+        # Bearer tokens already verified, until they expire
+        self._decoded_tokens: TTLCache[str, jwt.Token] = TTLCache(
+            ttl=DEFAULT_OAUTH_TOKEN_EXPIRY * 60
+        )
 
     def create_oauth_token(self, data: dict, expires_delta: timedelta | None = None):
         to_encode = data.copy()
@@ -112,15 +144,23 @@ class OAuthHandler:
 
         to_encode.update({"exp": expire})
 
-        return jwt.encode(
-            {"alg": ALGORITHM}, to_encode, OctKey.import_key(ROMM_AUTH_SECRET_KEY)
-        )
+        return jwt.encode({"alg": ALGORITHM}, to_encode, self._secret_key)
+
+    def _decode_token(self, token: str) -> jwt.Token:
+        payload = self._decoded_tokens.get(token)
+        if payload is None:
+            payload = jwt.decode(token, self._secret_key)
+            expires_in = payload.claims.get("exp", 0) - datetime.now().timestamp()
+            if expires_in > 0:
+                self._decoded_tokens.set(token, payload, ttl=expires_in)
+
+        return payload
 
     async def get_current_active_user_from_bearer_token(self, token: str):
         from handler.database import db_user_handler
 
         try:
-            payload = jwt.decode(token, OctKey.import_key(ROMM_AUTH_SECRET_KEY))
+            payload = self._decode_token(token)
         except (BadSignatureError, ValueError) as exc:
             raise OAuthCredentialsException from exc
 
@@ -132,7 +172,7 @@ class OAuthHandler:
         if username is None:
             raise OAuthCredentialsException
 
-        user = db_user_handler.get_user_by_username(username)
+        user = db_user_handler.get_cached_user_by_username(username)
         if user is None:
             raise OAuthCredentialsException
 
@@ -8,6 +8,7 @@ from starlette.datastructures import MutableHeaders, Secret
 from starlette.requests import HTTPConnection
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette_csrf.middleware import CSRFMiddleware
+from utils.cache import TTLCache
 
 
 class CustomCSRFMiddleware(CSRFMiddleware):
@@ -32,6 +33,7 @@ class SessionMiddleware:
         same_site: str = "lax",
         https_only: bool = False,
         jwt_alg: str = "HS256",
+        renew_before: int = 24 * 60 * 60,  # 1 day, in seconds
     ) -> None:
         self.app = app
         self.jwt_alg = jwt_alg
@@ -41,27 +43,27 @@ class SessionMiddleware:
         else:
             self.jwt_secret = secret_key
 
-        # check crypto setup so we bail out if needed
-        _jwt = jwt.encode(
-            {"alg": jwt_alg},
-            {"1": 2},
-            key=OctKey.import_key(str(self.jwt_secret.encode)),
-        )
-        token = jwt.decode(
-            _jwt,
-            key=OctKey.import_key(
-                str(
-                    self.jwt_secret.decode
-                    if self.jwt_secret.decode
-                    else self.jwt_secret.encode
-                )
-            ),
+        # Keys are imported once, rather than for every cookie
+        self.encode_key = OctKey.import_key(str(self.jwt_secret.encode))
+        self.decode_key = OctKey.import_key(
+            str(
+                self.jwt_secret.decode
+                if self.jwt_secret.decode
+                else self.jwt_secret.encode
+            )
         )
+
+        # check crypto setup so we bail out if needed
+        _jwt = jwt.encode({"alg": jwt_alg}, {"1": 2}, key=self.encode_key)
+        token = jwt.decode(_jwt, key=self.decode_key)
         assert token.claims == {"1": 2}, "wrong crypto setup"
         assert token.header == {"typ": "JWT", "alg": jwt_alg}, "wrong crypto setup"
 
         self.session_cookie = session_cookie
         self.max_age = max_age
+        self.renew_before = renew_before
+        # Claims of the cookies already verified, until they expire
+        self._decoded_tokens: TTLCache[str, dict] = TTLCache(ttl=max_age)
         self.security_flags = "httponly; samesite=" + same_site
         if https_only:  # Secure flag can be used with HTTPS only
             self.security_flags += "; secure"
@@ -82,6 +84,20 @@ class SessionMiddleware:
 
         return jwt_payload.claims
 
+    def _decode_session(self, data: str) -> dict:
+        claims = self._decoded_tokens.get(data)
+        if claims is None:
+            claims = self._validate_jwt_payload(
+                jwt.decode(data.encode("utf-8"), key=self.decode_key)
+            )
+            if claims and "nbf" not in claims:
+                expires_in = claims.get("exp", time.time() + self.max_age) - time.time()
+                if expires_in > 0:
+                    self._decoded_tokens.set(data, claims, ttl=expires_in)
+
+        # The session is mutated by the request, the cached claims must not be
+        return dict(claims)
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] not in ("http", "websocket"):  # pragma: no cover
             await self.app(scope, receive, send)
@@ -89,23 +105,14 @@ class SessionMiddleware:
 
         connection = HTTPConnection(scope)
         initial_session_was_empty = True
+        initial_session: dict = {}
 
         if self.session_cookie in connection.cookies:
-            data = connection.cookies[self.session_cookie].encode("utf-8")
             try:
-                jwt_payload = jwt.decode(
-                    data,
-                    key=OctKey.import_key(
-                        str(
-                            self.jwt_secret.decode
-                            if self.jwt_secret.decode
-                            else self.jwt_secret.encode
-                        )
-                    ),
+                scope["session"] = self._decode_session(
+                    connection.cookies[self.session_cookie]
                 )
-
-                jwt_claims = self._validate_jwt_payload(jwt_payload)
-                scope["session"] = jwt_claims
+                initial_session = dict(scope["session"])
                 initial_session_was_empty = False
             except BadSignatureError:
                 scope["session"] = {}
@@ -115,13 +122,20 @@ class SessionMiddleware:
         async def send_wrapper(message: Message) -> None:
             if message["type"] == "http.response.start":
                 if scope["session"]:
-                    if "exp" not in scope["session"]:
-                        scope["session"]["exp"] = int(time.time()) + self.max_age
+                    now = int(time.time())
+                    expires_soon = (
+                        scope["session"].get("exp", now) - now < self.renew_before
+                    )
+                    # The browser already holds a valid cookie for this session
+                    if scope["session"] == initial_session and not expires_soon:
+                        await send(message)
+                        return
+
+                    if expires_soon:
+                        scope["session"]["exp"] = now + self.max_age
 
                     data = jwt.encode(
-                        {"alg": self.jwt_alg},
-                        scope["session"],
-                        key=OctKey.import_key(str(self.jwt_secret.encode)),
+                        {"alg": self.jwt_alg}, scope["session"], key=self.encode_key
                     )
 
                     headers = MutableHeaders(scope=message)
@@ -1,4 +1,5 @@
 from base64 import b64encode
+from unittest.mock import patch
 
 import pytest
 from fastapi.exceptions import HTTPException
@@ -25,6 +26,24 @@ def test_authenticate_user(admin_user: User):
     assert current_user.id == admin_user.id
 
 
+def test_authenticate_user_cached_credentials(admin_user: User):
+    with patch.object(
+        auth_handler, "verify_password", wraps=auth_handler.verify_password
+    ) as verify_password_mock:
+        assert auth_handler.authenticate_user("test_admin", "test_admin_password")
+        assert auth_handler.authenticate_user("test_admin", "test_admin_password")
+        assert not auth_handler.authenticate_user("test_admin", "wrong_password")
+
+    assert verify_password_mock.call_count == 2
+
+    # A new password hash invalidates the verified credentials
+    db_user_handler.update_user(
+        admin_user.id,
+        {"hashed_password": auth_handler.get_password_hash("new_password")},
+    )
+    assert not auth_handler.authenticate_user("test_admin", "test_admin_password")
+
+
 async def test_get_current_active_user_from_session(editor_user: User):
     class MockConnection:
         def __init__(self):
@@ -69,6 +88,25 @@ async def test_get_current_active_user_from_session_disabled_user(editor_user: U
         assert e.detail == "Inactive user test_editor"
 
 
+async def test_get_current_active_user_from_session_cached_disabled_user(
+    editor_user: User,
+):
+    class MockConnection:
+        def __init__(self):
+            self.session = {"iss": "romm:auth", "sub": editor_user.username}
+            self.headers = {}
+
+    # The user is cached by the first request
+    assert await auth_handler.get_current_active_user_from_session(MockConnection())
+
+    db_user_handler.update_user(editor_user.id, {"enabled": False})
+
+    with pytest.raises(HTTPException) as exc_info:
+        await auth_handler.get_current_active_user_from_session(MockConnection())
+    assert exc_info.value.status_code == 403
+    assert exc_info.value.detail == "Inactive user test_editor"
+
+
 async def test_hybrid_auth_backend_session(editor_user: User):
     class MockConnection:
         def __init__(self):
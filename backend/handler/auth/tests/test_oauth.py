@@ -73,3 +73,17 @@ def test_protected_route():
     req = Request({"type": "http", "method": "GET", "url": "/test"})
 
     assert test_route(req) == {"test": "test"}
+
+
+async def test_get_current_active_user_from_bearer_token_cached(admin_user):
+    token = oauth_handler.create_oauth_token(
+        data={"sub": admin_user.username, "iss": "romm:oauth"}
+    )
+
+    await oauth_handler.get_current_active_user_from_bearer_token(token)
+    payload = oauth_handler._decoded_tokens.get(token)
+    assert payload is not None
+    assert payload.claims["sub"] == admin_user.username
+
+    user, _ = await oauth_handler.get_current_active_user_from_bearer_token(token)
+    assert user.id == admin_user.id
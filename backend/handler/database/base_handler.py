@@ -1,9 +1,59 @@
+import time
+
+from config import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT,
+)
 from config.config_manager import ConfigManager
-from sqlalchemy import create_engine
+from handler.metrics_handler import metrics_handler
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+# A single engine (and connection pool) is shared by all the handlers of a process
+sync_engine = create_engine(
+    ConfigManager.get_db_engine(),
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+sync_session = sessionmaker(bind=sync_engine, expire_on_commit=False)
+
+
+@event.listens_for(sync_engine, "connect")
+def set_statement_timeout(dbapi_connection, _connection_record):
+    if not DB_STATEMENT_TIMEOUT:
+        return
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"SET SESSION max_statement_time = {DB_STATEMENT_TIMEOUT}")
+    cursor.close()
+
+
+@event.listens_for(sync_engine, "checkout")
+def record_checkout(_dbapi_connection, connection_record, _connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+    # Once every connection is in use, the next checkouts wait for one
+    saturated = sync_engine.pool.checkedout() >= DB_POOL_SIZE + DB_MAX_OVERFLOW
+    metrics_handler.record(
+        "db_pool", {"checkouts": 1, "saturated_checkouts": int(saturated)}
+    )
+
+
+@event.listens_for(sync_engine, "checkin")
+def record_checkin(_dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        metrics_handler.record(
+            "db_pool", {"held_seconds": time.perf_counter() - checked_out_at}
+        )
+
 
 class DBBaseHandler:
     def __init__(self) -> None:
-        self.engine = create_engine(ConfigManager.get_db_engine(), pool_pre_ping=True)
-        self.session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.engine = sync_engine
+        self.session = sync_session
@@ -1,6 +1,7 @@
 from decorators.database import begin_session
-from models.collection import Collection
+from models.collection import Collection, CollectionRom
 from sqlalchemy import Select, delete, select, update
+from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.orm import Session
 
 from .base_handler import DBBaseHandler
@@ -43,14 +44,71 @@ class DBCollectionsHandler(DBBaseHandler):
 
     @begin_session
     def update_collection(
-        self, id: int, data: dict, session: Session = None
+        self,
+        id: int,
+        data: dict,
+        rom_ids: list[int] | None = None,
+        session: Session = None,
     ) -> Collection:
+        """Update a collection
+
+        Args:
+            rom_ids: when given, replaces the roms of the collection
+        """
         session.execute(
             update(Collection)
             .where(Collection.id == id)
             .values(**data)
             .execution_options(synchronize_session="evaluate")
         )
+
+        if rom_ids is not None:
+            session.execute(
+                delete(CollectionRom).where(
+                    CollectionRom.collection_id == id,
+                    CollectionRom.rom_id.not_in(rom_ids),
+                )
+            )
+            self._insert_collection_roms(id, rom_ids, session=session)
+
+        return session.query(Collection).filter_by(id=id).one()
+
+    @staticmethod
+    def _insert_collection_roms(
+        collection_id: int, rom_ids: list[int], session: Session
+    ) -> None:
+        if not rom_ids:
+            return
+
+        # Roms already in the collection or no longer existing are skipped
+        session.execute(
+            insert(CollectionRom)
+            .prefix_with("IGNORE")
+            .values(
+                [
+                    {"collection_id": collection_id, "rom_id": rom_id}
+                    for rom_id in set(rom_ids)
+                ]
+            )
+        )
+
+    @begin_session
+    def add_collection_roms(
+        self, id: int, rom_ids: list[int], session: Session = None
+    ) -> Collection:
+        self._insert_collection_roms(id, rom_ids, session=session)
+        return session.query(Collection).filter_by(id=id).one()
+
+    @begin_session
+    def remove_collection_roms(
+        self, id: int, rom_ids: list[int], session: Session = None
+    ) -> Collection:
+        session.execute(
+            delete(CollectionRom).where(
+                CollectionRom.collection_id == id,
+                CollectionRom.rom_id.in_(rom_ids),
+            )
+        )
         return session.query(Collection).filter_by(id=id).one()
 
     @begin_session
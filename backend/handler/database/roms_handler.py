@@ -1,13 +1,68 @@
 import functools
+import re
+from typing import Any, Final
 
 from decorators.database import begin_session
-from models.collection import Collection
-from models.rom import Rom, RomUser
-from sqlalchemy import and_, delete, func, or_, select, update
-from sqlalchemy.orm import Query, Session, selectinload
+from models.collection import Collection, CollectionRom
+from models.rom import Rom, RomSnapshot, RomUser, SiblingRom
+from sqlalchemy import Row, and_, delete, func, inspect, or_, select, update
+from sqlalchemy.dialects.mysql import insert, match
+from sqlalchemy.orm import Query, Session, aliased, load_only, selectinload
+from utils.iterators import batched
 
 from .base_handler import DBBaseHandler
 
+# Columns needed to list roms, leaving out the summary and metadata blobs
+COMPACT_ROM_COLUMNS: Final = (
+    Rom.id,
+    Rom.igdb_id,
+    Rom.sgdb_id,
+    Rom.moby_id,
+    Rom.platform_id,
+    Rom.file_name,
+    Rom.file_name_no_tags,
+    Rom.file_name_no_ext,
+    Rom.file_extension,
+    Rom.file_size_bytes,
+    Rom.name,
+    Rom.slug,
+    Rom.path_cover_s,
+    Rom.path_cover_l,
+    Rom.revision,
+    Rom.regions,
+    Rom.languages,
+    Rom.tags,
+    Rom.multi,
+)
+
+# Words the full-text index doesn't store (innodb_ft_min_token_size and the
+# default InnoDB stopwords), searched with a plain LIKE instead
+FULLTEXT_MIN_TOKEN_SIZE: Final = 3
+FULLTEXT_STOPWORDS: Final = frozenset(
+    (
+        "about are com for from how that the this was what when where who will "
+        "with und www"
+    ).split()
+)
+SEARCH_TEXT_FIELDS: Final = frozenset(
+    ("name", "file_name", "igdb_metadata", "moby_metadata")
+)
+SIBLING_FIELDS: Final = frozenset(("platform_id", "igdb_id", "moby_id"))
+
+
+def _search_text(
+    name: str | None,
+    file_name: str,
+    igdb_metadata: dict | None,
+    moby_metadata: dict | None,
+) -> str:
+    """Text indexed for the rom search: names and alternative names"""
+    alternative_names = (igdb_metadata or {}).get("alternative_names", None) or (
+        moby_metadata or {}
+    ).get("alternate_titles", [])
+
+    return "\n".join(filter(None, [name, file_name, *alternative_names]))
+
 
 def with_details(func):
     @functools.wraps(func)
@@ -57,40 +112,102 @@ class DBRomsHandler(DBBaseHandler):
             data = data.filter(Rom.platform_id == platform_id)
 
         if collection_id:
-            collection = (
-                session.query(Collection)
-                .filter(Collection.id == collection_id)
-                .one_or_none()
-            )
-            if collection:
-                data = data.filter(Rom.id.in_(collection.roms))
-
-        if search_term:
             data = data.filter(
-                or_(
-                    Rom.file_name.ilike(f"%{search_term}%"),  # type: ignore[attr-defined]
-                    Rom.name.ilike(f"%{search_term}%"),  # type: ignore[attr-defined]
+                Rom.id.in_(
+                    select(CollectionRom.rom_id).where(
+                        CollectionRom.collection_id == collection_id
+                    )
                 )
             )
 
+        if search_term:
+            data = data.filter(self._search_filter(search_term))
+
         return data
 
-    def _order(self, data, order_by: str, order_dir: str):
+    @staticmethod
+    def _fulltext_query(search_term: str) -> str:
+        """Boolean mode query requiring every indexable word, as a prefix"""
+        return " ".join(
+            f"+{word}*"
+            for word in re.findall(r"\w+", search_term)
+            if len(word) >= FULLTEXT_MIN_TOKEN_SIZE
+            and word.lower() not in FULLTEXT_STOPWORDS
+        )
+
+    def _search_filter(self, search_term: str):
+        words = re.findall(r"\w+", search_term)
+        if not words:
+            return or_(
+                Rom.file_name.ilike(f"%{search_term}%"),  # type: ignore[attr-defined]
+                Rom.name.ilike(f"%{search_term}%"),  # type: ignore[attr-defined]
+            )
+
+        conditions = []
+        fulltext_query = self._fulltext_query(search_term)
+        if fulltext_query:
+            conditions.append(Rom.search_text.match(fulltext_query))
+
+        # Words too short for the index still have to match
+        conditions.extend(
+            Rom.search_text.ilike(f"%{word}%")  # type: ignore[attr-defined]
+            for word in words
+            if len(word) < FULLTEXT_MIN_TOKEN_SIZE
+            or word.lower() in FULLTEXT_STOPWORDS
+        )
+
+        return and_(*conditions)
+
+    def _sort_column(self, order_by: str, search_term: str = ""):
         if order_by == "id":
-            _column = Rom.id
+            return Rom.id
+
+        if order_by == "relevance" and self._fulltext_query(search_term):
+            return match(
+                Rom.search_text, against=self._fulltext_query(search_term)
+            ).in_boolean_mode()
+
+        return func.lower(func.coalesce(Rom.name, ""))
+
+    def _order(self, data, order_by: str, order_dir: str, search_term: str = ""):
+        _column = self._sort_column(order_by, search_term)
+
+        # The id breaks ties so the order is stable across pages
+        if order_dir == "desc":
+            return data.order_by(_column.desc(), Rom.id.desc())
         else:
-            _column = func.lower(Rom.name)
+            return data.order_by(_column.asc(), Rom.id.asc())
+
+    def _after_keyset(
+        self,
+        data,
+        order_by: str,
+        order_dir: str,
+        keyset: tuple,
+        search_term: str = "",
+    ):
+        """Only keep the roms placed after the (sort value, id) keyset"""
+        _column = self._sort_column(order_by, search_term)
+        sort_value, rom_id = keyset
 
         if order_dir == "desc":
-            return data.order_by(_column.desc())
+            return data.where(
+                or_(_column < sort_value, and_(_column == sort_value, Rom.id < rom_id))
+            )
         else:
-            return data.order_by(_column.asc())
+            return data.where(
+                or_(_column > sort_value, and_(_column == sort_value, Rom.id > rom_id))
+            )
 
     @begin_session
     @with_details
     def add_rom(self, rom: Rom, query: Query = None, session: Session = None) -> Rom:
+        rom.search_text = _search_text(
+            rom.name, rom.file_name, rom.igdb_metadata, rom.moby_metadata
+        )
         rom = session.merge(rom)
         session.flush()
+        self._refresh_rom_sibling_roms(rom.id, session=session)
 
         return session.scalar(query.filter_by(id=rom.id).limit(1))
 
@@ -112,16 +229,109 @@ class DBRomsHandler(DBBaseHandler):
         order_by: str = "name",
         order_dir: str = "asc",
         limit: int | None = None,
+        compact: bool = False,
         query: Query = None,
         session: Session = None,
     ) -> list[Rom]:
+        if compact:
+            query = query.options(load_only(*COMPACT_ROM_COLUMNS))
+
         filtered_query = self._filter(
             query, platform_id, collection_id, search_term, session
         )
-        ordered_query = self._order(filtered_query, order_by, order_dir)
+        ordered_query = self._order(filtered_query, order_by, order_dir, search_term)
         limited_query = ordered_query.limit(limit)
         return session.scalars(limited_query).unique().all()
 
+    @begin_session
+    @with_simple
+    def get_roms_page(
+        self,
+        *,
+        platform_id: int | None = None,
+        collection_id: int | None = None,
+        search_term: str = "",
+        order_by: str = "name",
+        order_dir: str = "asc",
+        page_size: int = 50,
+        keyset: tuple | None = None,
+        compact: bool = False,
+        query: Query = None,
+        session: Session = None,
+    ) -> tuple[list[Rom], tuple | None]:
+        """Get a page of roms with keyset pagination
+
+        Args:
+            page_size: max number of roms in the page
+            keyset: (sort value, id) of the last rom of the previous page
+            compact: only load the columns needed to list the roms
+        Returns
+            The roms of the page and the keyset of the next page, if any
+        """
+        if compact:
+            query = query.options(load_only(*COMPACT_ROM_COLUMNS))
+
+        filtered_query = self._filter(
+            query, platform_id, collection_id, search_term, session
+        )
+        if keyset:
+            filtered_query = self._after_keyset(
+                filtered_query, order_by, order_dir, keyset, search_term
+            )
+        ordered_query = self._order(
+            filtered_query, order_by, order_dir, search_term
+        ).add_columns(self._sort_column(order_by, search_term).label("sort_value"))
+
+        # One extra row tells if there is a next page
+        rows = session.execute(ordered_query.limit(page_size + 1)).all()
+        if len(rows) <= page_size:
+            return [row[0] for row in rows], None
+
+        rows = rows[:page_size]
+        return [row[0] for row in rows], (rows[-1].sort_value, rows[-1][0].id)
+
+    @begin_session
+    def count_roms(
+        self,
+        *,
+        platform_id: int | None = None,
+        collection_id: int | None = None,
+        search_term: str = "",
+        session: Session = None,
+    ) -> int:
+        filtered_query = self._filter(
+            select(Rom.id), platform_id, collection_id, search_term, session
+        )
+        return session.scalar(
+            select(func.count()).select_from(filtered_query.subquery())
+        )
+
+    @begin_session
+    def get_roms_by_ids(self, ids: list[int], session: Session = None) -> list[Rom]:
+        return session.scalars(select(Rom).where(Rom.id.in_(ids))).all()  # type: ignore[return-value]
+
+    @begin_session
+    def get_roms_by_file_name(
+        self,
+        platform_id: int,
+        file_names: list[str] | None = None,
+        session: Session = None,
+    ) -> dict[str, Row]:
+        """Lightweight view of the roms of a platform, used while scanning
+
+        Returns:
+            dict with the id, igdb_id, moby_id and file CRCs of each rom by file name
+        """
+        query = select(
+            Rom.id, Rom.file_name, Rom.igdb_id, Rom.moby_id, Rom.file_crcs
+        ).where(Rom.platform_id == platform_id)
+        if file_names is not None:
+            query = query.where(Rom.file_name.in_(file_names))
+
+        rows = session.execute(query).all()
+
+        return {row.file_name: row for row in rows}
+
     @begin_session
     @with_details
     def get_rom_by_filename(
@@ -159,26 +369,72 @@ class DBRomsHandler(DBBaseHandler):
         self, rom: Rom, query: Query = None, session: Session = None
     ) -> list[Rom]:
         return session.scalars(
-            query.where(
-                and_(
-                    Rom.platform_id == rom.platform_id,
-                    Rom.id != rom.id,
-                    or_(
-                        and_(
-                            Rom.igdb_id == rom.igdb_id,
-                            Rom.igdb_id.isnot(None),
-                            Rom.igdb_id != "",
-                        ),
-                        and_(
-                            Rom.moby_id == rom.moby_id,
-                            Rom.moby_id.isnot(None),
-                            Rom.moby_id != "",
-                        ),
-                    ),
-                )
+            query.join(SiblingRom, SiblingRom.sibling_rom_id == Rom.id).where(
+                SiblingRom.rom_id == rom.id
             )
         ).all()
 
+    @staticmethod
+    def _sibling_pairs(sibling):
+        """Select the (rom_id, sibling_rom_id) pairs of roms sharing an id"""
+        return select(Rom.id, sibling.id).join(
+            sibling,
+            and_(
+                sibling.platform_id == Rom.platform_id,
+                sibling.id != Rom.id,
+                or_(
+                    and_(sibling.igdb_id == Rom.igdb_id, Rom.igdb_id.isnot(None)),
+                    and_(sibling.moby_id == Rom.moby_id, Rom.moby_id.isnot(None)),
+                ),
+            ),
+        )
+
+    @begin_session
+    def refresh_sibling_roms(self, platform_id: int, session: Session = None) -> None:
+        """Rebuild the sibling pairs of all the roms of a platform"""
+        session.execute(
+            delete(SiblingRom).where(
+                SiblingRom.rom_id.in_(
+                    select(Rom.id).where(Rom.platform_id == platform_id)
+                )
+            )
+        )
+
+        session.execute(
+            insert(SiblingRom).from_select(
+                ["rom_id", "sibling_rom_id"],
+                self._sibling_pairs(aliased(Rom)).where(
+                    Rom.platform_id == platform_id
+                ),
+            )
+        )
+
+    @begin_session
+    def refresh_roms_sibling_roms(
+        self, ids: list[int], session: Session = None
+    ) -> None:
+        """Rebuild the sibling pairs of a few roms, instead of the whole platform"""
+        for id in ids:
+            self._refresh_rom_sibling_roms(id, session=session)
+
+    def _refresh_rom_sibling_roms(self, id: int, session: Session) -> None:
+        session.execute(
+            delete(SiblingRom).where(
+                or_(SiblingRom.rom_id == id, SiblingRom.sibling_rom_id == id)
+            )
+        )
+
+        # Siblings are symmetric, so the rom is added to its siblings too
+        sibling = aliased(Rom)
+        session.execute(
+            insert(SiblingRom).from_select(
+                ["rom_id", "sibling_rom_id"],
+                self._sibling_pairs(sibling).where(
+                    or_(Rom.id == id, sibling.id == id)
+                ),
+            )
+        )
+
     @begin_session
     def get_rom_collections(
         self, rom: Rom, user_id: int, session: Session = None
@@ -187,8 +443,9 @@ class DBRomsHandler(DBBaseHandler):
         return (
             session.scalars(
                 select(Collection)
+                .join(CollectionRom, CollectionRom.collection_id == Collection.id)
                 .filter(
-                    func.json_contains(Collection.roms, f"{rom.id}"),
+                    CollectionRom.rom_id == rom.id,
                     Collection.user_id == user_id,
                 )
                 .order_by(Collection.name.asc())
@@ -199,13 +456,146 @@ class DBRomsHandler(DBBaseHandler):
 
     @begin_session
     def update_rom(self, id: int, data: dict, session: Session = None) -> Rom:
-        return session.execute(
+        result = session.execute(
             update(Rom)
             .where(Rom.id == id)
             .values(**data)
             .execution_options(synchronize_session="evaluate")
         )
 
+        if SEARCH_TEXT_FIELDS.intersection(data):
+            self._refresh_search_text(id, session=session)
+
+        if SIBLING_FIELDS.intersection(data):
+            self._refresh_rom_sibling_roms(id, session=session)
+
+        return result
+
+    def _refresh_search_text(self, id: int, session: Session) -> None:
+        row = session.execute(
+            select(Rom.name, Rom.file_name, Rom.igdb_metadata, Rom.moby_metadata)
+            .where(Rom.id == id)
+            .limit(1)
+        ).first()
+        if not row:
+            return
+
+        session.execute(
+            update(Rom)
+            .where(Rom.id == id)
+            .values(search_text=_search_text(*row))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _rom_values(rom: Rom) -> dict[str, Any]:
+        values = {}
+        for column in Rom.__table__.columns:
+            if column.key in ("created_at", "updated_at"):
+                continue
+
+            value = getattr(rom, column.key)
+            # Column defaults are not applied to objects that were never flushed
+            if value is None and column.default is not None:
+                default = column.default.arg  # type: ignore[attr-defined]
+                value = default(None) if callable(default) else default
+
+            values[column.key] = value
+
+        values["search_text"] = _search_text(
+            rom.name, rom.file_name, rom.igdb_metadata, rom.moby_metadata
+        )
+        return values
+
+    @staticmethod
+    def _rom_update_keys(rom: Rom) -> frozenset[str]:
+        """Columns that were set on a rom, leaving out the ones never updated"""
+        return frozenset(
+            key
+            for key in inspect(rom).dict
+            if key in Rom.__table__.columns
+            and key not in ("id", "created_at", "updated_at", "search_text")
+        )
+
+    @begin_session
+    def bulk_upsert_roms(
+        self, roms: list[Rom], chunk_size: int = 500, session: Session = None
+    ) -> list[Rom]:
+        """Insert new roms and update existing ones (matched by id) in chunks
+
+        Args:
+            roms: roms of the same platform
+            chunk_size: number of rows written per statement
+        Returns:
+            The stored roms, in the same order
+        """
+        if not roms:
+            return []
+
+        # Existing rows only get the columns set on the roms, like a merge would,
+        # so roms sharing the same set columns are written together
+        roms_by_keys: dict[frozenset[str], list[Rom]] = {}
+        for rom in roms:
+            roms_by_keys.setdefault(self._rom_update_keys(rom), []).append(rom)
+
+        for update_keys, keys_roms in roms_by_keys.items():
+            # The search text can only be built from the values being written
+            if SEARCH_TEXT_FIELDS <= update_keys:
+                update_keys |= {"search_text"}
+
+            for roms_chunk in batched(keys_roms, chunk_size):
+                stmt = insert(Rom).values(
+                    [self._rom_values(rom) for rom in roms_chunk]
+                )
+                session.execute(
+                    stmt.on_duplicate_key_update(
+                        {key: stmt.inserted[key] for key in sorted(update_keys)}
+                        | {"updated_at": func.now()}
+                    )
+                )
+
+        # New roms only get an id once inserted, so read them back by file name
+        stored_roms = {
+            rom.file_name: rom
+            for rom in session.scalars(
+                select(Rom).where(
+                    Rom.platform_id == roms[0].platform_id,
+                    Rom.file_name.in_([rom.file_name for rom in roms]),  # type: ignore[attr-defined]
+                )
+            )
+        }
+
+        # Built from the stored values, in a single statement for all the roms
+        search_texts = []
+        for rom in roms:
+            if SEARCH_TEXT_FIELDS <= self._rom_update_keys(rom):
+                continue
+
+            stored_rom = stored_roms[rom.file_name]
+            search_texts.append(
+                {
+                    "id": stored_rom.id,
+                    "search_text": _search_text(
+                        stored_rom.name,
+                        stored_rom.file_name,
+                        stored_rom.igdb_metadata,
+                        stored_rom.moby_metadata,
+                    ),
+                }
+            )
+        if search_texts:
+            session.execute(update(Rom), search_texts)
+
+        return [stored_roms[rom.file_name] for rom in roms]
+
+    @begin_session
+    def bulk_update_roms(self, data: list[dict], session: Session = None) -> None:
+        """Update several roms at once, each dict must contain the rom id"""
+        if not data:
+            return
+
+        session.execute(update(Rom), data)
+
     @begin_session
     def delete_rom(self, id: int, session: Session = None) -> Rom:
         return session.execute(
@@ -222,6 +612,62 @@ class DBRomsHandler(DBBaseHandler):
             delete(Rom)
             .where(and_(Rom.platform_id == platform_id, Rom.file_name.not_in(roms)))  # type: ignore[attr-defined]
             .execution_options(synchronize_session="evaluate")
+        ).rowcount
+
+    @begin_session
+    def delete_roms_by_file_name(
+        self, platform_id: int, file_names: list[str], session: Session = None
+    ) -> int:
+        return session.execute(
+            delete(Rom)
+            .where(and_(Rom.platform_id == platform_id, Rom.file_name.in_(file_names)))  # type: ignore[attr-defined]
+            .execution_options(synchronize_session="evaluate")
+        )
+
+    @begin_session
+    def get_rom_snapshots(
+        self,
+        platform_id: int,
+        file_names: list[str] | None = None,
+        session: Session = None,
+    ) -> dict[str, Row]:
+        """Filesystem stats of the roms of a platform when they were last scanned
+
+        Returns:
+            dict with the rom id and stats by file name
+        """
+        query = (
+            select(
+                Rom.id,
+                Rom.file_name,
+                RomSnapshot.st_size,
+                RomSnapshot.st_mtime_ns,
+                RomSnapshot.st_ino,
+            )
+            .join(RomSnapshot, RomSnapshot.rom_id == Rom.id)
+            .where(Rom.platform_id == platform_id)
+        )
+        if file_names is not None:
+            query = query.where(Rom.file_name.in_(file_names))
+
+        rows = session.execute(query).all()
+
+        return {row.file_name: row for row in rows}
+
+    @begin_session
+    def upsert_rom_snapshots(
+        self, snapshots: list[dict], session: Session = None
+    ) -> None:
+        if not snapshots:
+            return
+
+        stmt = insert(RomSnapshot).values(snapshots)
+        session.execute(
+            stmt.on_duplicate_key_update(
+                st_size=stmt.inserted.st_size,
+                st_mtime_ns=stmt.inserted.st_mtime_ns,
+                st_ino=stmt.inserted.st_ino,
+            )
         )
 
     @begin_session
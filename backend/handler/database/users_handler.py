@@ -1,12 +1,31 @@
+import threading
+from datetime import datetime
+from typing import Final
+
+from config import USER_CACHE_TTL, USER_LAST_ACTIVE_INTERVAL
 from decorators.database import begin_session
+from handler.redis_handler import cache
 from models.user import Role, User
 from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
+from utils.cache import TTLCache
 
 from .base_handler import DBBaseHandler
 
+# Bumped on every user change, so all the processes drop their cached users
+USERS_VERSION_KEY: Final = "romm:users:version"
+
 
 class DBUsersHandler(DBBaseHandler):
+    def __init__(self) -> None:
+        super().__init__()
+        self._users_cache: TTLCache[str, tuple[str | None, User]] = TTLCache(
+            ttl=USER_CACHE_TTL
+        )
+        self._last_active: dict[int, datetime] = {}
+        self._last_active_lock = threading.Lock()
+        self._last_active_timer: threading.Timer | None = None
+
     @begin_session
     def add_user(self, user: User, session: Session = None) -> User:
         return session.merge(user)
@@ -15,12 +34,40 @@ class DBUsersHandler(DBBaseHandler):
     def get_user_by_username(self, username: str, session: Session = None):
         return session.scalar(select(User).filter_by(username=username).limit(1))
 
+    def get_cached_user_by_username(self, username: str) -> User | None:
+        """Cached get_user_by_username, used to authenticate requests
+
+        A cached user is only served while the users version stored in redis is
+        the one it was loaded with, so changes made by any process are seen.
+        """
+        version = cache.get(USERS_VERSION_KEY)
+
+        cached_user = self._users_cache.get(username)
+        if cached_user is not None and cached_user[0] == version:
+            return cached_user[1]
+
+        user = self.get_user_by_username(username)
+        if user is not None:
+            self._users_cache.set(username, (version, user))
+
+        return user
+
+    def _invalidate_cached_users(self) -> None:
+        cache.incr(USERS_VERSION_KEY)
+        self._users_cache.clear()
+
     @begin_session
     def get_user(self, id: int, session: Session = None) -> User:
         return session.get(User, id)
 
+    def update_user(self, id: int, data: dict) -> User:
+        result = self._update_user(id, data)
+        # Only once committed, or the old user could be cached again meanwhile
+        self._invalidate_cached_users()
+        return result
+
     @begin_session
-    def update_user(self, id: int, data: dict, session: Session = None) -> User:
+    def _update_user(self, id: int, data: dict, session: Session = None) -> User:
         return session.execute(
             update(User)
             .where(User.id == id)
@@ -32,8 +79,13 @@ class DBUsersHandler(DBBaseHandler):
     def get_users(self, session: Session = None) -> list[User]:
         return session.scalars(select(User)).all()
 
+    def delete_user(self, id: int):
+        result = self._delete_user(id)
+        self._invalidate_cached_users()
+        return result
+
     @begin_session
-    def delete_user(self, id: int, session: Session = None):
+    def _delete_user(self, id: int, session: Session = None):
         return session.execute(
             delete(User)
             .where(User.id == id)
@@ -43,3 +95,35 @@ class DBUsersHandler(DBBaseHandler):
     @begin_session
     def get_admin_users(self, session: Session = None) -> list[User]:
         return session.scalars(select(User).filter_by(role=Role.ADMIN)).all()
+
+    def record_last_active(self, id: int) -> None:
+        """Buffer the activity of a user, written in batches in the background"""
+        with self._last_active_lock:
+            self._last_active[id] = datetime.now()
+
+            if self._last_active_timer is None:
+                self._last_active_timer = threading.Timer(
+                    USER_LAST_ACTIVE_INTERVAL, self.flush_last_active
+                )
+                self._last_active_timer.daemon = True
+                self._last_active_timer.start()
+
+    def flush_last_active(self) -> None:
+        with self._last_active_lock:
+            last_active = self._last_active
+            self._last_active = {}
+            if self._last_active_timer is not None:
+                self._last_active_timer.cancel()
+                self._last_active_timer = None
+
+        self._update_last_active(
+            [{"id": id, "last_active": date} for id, date in last_active.items()]
+        )
+
+    @begin_session
+    def _update_last_active(self, data: list[dict], session: Session = None) -> None:
+        if not data:
+            return
+
+        # Cached users aren't invalidated since only their activity changed
+        session.execute(update(User), data)
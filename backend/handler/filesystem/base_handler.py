@@ -7,6 +7,8 @@ from config.config_manager import config_manager as cm
 
 TAG_REGEX = re.compile(r"\(([^)]+)\)|\[([^]]+)\]")
 EXTENSION_REGEX = re.compile(r"\.(([a-z]+\.)*\w+)$")
+# Files still being uploaded, renamed once complete
+UPLOAD_PART_SUFFIX = ".romm-part"
 
 LANGUAGES = [
     ("Ar", "Arabic"),
@@ -119,6 +121,10 @@ class FSHandler:
             if not ext or ext in excluded_extensions:
                 excluded_files.append(file_name)
 
+            # Exclude the files still being uploaded.
+            if file_name.endswith(UPLOAD_PART_SUFFIX):
+                excluded_files.append(file_name)
+
             # Additionally, check if the file name mathes a pattern in the excluded list.
             if len(excluded_names) > 0:
                 for name in excluded_names:
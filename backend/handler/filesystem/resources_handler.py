@@ -1,18 +1,27 @@
+import asyncio
 import glob
+import hashlib
+import json
+import os
 import shutil
+from io import BytesIO
 from pathlib import Path
+from typing import Final
 
-import requests
+import httpx
 from config import RESOURCES_BASE_PATH
 from fastapi import HTTPException, status
 from logger.logger import log
 from models.collection import Collection
 from models.rom import Rom
 from PIL import Image
-from urllib3.exceptions import ProtocolError
+from utils.context import ctx_httpx_client
 
 from .base_handler import CoverSize, FSHandler
 
+# Source url, validators and content hash of the downloaded artwork of a folder
+ARTWORK_MANIFEST: Final = "artwork.json"
+
 
 class FSResourcesHandler(FSHandler):
     def __init__(self) -> None:
@@ -35,9 +44,76 @@ class FSResourcesHandler(FSHandler):
         return len(matched_files) > 0
 
     @staticmethod
-    def resize_cover_to_small(cover_path: str) -> None:
-        """Path of the cover image to resize"""
-        cover = Image.open(cover_path)
+    def _read_manifest(artwork_path: str) -> dict:
+        try:
+            with open(f"{artwork_path}/{ARTWORK_MANIFEST}") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _write_manifest(artwork_path: str, manifest: dict) -> None:
+        Path(artwork_path).mkdir(parents=True, exist_ok=True)
+        with open(f"{artwork_path}/{ARTWORK_MANIFEST}", "w") as f:
+            json.dump(manifest, f)
+
+    @staticmethod
+    def _remove_manifest(artwork_path: str) -> None:
+        try:
+            os.remove(f"{artwork_path}/{ARTWORK_MANIFEST}")
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _manifest_entry(url: str, res: httpx.Response, content_hash: str) -> dict:
+        return {
+            "url": url,
+            "etag": res.headers.get("etag", ""),
+            "last_modified": res.headers.get("last-modified", ""),
+            "hash": content_hash,
+        }
+
+    @staticmethod
+    def _conditional_headers(entry: dict) -> dict:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def _fetch_artwork(
+        self, url: str, entry: dict | None
+    ) -> tuple[httpx.Response | None, str]:
+        """Download an artwork unless the stored copy is still up to date
+
+        Args:
+            url: url of the artwork
+            entry: manifest entry of the stored copy, if its files exist
+        Returns
+            The response and the hash of its content, no response if unchanged
+        """
+        headers = {}
+        if entry and entry.get("url") == url:
+            headers = self._conditional_headers(entry)
+            # Without validators the same url is assumed to serve the same image
+            if not headers:
+                return None, entry["hash"]
+
+        httpx_client = ctx_httpx_client.get()
+        res = await httpx_client.get(
+            url, headers=headers, timeout=120, follow_redirects=True
+        )
+        if res.status_code == status.HTTP_304_NOT_MODIFIED:
+            return None, entry["hash"] if entry else ""
+
+        if res.status_code != status.HTTP_200_OK:
+            return None, ""
+
+        return res, hashlib.sha256(res.content).hexdigest()
+
+    @staticmethod
+    def _resize_cover_to_small(cover: Image.Image) -> Image.Image:
         if cover.height >= 1000:
             ratio = 0.2
         else:
@@ -45,41 +121,60 @@ class FSResourcesHandler(FSHandler):
         small_width = int(cover.width * ratio)
         small_height = int(cover.height * ratio)
         small_size = (small_width, small_height)
-        small_img = cover.resize(small_size)
+        return cover.resize(small_size)
+
+    def resize_cover_to_small(self, cover_path: str) -> None:
+        """Path of the cover image to resize"""
+        with Image.open(cover_path) as cover:
+            small_img = self._resize_cover_to_small(cover)
         small_img.save(cover_path)
 
-    def _store_cover(
-        self, entity: Rom | Collection, url_cover: str, size: CoverSize
-    ) -> None:
+    def _write_covers(self, entity: Rom | Collection, cover_content: bytes) -> None:
+        """Write the big cover as downloaded and the small one derived from it in memory"""
+        cover_path = f"{RESOURCES_BASE_PATH}/{entity.fs_resources_path}/cover"
+        Path(cover_path).mkdir(parents=True, exist_ok=True)
+
+        with open(f"{cover_path}/{CoverSize.BIG.value}.png", "wb") as f:
+            f.write(cover_content)
+
+        with Image.open(BytesIO(cover_content)) as cover:
+            small_img = self._resize_cover_to_small(cover)
+        small_img.save(f"{cover_path}/{CoverSize.SMALL.value}.png")
+
+    async def _store_cover(self, entity: Rom | Collection, url_cover: str) -> None:
         """Store roms resources in filesystem
 
         Args:
-            fs_slug: short name of the platform
-            rom_name: name of rom file
+            entity: rom or collection the cover belongs to
             url_cover: url to get the cover
-            size: size of the cover
         """
-        cover_file = f"{size.value}.png"
         cover_path = f"{RESOURCES_BASE_PATH}/{entity.fs_resources_path}/cover"
+        manifest = self._read_manifest(cover_path)
+        entry = (
+            manifest.get("cover")
+            if self.cover_exists(entity, CoverSize.SMALL)
+            and self.cover_exists(entity, CoverSize.BIG)
+            else None
+        )
 
         try:
-            res = requests.get(
-                url_cover,
-                stream=True,
-                timeout=120,
-            )
-        except requests.exceptions.ConnectionError as exc:
+            res, content_hash = await self._fetch_artwork(url_cover, entry)
+        except httpx.NetworkError as exc:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Unable to fetch cover at {url_cover}: {str(exc)}",
             ) from exc
 
-        if res.status_code == 200:
-            Path(cover_path).mkdir(parents=True, exist_ok=True)
-            with open(f"{cover_path}/{cover_file}", "wb") as f:
-                shutil.copyfileobj(res.raw, f)
-            if size == CoverSize.SMALL:
-                self.resize_cover_to_small(f"{cover_path}/{cover_file}")
+        if not res:
+            return
+
+        # Same image served again, keep the existing files
+        if not entry or entry["hash"] != content_hash:
+            # Decoding and resizing the image is CPU bound
+            await asyncio.to_thread(self._write_covers, entity, res.content)
+
+        manifest["cover"] = self._manifest_entry(url_cover, res, content_hash)
+        self._write_manifest(cover_path, manifest)
 
     @staticmethod
     def _get_cover_path(entity: Rom | Collection, size: CoverSize) -> str:
@@ -98,22 +193,25 @@ class FSResourcesHandler(FSHandler):
             matched_files[0].replace(RESOURCES_BASE_PATH, "") if matched_files else ""
         )
 
-    def get_cover(
+    async def get_cover(
         self, entity: Rom | Collection | None, overwrite: bool, url_cover: str = ""
     ) -> tuple[str, str]:
         if not entity:
             return "", ""
 
-        if (overwrite or not self.cover_exists(entity, CoverSize.SMALL)) and url_cover:
-            self._store_cover(entity, url_cover, CoverSize.SMALL)
+        # Both sizes come from a single download
+        if url_cover and (
+            overwrite
+            or not self.cover_exists(entity, CoverSize.SMALL)
+            or not self.cover_exists(entity, CoverSize.BIG)
+        ):
+            await self._store_cover(entity, url_cover)
+
         path_cover_s = (
             self._get_cover_path(entity, CoverSize.SMALL)
             if self.cover_exists(entity, CoverSize.SMALL)
             else ""
         )
-
-        if (overwrite or not self.cover_exists(entity, CoverSize.BIG)) and url_cover:
-            self._store_cover(entity, url_cover, CoverSize.BIG)
         path_cover_l = (
             self._get_cover_path(entity, CoverSize.BIG)
             if self.cover_exists(entity, CoverSize.BIG)
@@ -150,38 +248,53 @@ class FSResourcesHandler(FSHandler):
         )
         artwork_path = f"{RESOURCES_BASE_PATH}/{entity.fs_resources_path}/cover"
         Path(artwork_path).mkdir(parents=True, exist_ok=True)
+        # Uploaded artwork doesn't come from any url
+        FSResourcesHandler._remove_manifest(artwork_path)
 
         return path_cover_l, path_cover_s, artwork_path
 
     @staticmethod
-    def _store_screenshot(rom: Rom, url: str, idx: int):
+    def _write_screenshot(screenshot_path: str, screenshot_content: bytes) -> None:
+        Path(screenshot_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(screenshot_path, "wb") as f:
+            f.write(screenshot_content)
+
+    async def _store_screenshot(
+        self, rom: Rom, url: str, idx: int, entry: dict | None
+    ) -> dict | None:
         """Store roms resources in filesystem
 
         Args:
-            fs_slug: short name of the platform
-            file_name: name of rom
+            rom: rom the screenshot belongs to
             url: url to get the screenshot
+            idx: index number of screenshot
+            entry: manifest entry of the stored screenshot
+        Returns
+            The manifest entry of the screenshot
         """
-        screenshot_file = f"{idx}.jpg"
         screenshot_path = f"{RESOURCES_BASE_PATH}/{rom.fs_resources_path}/screenshots"
+        screenshot_file = f"{screenshot_path}/{idx}.jpg"
+        if not os.path.exists(screenshot_file):
+            entry = None
 
         try:
-            res = requests.get(url, stream=True, timeout=120)
-        except requests.exceptions.ConnectionError as exc:
+            res, content_hash = await self._fetch_artwork(url, entry)
+        except httpx.NetworkError as exc:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Unable to fetch screenshot at {url}: {str(exc)}",
             ) from exc
+        except httpx.TransportError:
+            log.warning(f"Failure downloading screenshot {url}")
+            return None
+
+        if not res:
+            return entry if content_hash else None
+
+        if not entry or entry["hash"] != content_hash:
+            await asyncio.to_thread(self._write_screenshot, screenshot_file, res.content)
 
-        if res.status_code == 200:
-            Path(screenshot_path).mkdir(parents=True, exist_ok=True)
-            with open(f"{screenshot_path}/{screenshot_file}", "wb") as f:
-                try:
-                    shutil.copyfileobj(res.raw, f)
-                except ProtocolError:
-                    log.warning(
-                        f"Failure writing screenshot {url} to file (ProtocolError)"
-                    )
+        return self._manifest_entry(url, res, content_hash)
 
     @staticmethod
     def _get_screenshot_path(rom: Rom, idx: str):
@@ -194,13 +307,30 @@ class FSResourcesHandler(FSHandler):
         """
         return f"{rom.fs_resources_path}/screenshots/{idx}.jpg"
 
-    def get_rom_screenshots(self, rom: Rom | None, url_screenshots: list) -> list[str]:
+    async def get_rom_screenshots(
+        self, rom: Rom | None, url_screenshots: list
+    ) -> list[str]:
         if not rom:
             return []
 
-        path_screenshots: list[str] = []
-        for idx, url in enumerate(url_screenshots):
-            self._store_screenshot(rom, url, idx)
-            path_screenshots.append(self._get_screenshot_path(rom, str(idx)))
+        screenshots_path = f"{RESOURCES_BASE_PATH}/{rom.fs_resources_path}/screenshots"
+        manifest = self._read_manifest(screenshots_path)
+
+        # Screenshots are downloaded in parallel
+        entries = await asyncio.gather(
+            *[
+                self._store_screenshot(rom, url, idx, manifest.get(str(idx)))
+                for idx, url in enumerate(url_screenshots)
+            ]
+        )
+
+        stored_entries = {
+            str(idx): entry for idx, entry in enumerate(entries) if entry
+        }
+        if stored_entries != manifest:
+            self._write_manifest(screenshots_path, stored_entries)
 
-        return path_screenshots
+        return [
+            self._get_screenshot_path(rom, str(idx))
+            for idx in range(len(url_screenshots))
+        ]
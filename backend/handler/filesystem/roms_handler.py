@@ -7,7 +7,7 @@ from config import LIBRARY_BASE_PATH
 from config.config_manager import config_manager as cm
 from exceptions.fs_exceptions import RomAlreadyExistsException, RomsNotFoundException
 from models.platform import Platform
-from utils.filesystem import iter_directories, iter_files
+from utils.zip import file_crc32
 
 from .base_handler import (
     LANGUAGES_BY_SHORTCODE,
@@ -15,6 +15,7 @@ from .base_handler import (
     REGIONS_BY_SHORTCODE,
     REGIONS_NAME_KEYS,
     TAG_REGEX,
+    UPLOAD_PART_SUFFIX,
     FSHandler,
 )
 
@@ -93,26 +94,47 @@ class FSRomsHandler(FSHandler):
 
         return rom_files
 
-    def get_roms(self, platform: Platform):
-        """Gets all filesystem roms for a platform
+    def get_roms_snapshot(
+        self, platform: Platform, file_names: list[str] | None = None
+    ) -> list[dict]:
+        """Gets all filesystem roms for a platform along with their stats
+
+        The files of multi-file roms are only stat'ed, not read, so this is cheap
+        enough to run on every scan.
 
         Args:
             platform: platform where roms belong
+            file_names: only stat these top-level entries instead of listing the
+                platform folder, the ones missing on disk are left out
         Returns:
-            list with all the filesystem roms for a platform found in the LIBRARY_BASE_PATH
+            list with the filesystem roms for a platform and the size, mtime and inode
+            of each top-level file or directory, where the size and mtime of a
+            multi-file rom are the total size and latest mtime of its content
         """
         roms_path = self.get_roms_fs_structure(platform.fs_slug)
         roms_file_path = f"{LIBRARY_BASE_PATH}/{roms_path}"
 
-        try:
-            fs_single_roms = [f for _, f in iter_files(roms_file_path)]
-        except IndexError as exc:
-            raise RomsNotFoundException(platform.fs_slug) from exc
-
-        try:
-            fs_multi_roms = [d for _, d in iter_directories(roms_file_path)]
-        except IndexError as exc:
-            raise RomsNotFoundException(platform.fs_slug) from exc
+        fs_entries: dict[str, os.DirEntry | Path]
+        if file_names is not None:
+            if not os.path.isdir(roms_file_path):
+                raise RomsNotFoundException(platform.fs_slug)
+
+            fs_entries = {
+                name: Path(roms_file_path, name)
+                for name in file_names
+                if name
+                and os.path.basename(name) == name
+                and os.path.exists(f"{roms_file_path}/{name}")
+            }
+        else:
+            try:
+                with os.scandir(roms_file_path) as entries:
+                    fs_entries = {entry.name: entry for entry in entries}
+            except FileNotFoundError as exc:
+                raise RomsNotFoundException(platform.fs_slug) from exc
+
+        fs_single_roms = [n for n, e in fs_entries.items() if not e.is_dir()]
+        fs_multi_roms = [n for n, e in fs_entries.items() if e.is_dir()]
 
         fs_roms: list[dict] = [
             {"multi": False, "file_name": rom}
@@ -122,12 +144,65 @@ class FSRomsHandler(FSHandler):
             for rom in self._exclude_multi_roms(fs_multi_roms)
         ]
 
-        return [
-            dict(
-                rom,
-                files=self.get_rom_files(rom["file_name"], roms_file_path),
+        for rom in fs_roms:
+            stat = fs_entries[rom["file_name"]].stat()
+            st_size, st_mtime_ns = stat.st_size, stat.st_mtime_ns
+            if rom["multi"]:
+                # Files rewritten in place don't change their folder
+                st_size, content_mtime_ns = self._get_tree_stats(
+                    f"{roms_file_path}/{rom['file_name']}"
+                )
+                st_mtime_ns = max(st_mtime_ns, content_mtime_ns)
+
+            rom.update(
+                {
+                    "st_size": st_size,
+                    "st_mtime_ns": st_mtime_ns,
+                    "st_ino": stat.st_ino,
+                }
             )
-            for rom in fs_roms
+
+        return fs_roms
+
+    def _get_tree_stats(self, path: str) -> tuple[int, int]:
+        """Total size of the files under a folder and latest mtime of its entries"""
+        st_size, st_mtime_ns = 0, 0
+        with os.scandir(path) as entries:
+            for entry in entries:
+                stat = entry.stat()
+                st_mtime_ns = max(st_mtime_ns, stat.st_mtime_ns)
+                if entry.is_dir():
+                    tree_size, tree_mtime_ns = self._get_tree_stats(entry.path)
+                    st_size += tree_size
+                    st_mtime_ns = max(st_mtime_ns, tree_mtime_ns)
+                else:
+                    st_size += stat.st_size
+
+        return st_size, st_mtime_ns
+
+    def add_rom_files(self, platform: Platform, fs_rom: dict) -> dict:
+        """Lists the files of a filesystem rom, walking it if it's a multi-file rom"""
+        if not fs_rom["multi"]:
+            return dict(fs_rom, files=[])
+
+        roms_path = self.get_roms_fs_structure(platform.fs_slug)
+        return dict(
+            fs_rom,
+            files=self.get_rom_files(
+                fs_rom["file_name"], f"{LIBRARY_BASE_PATH}/{roms_path}"
+            ),
+        )
+
+    def get_roms(self, platform: Platform) -> list[dict]:
+        """Gets all filesystem roms for a platform
+
+        Args:
+            platform: platform where roms belong
+        Returns:
+            list with all the filesystem roms for a platform found in the LIBRARY_BASE_PATH
+        """
+        return [
+            self.add_rom_files(platform, rom) for rom in self.get_roms_snapshot(platform)
         ]
 
     def get_rom_file_size(
@@ -150,6 +225,43 @@ class FSRomsHandler(FSHandler):
         )
         return sum([os.stat(file).st_size for file in files])
 
+    def get_rom_files_crcs(
+        self,
+        roms_path: str,
+        file_name: str,
+        multi_files: list[str],
+        previous_crcs: dict[str, dict] | None = None,
+    ) -> dict[str, dict]:
+        """Gets the CRC32 of the files of a multi-file rom
+
+        Args:
+            previous_crcs: CRCs found by the last scan, reused for the files
+                which size and mtime didn't change
+        Returns:
+            dict with the size, mtime and CRC32 of each file by name
+        """
+        previous_crcs = previous_crcs or {}
+        file_crcs = {}
+
+        for file in multi_files:
+            file_path = f"{LIBRARY_BASE_PATH}/{roms_path}/{file_name}/{file}"
+            stat = os.stat(file_path)
+            previous = previous_crcs.get(file, {})
+            if (
+                previous.get("size") == stat.st_size
+                and previous.get("mtime_ns") == stat.st_mtime_ns
+            ):
+                file_crcs[file] = previous
+                continue
+
+            file_crcs[file] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "crc": file_crc32(file_path),
+            }
+
+        return file_crcs
+
     def file_exists(self, path: str, file_name: str):
         """Check if file exists in filesystem
 
@@ -174,3 +286,35 @@ class FSRomsHandler(FSHandler):
     def build_upload_file_path(self, fs_slug: str):
         file_path = self.get_roms_fs_structure(fs_slug)
         return f"{LIBRARY_BASE_PATH}/{file_path}"
+
+    def build_upload_part_path(self, roms_path: str, file_name: str) -> str:
+        """Path of the file receiving an upload, in the same directory so it can be renamed"""
+        return f"{roms_path}/.{file_name}{UPLOAD_PART_SUFFIX}"
+
+    def get_upload_offset(self, part_path: str) -> int:
+        try:
+            return os.path.getsize(part_path)
+        except FileNotFoundError:
+            return 0
+
+    def build_upload_length_path(self, roms_path: str, file_name: str) -> str:
+        """Path of the file keeping the declared length of an upload"""
+        return f"{roms_path}/.{file_name}.length{UPLOAD_PART_SUFFIX}"
+
+    def get_upload_length(self, length_path: str) -> int | None:
+        try:
+            with open(length_path) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set_upload_length(self, length_path: str, upload_length: int) -> None:
+        with open(length_path, "w") as f:
+            f.write(str(upload_length))
+
+    def remove_upload_files(self, *paths: str) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,21 +1,36 @@
 import os
 from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
 
 import pytest
+from endpoints.sockets.scan import _snapshot_changed
 from handler.filesystem import fs_platform_handler, fs_resource_handler, fs_rom_handler
 from models.platform import Platform
+from utils.context import initialize_context
 
 
 @pytest.mark.vcr
-def test_get_rom_cover():
-    path_cover_s, path_cover_l = fs_resource_handler.get_cover(
-        overwrite=False, entity=None, url_cover=""
-    )
+async def test_get_rom_cover():
+    async with initialize_context():
+        path_cover_s, path_cover_l = await fs_resource_handler.get_cover(
+            overwrite=False, entity=None, url_cover=""
+        )
 
     assert "" in path_cover_s
     assert "" in path_cover_l
 
 
+async def test_fetch_artwork_unchanged_url():
+    url = "https://images.igdb.com/igdb/image/upload/t_cover_big/co1qda.png"
+    res, content_hash = await fs_resource_handler._fetch_artwork(
+        url, {"url": url, "etag": "", "last_modified": "", "hash": "abc"}
+    )
+
+    assert res is None
+    assert content_hash == "abc"
+
+
 def test_get_platforms():
     platforms = fs_platform_handler.get_platforms()
 
@@ -41,6 +56,69 @@ def test_get_roms():
     assert roms[1]["multi"]
 
 
+def test_get_roms_snapshot():
+    platform = Platform(name="Nintendo 64", slug="n64", fs_slug="n64")
+    roms = fs_rom_handler.get_roms_snapshot(platform=platform)
+
+    assert len(roms) == 2
+    assert roms[0]["file_name"] == "Paper Mario (USA).z64"
+    assert roms[0]["st_size"] == 1024
+    assert roms[0]["st_mtime_ns"] > 0
+    assert "files" not in roms[1]
+
+    rom = fs_rom_handler.add_rom_files(platform, roms[1])
+    assert len(rom["files"]) == 2
+
+    # Only the listed entries are looked up, missing ones are left out
+    roms = fs_rom_handler.get_roms_snapshot(
+        platform=platform,
+        file_names=["Super Mario 64 (J) (Rev A)", "Missing.z64", "../n64"],
+    )
+    assert len(roms) == 1
+    assert roms[0]["file_name"] == "Super Mario 64 (J) (Rev A)"
+    assert roms[0]["multi"]
+
+
+def test_get_roms_snapshot_multi_file_rom_content(tmp_path):
+    platform = Platform(name="Nintendo 64", slug="n64", fs_slug="n64")
+    rom_path = tmp_path / "n64" / "roms" / "Multi Disc Game"
+    (rom_path / "extras").mkdir(parents=True)
+    (rom_path / "disc 1.bin").write_bytes(b"1" * 100)
+    (rom_path / "extras" / "manual.pdf").write_bytes(b"2" * 50)
+
+    with patch("handler.filesystem.roms_handler.LIBRARY_BASE_PATH", str(tmp_path)):
+        [fs_rom] = fs_rom_handler.get_roms_snapshot(platform=platform)
+        assert fs_rom["multi"]
+        assert fs_rom["st_size"] == 150
+        rom_snapshot = SimpleNamespace(
+            st_size=fs_rom["st_size"],
+            st_mtime_ns=fs_rom["st_mtime_ns"],
+            st_ino=fs_rom["st_ino"],
+        )
+
+        # A file of the rom rewritten in place leaves its folder untouched
+        folder_stat = rom_path.stat()
+        (rom_path / "disc 1.bin").write_bytes(b"3" * 100)
+        stat = (rom_path / "disc 1.bin").stat()
+        os.utime(
+            rom_path / "disc 1.bin",
+            ns=(stat.st_atime_ns, fs_rom["st_mtime_ns"] + 1_000_000_000),
+        )
+        assert rom_path.stat().st_mtime_ns == folder_stat.st_mtime_ns
+
+        [fs_rom] = fs_rom_handler.get_roms_snapshot(platform=platform)
+        assert fs_rom["st_size"] == 150
+        assert _snapshot_changed(fs_rom, rom_snapshot)
+
+        # So is a file added to a subfolder
+        rom_snapshot.st_mtime_ns = fs_rom["st_mtime_ns"]
+        (rom_path / "extras" / "box.png").write_bytes(b"4" * 10)
+
+        [fs_rom] = fs_rom_handler.get_roms_snapshot(platform=platform)
+        assert fs_rom["st_size"] == 160
+        assert _snapshot_changed(fs_rom, rom_snapshot)
+
+
 def test_rom_size():
     rom_size = fs_rom_handler.get_rom_file_size(
         roms_path=fs_rom_handler.get_roms_fs_structure(fs_slug="n64"),
@@ -63,6 +141,32 @@ def test_rom_size():
     assert rom_size == 2048
 
 
+def test_get_rom_files_crcs():
+    roms_path = fs_rom_handler.get_roms_fs_structure(fs_slug="n64")
+    multi_files = [
+        "Super Mario 64 (J) (Rev A) [Part 1].z64",
+        "Super Mario 64 (J) (Rev A) [Part 2].z64",
+    ]
+
+    file_crcs = fs_rom_handler.get_rom_files_crcs(
+        roms_path=roms_path,
+        file_name="Super Mario 64 (J) (Rev A)",
+        multi_files=multi_files,
+    )
+
+    assert list(file_crcs.keys()) == multi_files
+    assert all(file_crc["size"] == 1024 for file_crc in file_crcs.values())
+
+    # Unchanged files keep the CRC of the previous scan
+    previous_crcs = {f: dict(file_crc, crc=1) for f, file_crc in file_crcs.items()}
+    assert fs_rom_handler.get_rom_files_crcs(
+        roms_path=roms_path,
+        file_name="Super Mario 64 (J) (Rev A)",
+        multi_files=multi_files,
+        previous_crcs=previous_crcs,
+    ) == previous_crcs
+
+
 def test_exclude_files():
     from config.config_manager import ConfigManager
 
@@ -2,8 +2,9 @@ import json
 import os
 import re
 import unicodedata
-from typing import Final
+from typing import Any, Final
 
+from config import SEARCH_CACHE_MISS_TTL, SEARCH_CACHE_TTL
 from handler.redis_handler import cache
 from logger.logger import log
 from tasks.update_switch_titledb import (
@@ -53,6 +54,25 @@ conditionally_set_cache(PS2_SERIAL_INDEX_KEY, "ps2_serial_index.json")
 PSP_SERIAL_INDEX_KEY: Final = "romm:psp_serial_index"
 conditionally_set_cache(PSP_SERIAL_INDEX_KEY, "psp_serial_index.json")
 
+# Responses of the metadata providers to search queries
+SEARCH_CACHE_KEY: Final = "romm:search_cache"
+
+
+def purge_search_cache() -> int:
+    """Delete all the cached search responses
+
+    Returns:
+        Number of deleted entries
+    """
+
+    deleted = 0
+    for keys_batch in batched(
+        cache.scan_iter(match=f"{SEARCH_CACHE_KEY}:*", count=1000), 1000
+    ):
+        deleted += cache.delete(*keys_batch)  # type: ignore[operator]
+
+    return deleted
+
 
 class MetadataHandler:
     @staticmethod
@@ -97,6 +117,28 @@ class MetadataHandler:
 
         return canonical_form
 
+    def _search_cache_key(
+        self, provider: str, endpoint: str, platform_id: int, search_term: str
+    ) -> str:
+        normalized_term = self._normalize_exact_match(search_term)
+        return f"{SEARCH_CACHE_KEY}:{provider}:{endpoint}:{platform_id}:{normalized_term}"
+
+    @staticmethod
+    def _get_cached_response(cache_key: str | None) -> Any | None:
+        if not cache_key:
+            return None
+
+        response = cache.get(cache_key)
+        return json.loads(response) if response is not None else None  # type: ignore[arg-type]
+
+    @staticmethod
+    def _cache_response(cache_key: str | None, response: Any, miss: bool) -> Any:
+        ttl = SEARCH_CACHE_MISS_TTL if miss else SEARCH_CACHE_TTL
+        if cache_key and ttl > 0:
+            cache.set(cache_key, json.dumps(response), ex=ttl)
+
+        return response
+
     async def _ps2_opl_format(self, match: re.Match[str], search_term: str) -> str:
         serial_code = match.group(1)
         index_entry = cache.hget(PS2_OPL_KEY, serial_code)
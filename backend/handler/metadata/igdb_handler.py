@@ -4,15 +4,15 @@ import sys
 import time
 from typing import Final, NotRequired
 
+import httpx
 import pydash
-import requests
-from config import IGDB_CLIENT_ID, IGDB_CLIENT_SECRET
+from config import IGDB_CLIENT_ID, IGDB_CLIENT_SECRET, IGDB_RATE_LIMIT
 from fastapi import HTTPException, status
 from handler.redis_handler import cache
 from logger.logger import log
-from requests.exceptions import HTTPError, Timeout
 from typing_extensions import TypedDict
 from unidecode import unidecode as uc
+from utils.context import ctx_httpx_client
 
 from .base_hander import (
     PS2_OPL_REGEX,
@@ -21,6 +21,7 @@ from .base_hander import (
     SWITCH_TITLEDB_REGEX,
     MetadataHandler,
 )
+from .rate_limiter import RateLimiter
 
 # Used to display the IGDB API status in the frontend
 IGDB_API_ENABLED: Final = bool(IGDB_CLIENT_ID) and bool(IGDB_CLIENT_SECRET)
@@ -189,41 +190,51 @@ class IGDBBaseHandler(MetadataHandler):
         self.search_fields = SEARCH_FIELDS
         self.pagination_limit = 200
         self.twitch_auth = TwitchAuth()
+        self.rate_limiter = RateLimiter("igdb", IGDB_RATE_LIMIT)
         self.headers = {
             "Client-ID": IGDB_CLIENT_ID,
-            "Authorization": f"Bearer {self.twitch_auth.get_oauth_token()}",
+            # Set on every call by the check_twitch_token decorator
+            "Authorization": "",
             "Accept": "application/json",
         }
 
     @staticmethod
     def check_twitch_token(func):
         @functools.wraps(func)
-        def wrapper(*args):
-            args[0].headers[
-                "Authorization"
-            ] = f"Bearer {args[0].twitch_auth.get_oauth_token()}"
-            return func(*args)
+        async def wrapper(*args):
+            token = await args[0].twitch_auth.get_oauth_token()
+            args[0].headers["Authorization"] = f"Bearer {token}"
+            return await func(*args)
 
         return wrapper
 
-    def _request(self, url: str, data: str, timeout: int = 120) -> list:
+    async def _request(
+        self, url: str, data: str, timeout: int = 120, cache_key: str | None = None
+    ) -> list:
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+        httpx_client = ctx_httpx_client.get()
         try:
-            res = requests.post(
+            await self.rate_limiter.acquire()
+            res = await httpx_client.post(
                 url,
-                f"{data} limit {self.pagination_limit};",
+                content=f"{data} limit {self.pagination_limit};",
                 headers=self.headers,
                 timeout=timeout,
             )
 
             res.raise_for_status()
-            return res.json()
-        except requests.exceptions.ConnectionError as exc:
+            roms = res.json()
+            return self._cache_response(cache_key, roms, miss=not roms)
+        except httpx.NetworkError as exc:
             log.critical("Connection error: can't connect to IGDB", exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Can't connect to IGDB, check your internet connection",
             ) from exc
-        except HTTPError as err:
+        except httpx.HTTPStatusError as err:
             # Retry once if the auth token is invalid
             if err.response.status_code != 401:
                 log.error(err)
@@ -231,28 +242,30 @@ class IGDBBaseHandler(MetadataHandler):
 
             # Attempt to force a token refresh if the token is invalid
             log.warning("Twitch token invalid: fetching a new one...")
-            token = self.twitch_auth._update_twitch_token()
+            token = await self.twitch_auth._update_twitch_token()
             self.headers["Authorization"] = f"Bearer {token}"
-        except Timeout:
+        except httpx.TimeoutException:
             # Retry once the request if it times out
             pass
 
         try:
-            res = requests.post(
+            await self.rate_limiter.acquire()
+            res = await httpx_client.post(
                 url,
-                f"{data} limit {self.pagination_limit};",
+                content=f"{data} limit {self.pagination_limit};",
                 headers=self.headers,
                 timeout=timeout,
             )
             res.raise_for_status()
-        except (HTTPError, Timeout) as err:
+        except (httpx.HTTPStatusError, httpx.TimeoutException) as err:
             # Log the error and return an empty list if the request fails again
             log.error(err)
             return []
 
-        return res.json()
+        roms = res.json()
+        return self._cache_response(cache_key, roms, miss=not roms)
 
-    def _search_rom(
+    async def _search_rom(
         self, search_term: str, platform_igdb_id: int, with_category: bool = False
     ) -> dict | None:
         if not platform_igdb_id:
@@ -264,17 +277,26 @@ class IGDBBaseHandler(MetadataHandler):
             if with_category
             else ""
         )
-        roms = self._request(
+        roms = await self._request(
             self.games_endpoint,
             data=f'search "{search_term}"; fields {",".join(self.games_fields)}; where platforms=[{platform_igdb_id}] {category_filter};',
+            cache_key=self._search_cache_key(
+                "igdb",
+                "games_with_category" if with_category else "games",
+                platform_igdb_id,
+                search_term,
+            ),
         )
-        roms_expanded = self._request(
+        roms_expanded = await self._request(
             self.search_endpoint,
             data=f'fields {",".join(self.search_fields)}; where game.platforms=[{platform_igdb_id}] & (name ~ *"{search_term}"* | alternative_name ~ *"{search_term}"*);',
+            cache_key=self._search_cache_key(
+                "igdb", "search", platform_igdb_id, search_term
+            ),
         )
         if roms_expanded:
             roms.extend(
-                self._request(
+                await self._request(
                     self.games_endpoint,
                     f'fields {",".join(self.games_fields)}; where id={roms_expanded[0]["game"]["id"]};',
                 )
@@ -296,11 +318,11 @@ class IGDBBaseHandler(MetadataHandler):
         return pydash.get(exact_matches or roms, "[0]", None)
 
     @check_twitch_token
-    def get_platform(self, slug: str) -> IGDBPlatform:
+    async def get_platform(self, slug: str) -> IGDBPlatform:
         if not IGDB_API_ENABLED:
             return IGDBPlatform(igdb_id=None, slug=slug)
 
-        platforms = self._request(
+        platforms = await self._request(
             self.platform_endpoint,
             data=f'fields {",".join(self.platforms_fields)}; where slug="{slug.lower()}";',
         )
@@ -314,7 +336,7 @@ class IGDBBaseHandler(MetadataHandler):
             )
 
         # Check if platform is a version if not found
-        platform_versions = self._request(
+        platform_versions = await self._request(
             self.platform_version_endpoint,
             data=f'fields {",".join(self.platforms_fields)}; where slug="{slug.lower()}";',
         )
@@ -398,21 +420,21 @@ class IGDBBaseHandler(MetadataHandler):
 
         search_term = self.normalize_search_term(search_term)
 
-        rom = self._search_rom(
+        rom = await self._search_rom(
             search_term, platform_igdb_id, with_category=True
-        ) or self._search_rom(search_term, platform_igdb_id)
+        ) or await self._search_rom(search_term, platform_igdb_id)
 
         # Split the search term since igdb struggles with colons
         if not rom and ":" in search_term:
             for term in search_term.split(":")[::-1]:
-                rom = self._search_rom(term, platform_igdb_id)
+                rom = await self._search_rom(term, platform_igdb_id)
                 if rom:
                     break
 
         # Some MAME games have two titles split by a slash
         if not rom and "/" in search_term:
             for term in search_term.split("/"):
-                rom = self._search_rom(term.strip(), platform_igdb_id)
+                rom = await self._search_rom(term.strip(), platform_igdb_id)
                 if rom:
                     break
 
@@ -437,11 +459,11 @@ class IGDBBaseHandler(MetadataHandler):
         )
 
     @check_twitch_token
-    def get_rom_by_id(self, igdb_id: int) -> IGDBRom:
+    async def get_rom_by_id(self, igdb_id: int) -> IGDBRom:
         if not IGDB_API_ENABLED:
             return IGDBRom(igdb_id=None)
 
-        roms = self._request(
+        roms = await self._request(
             self.games_endpoint,
             f'fields {",".join(self.games_fields)}; where id={igdb_id};',
         )
@@ -468,15 +490,15 @@ class IGDBBaseHandler(MetadataHandler):
         )
 
     @check_twitch_token
-    def get_matched_roms_by_id(self, igdb_id: int) -> list[IGDBRom]:
+    async def get_matched_roms_by_id(self, igdb_id: int) -> list[IGDBRom]:
         if not IGDB_API_ENABLED:
             return []
 
-        rom = self.get_rom_by_id(igdb_id)
+        rom = await self.get_rom_by_id(igdb_id)
         return [rom] if rom["igdb_id"] else []
 
     @check_twitch_token
-    def get_matched_roms_by_name(
+    async def get_matched_roms_by_name(
         self, search_term: str, platform_igdb_id: int
     ) -> list[IGDBRom]:
         if not IGDB_API_ENABLED:
@@ -486,12 +508,12 @@ class IGDBBaseHandler(MetadataHandler):
             return []
 
         search_term = uc(search_term)
-        matched_roms = self._request(
+        matched_roms = await self._request(
             self.games_endpoint,
             data=f'search "{search_term}"; fields {",".join(self.games_fields)}; where platforms=[{platform_igdb_id}];',
         )
 
-        alternative_matched_roms = self._request(
+        alternative_matched_roms = await self._request(
             self.search_endpoint,
             data=f'fields {",".join(self.search_fields)}; where game.platforms=[{platform_igdb_id}] & (name ~ *"{search_term}"* | alternative_name ~ *"{search_term}"*);',
         )
@@ -516,7 +538,7 @@ class IGDBBaseHandler(MetadataHandler):
                     )
                 )
             )
-            alternative_matched_roms = self._request(
+            alternative_matched_roms = await self._request(
                 self.games_endpoint,
                 f'fields {",".join(self.games_fields)}; where {id_filter};',
             )
@@ -560,7 +582,7 @@ class IGDBBaseHandler(MetadataHandler):
 
 
 class TwitchAuth:
-    def _update_twitch_token(self) -> str:
+    async def _update_twitch_token(self) -> str:
         token = None
         expires_in = 0
 
@@ -568,7 +590,7 @@ class TwitchAuth:
             return ""
 
         try:
-            res = requests.post(
+            res = await ctx_httpx_client.get().post(
                 url="https://id.twitch.tv/oauth2/token",
                 params={
                     "client_id": IGDB_CLIENT_ID,
@@ -584,7 +606,7 @@ class TwitchAuth:
             else:
                 token = res.json().get("access_token", "")
                 expires_in = res.json().get("expires_in", 0)
-        except requests.exceptions.ConnectionError:
+        except httpx.NetworkError:
             log.critical("Can't connect to IGDB, check your internet connection.")
             return ""
 
@@ -599,7 +621,7 @@ class TwitchAuth:
 
         return token
 
-    def get_oauth_token(self) -> str:
+    async def get_oauth_token(self) -> str:
         # Use a fake token when running tests
         if "pytest" in sys.modules:
             return "test_token"
@@ -613,7 +635,7 @@ class TwitchAuth:
 
         if not token or time.time() > float(token_expires_at or 0):
             log.warning("Twitch token invalid: fetching a new one...")
-            return self._update_twitch_token()
+            return await self._update_twitch_token()
 
         return token
 
@@ -1,17 +1,17 @@
+import asyncio
 import re
-import time
 from typing import Final, NotRequired
 from urllib.parse import quote
 
+import httpx
 import pydash
-import requests
 import yarl
-from config import MOBYGAMES_API_KEY
+from config import MOBYGAMES_API_KEY, MOBYGAMES_RATE_LIMIT
 from fastapi import HTTPException, status
 from logger.logger import log
-from requests.exceptions import HTTPError, Timeout
 from typing_extensions import TypedDict
 from unidecode import unidecode as uc
+from utils.context import ctx_httpx_client
 
 from .base_hander import (
     PS2_OPL_REGEX,
@@ -20,6 +20,7 @@ from .base_hander import (
     SWITCH_TITLEDB_REGEX,
     MetadataHandler,
 )
+from .rate_limiter import RateLimiter
 
 # Used to display the Mobygames API status in the frontend
 MOBY_API_ENABLED: Final = bool(MOBYGAMES_API_KEY)
@@ -80,38 +81,51 @@ class MobyGamesHandler(MetadataHandler):
     def __init__(self) -> None:
         self.platform_url = "https://api.mobygames.com/v1/platforms"
         self.games_url = "https://api.mobygames.com/v1/games"
+        self.rate_limiter = RateLimiter("moby", MOBYGAMES_RATE_LIMIT)
 
-    def _request(self, url: str, timeout: int = 120) -> dict:
-        authorized_url = yarl.URL(url).update_query(api_key=MOBYGAMES_API_KEY)
+    async def _request(
+        self, url: str, timeout: int = 120, cache_key: str | None = None
+    ) -> dict:
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+        httpx_client = ctx_httpx_client.get()
+        authorized_url = str(yarl.URL(url).update_query(api_key=MOBYGAMES_API_KEY))
         try:
-            res = requests.get(authorized_url, timeout=timeout)
+            await self.rate_limiter.acquire()
+            res = await httpx_client.get(authorized_url, timeout=timeout)
             res.raise_for_status()
-            return res.json()
-        except requests.exceptions.ConnectionError as exc:
+            response = res.json()
+            return self._cache_response(
+                cache_key, response, miss=not response.get("games")
+            )
+        except httpx.NetworkError as exc:
             log.critical("Connection error: can't connect to Mobygames", exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Can't connect to Mobygames, check your internet connection",
             ) from exc
-        except HTTPError as err:
+        except httpx.HTTPStatusError as err:
             if err.response.status_code == 401:
                 # Sometimes Mobygames returns 401 even with a valid API key
                 return {}
             elif err.response.status_code == 429:
                 # Retry after 2 seconds if rate limit hit
-                time.sleep(2)
+                await asyncio.sleep(2)
             else:
                 # Log the error and return an empty dict if the request fails with a different code
                 log.error(err)
                 return {}
-        except Timeout:
+        except httpx.TimeoutException:
             # Retry the request once if it times out
             pass
 
         try:
-            res = requests.get(url, timeout=timeout)
+            await self.rate_limiter.acquire()
+            res = await httpx_client.get(authorized_url, timeout=timeout)
             res.raise_for_status()
-        except (HTTPError, Timeout) as err:
+        except httpx.HTTPStatusError as err:
             if err.response.status_code == 401:
                 # Sometimes Mobygames returns 401 even with a valid API key
                 return {}
@@ -119,10 +133,14 @@ class MobyGamesHandler(MetadataHandler):
             # Log the error and return an empty dict if the request fails with a different code
             log.error(err)
             return {}
+        except httpx.TimeoutException as err:
+            log.error(err)
+            return {}
 
-        return res.json()
+        response = res.json()
+        return self._cache_response(cache_key, response, miss=not response.get("games"))
 
-    def _search_rom(self, search_term: str, platform_moby_id: int) -> dict | None:
+    async def _search_rom(self, search_term: str, platform_moby_id: int) -> dict | None:
         if not platform_moby_id:
             return None
 
@@ -131,7 +149,14 @@ class MobyGamesHandler(MetadataHandler):
             platform=[platform_moby_id],
             title=quote(search_term, safe="/ "),
         )
-        roms = self._request(str(url)).get("games", [])
+        roms = (
+            await self._request(
+                str(url),
+                cache_key=self._search_cache_key(
+                    "moby", "games", platform_moby_id, search_term
+                ),
+            )
+        ).get("games", [])
 
         exact_matches = [
             rom
@@ -227,19 +252,19 @@ class MobyGamesHandler(MetadataHandler):
             fallback_rom = MobyGamesRom(moby_id=None, name=search_term)
 
         search_term = self.normalize_search_term(search_term)
-        res = self._search_rom(search_term, platform_moby_id)
+        res = await self._search_rom(search_term, platform_moby_id)
 
         # Split the search term since mobygames search doesn't support special caracters
         if not res and ":" in search_term:
             for term in search_term.split(":")[::-1]:
-                res = self._search_rom(term, platform_moby_id)
+                res = await self._search_rom(term, platform_moby_id)
                 if res:
                     break
 
         # Some MAME games have two titles split by a slash
         if not res and "/" in search_term:
             for term in search_term.split("/"):
-                res = self._search_rom(term.strip(), platform_moby_id)
+                res = await self._search_rom(term.strip(), platform_moby_id)
                 if res:
                     break
 
@@ -258,12 +283,12 @@ class MobyGamesHandler(MetadataHandler):
 
         return MobyGamesRom({k: v for k, v in rom.items() if v})  # type: ignore[misc]
 
-    def get_rom_by_id(self, moby_id: int) -> MobyGamesRom:
+    async def get_rom_by_id(self, moby_id: int) -> MobyGamesRom:
         if not MOBY_API_ENABLED:
             return MobyGamesRom(moby_id=None)
 
         url = yarl.URL(self.games_url).with_query(id=moby_id)
-        roms = self._request(str(url)).get("games", [])
+        roms = (await self._request(str(url))).get("games", [])
         res = pydash.get(roms, "[0]", None)
 
         if not res:
@@ -281,14 +306,14 @@ class MobyGamesHandler(MetadataHandler):
 
         return MobyGamesRom({k: v for k, v in rom.items() if v})  # type: ignore[misc]
 
-    def get_matched_roms_by_id(self, moby_id: int) -> list[MobyGamesRom]:
+    async def get_matched_roms_by_id(self, moby_id: int) -> list[MobyGamesRom]:
         if not MOBY_API_ENABLED:
             return []
 
-        rom = self.get_rom_by_id(moby_id)
+        rom = await self.get_rom_by_id(moby_id)
         return [rom] if rom["moby_id"] else []
 
-    def get_matched_roms_by_name(
+    async def get_matched_roms_by_name(
         self, search_term: str, platform_moby_id: int
     ) -> list[MobyGamesRom]:
         if not MOBY_API_ENABLED:
@@ -301,7 +326,7 @@ class MobyGamesHandler(MetadataHandler):
         url = yarl.URL(self.games_url).with_query(
             platform=[platform_moby_id], title=quote(search_term, safe="/ ")
         )
-        matched_roms = self._request(str(url)).get("games", [])
+        matched_roms = (await self._request(str(url))).get("games", [])
 
         return [
             MobyGamesRom(  # type: ignore[misc]
@@ -0,0 +1,79 @@
+import asyncio
+
+from handler.metrics_handler import metrics_handler
+from handler.redis_handler import cache
+from redis.exceptions import WatchError
+
+
+class RateLimiter:
+    """Token bucket stored in redis, so the limit holds across all workers
+
+    Args:
+        name: identifier of the bucket, usually the metadata provider
+        rate: tokens added per second
+        burst: maximum number of tokens the bucket can hold
+    """
+
+    def __init__(self, name: str, rate: float, burst: int | None = None) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst or max(int(rate), 1)
+        self.key = f"romm:rate_limit:{name}"
+
+    def _take_token(self) -> float:
+        """Take a token from the bucket
+
+        Returns:
+            Seconds to wait before a token is available, 0 if one was taken
+        """
+
+        with cache.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key)
+                    tokens, updated_at = pipe.hmget(self.key, "tokens", "updated_at")
+                    # Use the redis clock so all workers agree on the time
+                    seconds, microseconds = pipe.time()
+                    now = seconds + microseconds / 1_000_000
+
+                    if tokens is None or updated_at is None:
+                        available = float(self.burst)
+                    else:
+                        elapsed = max(now - float(updated_at), 0)
+                        available = min(
+                            float(self.burst), float(tokens) + elapsed * self.rate
+                        )
+
+                    wait = 0.0
+                    if available >= 1:
+                        available -= 1
+                    else:
+                        wait = (1 - available) / self.rate
+
+                    pipe.multi()
+                    pipe.hset(
+                        self.key, mapping={"tokens": available, "updated_at": now}
+                    )
+                    pipe.expire(self.key, max(int(self.burst / self.rate) + 1, 60))
+                    pipe.execute()
+                    return wait
+                except WatchError:
+                    # Another worker updated the bucket, try again
+                    continue
+
+    async def acquire(self) -> None:
+        """Wait until a request can be sent to the provider"""
+
+        if self.rate <= 0:
+            return
+
+        # The redis transaction blocks, so it's kept off the event loop
+        waited = 0.0
+        while wait := await asyncio.to_thread(self._take_token):
+            await asyncio.sleep(wait)
+            waited += wait
+
+        metrics_handler.record(
+            f"rate_limit:{self.name}",
+            {"requests": 1, "throttled": int(waited > 0), "wait_seconds": waited},
+        )
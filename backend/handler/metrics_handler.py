@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+from handler.redis_handler import cache
+from logger.logger import log
+
+
+class MetricsHandler:
+    """Counters shared by every API and worker process, stored as redis hashes"""
+
+    def __init__(self, flush_interval: float = 10) -> None:
+        self.prefix = "romm:metrics"
+        self.flush_interval = flush_interval
+        self._buffer: defaultdict[str, defaultdict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._buffer_lock = threading.Lock()
+        self._flusher_pid: int | None = None
+
+    def incr(self, name: str, values: dict[str, int | float]) -> None:
+        key = f"{self.prefix}:{name}"
+        with cache.pipeline(transaction=False) as pipe:
+            for field, amount in values.items():
+                if isinstance(amount, float):
+                    pipe.hincrbyfloat(key, field, amount)
+                else:
+                    pipe.hincrby(key, field, amount)
+            pipe.execute()
+
+    def record(self, name: str, values: dict[str, int | float]) -> None:
+        """Same as incr, but buffered in memory and flushed every few seconds
+
+        Meant for hot paths where a redis round trip per call would be too costly,
+        the buffer is flushed by a background thread so record never waits on redis.
+        """
+        with self._buffer_lock:
+            for field, amount in values.items():
+                self._buffer[name][field] += amount
+
+            # Threads don't survive a fork, each process starts its own flusher
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(
+                    target=self._flush_periodically, name="metrics-flusher", daemon=True
+                ).start()
+
+    def flush(self) -> None:
+        """Write the values buffered by record to redis"""
+        with self._buffer_lock:
+            buffer = self._buffer
+            self._buffer = defaultdict(lambda: defaultdict(float))
+
+        for buffered_name, buffered_values in buffer.items():
+            self.incr(buffered_name, dict(buffered_values))
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning(f"Unable to flush the metrics: {e}")
+
+    def get(self, name: str) -> dict[str, float]:
+        metrics = cache.hgetall(f"{self.prefix}:{name}")
+        return {
+            field.decode() if isinstance(field, bytes) else field: float(value)
+            for field, value in metrics.items()  # type: ignore[union-attr]
+        }
+
+
+metrics_handler = MetricsHandler()
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import nullcontext
 from enum import Enum
 from typing import Any
 
@@ -24,7 +26,7 @@ class ScanType(Enum):
     COMPLETE = "complete"
 
 
-def _get_main_platform_igdb_id(platform: Platform):
+async def _get_main_platform_igdb_id(platform: Platform):
     cnfg = cm.get_config()
 
     if platform.fs_slug in cnfg.PLATFORMS_VERSIONS.keys():
@@ -33,9 +35,9 @@ def _get_main_platform_igdb_id(platform: Platform):
         if main_platform:
             main_platform_igdb_id = main_platform.igdb_id
         else:
-            main_platform_igdb_id = meta_igdb_handler.get_platform(main_platform_slug)[
-                "igdb_id"
-            ]
+            main_platform_igdb_id = (
+                await meta_igdb_handler.get_platform(main_platform_slug)
+            )["igdb_id"]
             if not main_platform_igdb_id:
                 main_platform_igdb_id = platform.igdb_id
     else:
@@ -43,7 +45,7 @@ def _get_main_platform_igdb_id(platform: Platform):
     return main_platform_igdb_id
 
 
-def scan_platform(
+async def scan_platform(
     fs_slug: str,
     fs_platforms: list[str],
     metadata_sources: list[str] | None = None,
@@ -86,7 +88,7 @@ def scan_platform(
         platform_attrs["slug"] = fs_slug
 
     igdb_platform = (
-        meta_igdb_handler.get_platform(platform_attrs["slug"])
+        await meta_igdb_handler.get_platform(platform_attrs["slug"])
         if "igdb" in metadata_sources
         else IGDBPlatform(igdb_id=None, slug=platform_attrs["slug"])
     )
@@ -154,12 +156,22 @@ def scan_firmware(
     return Firmware(**firmware_attrs)
 
 
+def _metadata_slot(
+    metadata_semaphores: dict[str, asyncio.Semaphore] | None, source: str
+):
+    if metadata_semaphores and source in metadata_semaphores:
+        return metadata_semaphores[source]
+
+    return nullcontext()
+
+
 async def scan_rom(
     platform: Platform,
     rom_attrs: dict,
     scan_type: ScanType,
     rom: Rom | None = None,
     metadata_sources: list[str] | None = None,
+    metadata_semaphores: dict[str, asyncio.Semaphore] | None = None,
 ) -> Rom:
     if not metadata_sources:
         metadata_sources = ["igdb", "moby"]
@@ -210,6 +222,18 @@ async def scan_rom(
         multi_files=rom_attrs["files"],
         roms_path=roms_path,
     )
+    # Reading the files is left to a thread, not to block the other scans
+    file_crcs = (
+        await asyncio.to_thread(
+            fs_rom_handler.get_rom_files_crcs,
+            roms_path=roms_path,
+            file_name=rom_attrs["file_name"],
+            multi_files=rom_attrs["files"],
+            previous_crcs=rom.file_crcs if rom else None,
+        )
+        if rom_attrs["multi"]
+        else {}
+    )
     regs, rev, langs, other_tags = fs_rom_handler.parse_tags(rom_attrs["file_name"])
     rom_attrs.update(
         {
@@ -225,6 +249,7 @@ async def scan_rom(
                 rom_attrs["file_name"]
             ),
             "file_size_bytes": file_size,
+            "file_crcs": file_crcs,
             "multi": rom_attrs["multi"],
             "regions": regs,
             "revision": rev,
@@ -246,10 +271,11 @@ async def scan_rom(
             or (scan_type == ScanType.UNIDENTIFIED and not rom.igdb_id)
         )
     ):
-        main_platform_igdb_id = _get_main_platform_igdb_id(platform)
-        igdb_handler_rom = await meta_igdb_handler.get_rom(
-            rom_attrs["file_name"], main_platform_igdb_id
-        )
+        main_platform_igdb_id = await _get_main_platform_igdb_id(platform)
+        async with _metadata_slot(metadata_semaphores, "igdb"):
+            igdb_handler_rom = await meta_igdb_handler.get_rom(
+                rom_attrs["file_name"], main_platform_igdb_id
+            )
 
     if (
         "moby" in metadata_sources
@@ -261,9 +287,10 @@ async def scan_rom(
             or (scan_type == ScanType.UNIDENTIFIED and not rom.moby_id)
         )
     ):
-        moby_handler_rom = await meta_moby_handler.get_rom(
-            rom_attrs["file_name"], platform.moby_id
-        )
+        async with _metadata_slot(metadata_semaphores, "moby"):
+            moby_handler_rom = await meta_moby_handler.get_rom(
+                rom_attrs["file_name"], platform.moby_id
+            )
 
     # Reversed to prioritize IGDB
     rom_attrs.update({**moby_handler_rom, **igdb_handler_rom})
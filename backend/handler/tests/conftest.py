@@ -36,6 +36,9 @@ def clear_database():
         s.query(Platform).delete(synchronize_session="evaluate")
         s.query(User).delete(synchronize_session="evaluate")
 
+    # Users are deleted behind the handler's back
+    db_user_handler._users_cache.clear()
+
 
 @pytest.fixture
 def platform():
@@ -1,19 +1,54 @@
+from unittest.mock import patch
+
 from handler.auth import auth_handler
 from handler.database import (
+    db_collection_handler,
+    db_firmware_handler,
     db_platform_handler,
     db_rom_handler,
     db_save_handler,
     db_screenshot_handler,
     db_state_handler,
+    db_stats_handler,
     db_user_handler,
 )
+from handler.database.base_handler import sync_engine
+from handler.database.users_handler import USERS_VERSION_KEY
+from handler.redis_handler import cache
 from models.assets import Save, Screenshot, State
+from models.collection import Collection
 from models.platform import Platform
 from models.rom import Rom
 from models.user import Role, User
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 
 
+def test_shared_engine():
+    for handler in (
+        db_collection_handler,
+        db_firmware_handler,
+        db_platform_handler,
+        db_rom_handler,
+        db_save_handler,
+        db_screenshot_handler,
+        db_state_handler,
+        db_stats_handler,
+        db_user_handler,
+    ):
+        assert handler.engine is sync_engine
+
+    # The statement timeout is set on the connections opened after it
+    sync_engine.dispose()
+    try:
+        with patch("handler.database.base_handler.DB_STATEMENT_TIMEOUT", 30):
+            with sync_engine.connect() as conn:
+                timeout = conn.execute(text("SELECT @@SESSION.max_statement_time"))
+                assert float(timeout.scalar()) == 30
+    finally:
+        sync_engine.dispose()
+
+
 def test_platforms():
     platform = Platform(
         name="test_platform", slug="test_platform_slug", fs_slug="test_platform_slug"
@@ -63,12 +98,28 @@ def test_roms(rom: Rom, platform: Platform):
     roms = db_rom_handler.get_roms(platform_id=platform.id)
     assert len(roms) == 1
 
-    db_rom_handler.purge_roms(rom_2.platform_id, [rom_2.id])
+    assert db_rom_handler.purge_roms(rom_2.platform_id, [rom_2.id]) == 1
 
     roms = db_rom_handler.get_roms(platform_id=platform.id)
     assert len(roms) == 0
 
 
+def test_rom_snapshots(rom: Rom, platform: Platform):
+    assert db_rom_handler.get_rom_snapshots(platform.id) == {}
+
+    snapshot = {"rom_id": rom.id, "st_size": 1000, "st_mtime_ns": 1, "st_ino": 2}
+    db_rom_handler.upsert_rom_snapshots([snapshot])
+    db_rom_handler.upsert_rom_snapshots([dict(snapshot, st_mtime_ns=3)])
+
+    rom_snapshots = db_rom_handler.get_rom_snapshots(platform.id)
+    assert len(rom_snapshots) == 1
+    assert rom_snapshots[rom.file_name].id == rom.id
+    assert rom_snapshots[rom.file_name].st_mtime_ns == 3
+
+    db_rom_handler.delete_rom(rom.id)
+    assert db_rom_handler.get_rom_snapshots(platform.id) == {}
+
+
 def test_utils(rom: Rom, platform: Platform):
     roms = db_rom_handler.get_roms(platform_id=platform.id)
     assert (
@@ -78,6 +129,193 @@ def test_utils(rom: Rom, platform: Platform):
         == roms[0].id
     )
 
+    platform_roms = db_rom_handler.get_roms_by_file_name(platform.id)
+    assert platform_roms[rom.file_name].id == rom.id
+    assert platform_roms[rom.file_name].igdb_id is None
+    assert db_rom_handler.get_roms_by_file_name(platform.id, ["missing.zip"]) == {}
+    assert [r.id for r in db_rom_handler.get_roms_by_ids([rom.id])] == [rom.id]
+
+    db_rom_handler.delete_roms_by_file_name(platform.id, [rom.file_name])
+    assert db_rom_handler.get_roms_by_file_name(platform.id) == {}
+
+
+def test_bulk_upsert_roms(rom: Rom, platform: Platform):
+    new_rom = Rom(
+        platform_id=platform.id,
+        name="test_rom_2",
+        file_name="test_rom_2.zip",
+        file_name_no_tags="test_rom_2",
+        file_name_no_ext="test_rom_2",
+        file_extension="zip",
+        file_path=f"{platform.slug}/roms",
+    )
+    rom.name = "test_rom_updated"
+
+    stored_roms = db_rom_handler.bulk_upsert_roms([rom, new_rom])
+    assert [r.file_name for r in stored_roms] == ["test_rom.zip", "test_rom_2.zip"]
+    assert stored_roms[0].id == rom.id
+    assert stored_roms[0].name == "test_rom_updated"
+    assert stored_roms[1].id is not None
+    assert stored_roms[1].file_size_bytes == 0
+
+    db_rom_handler.bulk_update_roms(
+        [{"id": stored_roms[1].id, "path_cover_s": "cover/small.png"}]
+    )
+    assert db_rom_handler.get_rom(stored_roms[1].id).path_cover_s == "cover/small.png"
+    assert len(db_rom_handler.get_roms(platform_id=platform.id)) == 2
+
+
+def test_bulk_upsert_roms_keeps_unset_columns(rom: Rom, platform: Platform):
+    db_rom_handler.update_rom(
+        rom.id,
+        {
+            "sgdb_id": 1,
+            "summary": "A test rom",
+            "path_cover_s": "cover/small.png",
+            "path_cover_l": "cover/big.png",
+            "path_screenshots": ["screenshots/0.jpg"],
+            "igdb_metadata": {"alternative_names": ["Mario Story"]},
+        },
+    )
+
+    # Like a complete rescan that didn't find any match
+    scanned_rom = Rom(
+        id=rom.id,
+        platform_id=platform.id,
+        name=rom.file_name,
+        file_name=rom.file_name,
+        file_name_no_tags="test_rom",
+        file_name_no_ext="test_rom",
+        file_extension="zip",
+        file_path=f"{platform.slug}/roms",
+        file_size_bytes=2000.0,
+        url_cover="",
+        url_screenshots=[],
+    )
+    db_rom_handler.bulk_upsert_roms([scanned_rom])
+
+    stored_rom = db_rom_handler.get_rom(rom.id)
+    assert stored_rom.file_size_bytes == 2000.0
+    assert stored_rom.name == rom.file_name
+    assert stored_rom.sgdb_id == 1
+    assert stored_rom.summary == "A test rom"
+    assert stored_rom.path_cover_s == "cover/small.png"
+    assert stored_rom.path_cover_l == "cover/big.png"
+    assert stored_rom.path_screenshots == ["screenshots/0.jpg"]
+
+    # The search text still has the metadata that wasn't written again
+    assert [r.id for r in db_rom_handler.get_roms(search_term="mario story")] == [
+        rom.id
+    ]
+
+
+def test_search_roms(rom: Rom, platform: Platform):
+    db_rom_handler.add_rom(
+        Rom(
+            platform_id=platform.id,
+            name="Paper Mario",
+            file_name="Paper Mario (USA).z64",
+            file_name_no_tags="Paper Mario",
+            file_name_no_ext="Paper Mario (USA)",
+            file_extension="z64",
+            file_path=f"{platform.slug}/roms",
+            igdb_metadata={"alternative_names": ["Mario Story"]},
+        )
+    )
+
+    assert [r.name for r in db_rom_handler.get_roms(search_term="pap")] == [
+        "Paper Mario"
+    ]
+    assert [r.name for r in db_rom_handler.get_roms(search_term="story")] == [
+        "Paper Mario"
+    ]
+    assert [r.name for r in db_rom_handler.get_roms(search_term="paper usa")] == [
+        "Paper Mario"
+    ]
+    assert [r.name for r in db_rom_handler.get_roms(search_term="test_rom")] == [
+        "test_rom"
+    ]
+    assert db_rom_handler.get_roms(search_term="zelda") == []
+
+
+def test_sibling_roms(rom: Rom, platform: Platform):
+    db_rom_handler.update_rom(rom.id, {"igdb_id": 1020})
+    sibling = db_rom_handler.add_rom(
+        Rom(
+            platform_id=platform.id,
+            igdb_id=1020,
+            name="test_rom_2",
+            file_name="test_rom_2.zip",
+            file_name_no_tags="test_rom_2",
+            file_name_no_ext="test_rom_2",
+            file_extension="zip",
+            file_path=f"{platform.slug}/roms",
+        )
+    )
+    rom = db_rom_handler.get_rom(rom.id)
+
+    assert [r.id for r in db_rom_handler.get_sibling_roms(rom)] == [sibling.id]
+    assert [r.id for r in db_rom_handler.get_sibling_roms(sibling)] == [rom.id]
+
+    db_rom_handler.update_rom(sibling.id, {"igdb_id": 1021})
+    assert db_rom_handler.get_sibling_roms(rom) == []
+
+    db_rom_handler.bulk_update_roms([{"id": sibling.id, "igdb_id": 1020}])
+    db_rom_handler.refresh_sibling_roms(platform.id)
+    assert [r.id for r in db_rom_handler.get_sibling_roms(rom)] == [sibling.id]
+
+
+def test_get_roms_page(rom: Rom, platform: Platform):
+    db_rom_handler.add_rom(
+        Rom(
+            platform_id=platform.id,
+            name="test_rom_2",
+            file_name="test_rom_2.zip",
+            file_name_no_tags="test_rom_2",
+            file_name_no_ext="test_rom_2",
+            file_extension="zip",
+            file_path=f"{platform.slug}/roms",
+        )
+    )
+    assert db_rom_handler.count_roms(platform_id=platform.id) == 2
+
+    roms, keyset = db_rom_handler.get_roms_page(platform_id=platform.id, page_size=1)
+    assert [r.name for r in roms] == ["test_rom"]
+    assert keyset == ("test_rom", rom.id)
+
+    roms, keyset = db_rom_handler.get_roms_page(
+        platform_id=platform.id, page_size=1, keyset=keyset
+    )
+    assert [r.name for r in roms] == ["test_rom_2"]
+    assert keyset is None
+
+
+def test_collection_roms(rom: Rom, admin_user: User):
+    collection = db_collection_handler.add_collection(
+        Collection(name="test_collection", user_id=admin_user.id)
+    )
+    assert collection.roms == set()
+
+    collection = db_collection_handler.add_collection_roms(collection.id, [rom.id])
+    assert collection.roms == {rom.id}
+    assert collection.rom_count == 1
+
+    roms = db_rom_handler.get_roms(collection_id=collection.id)
+    assert [r.id for r in roms] == [rom.id]
+    assert [
+        c.id for c in db_rom_handler.get_rom_collections(rom, admin_user.id)
+    ] == [collection.id]
+
+    collection = db_collection_handler.remove_collection_roms(collection.id, [rom.id])
+    assert collection.roms == set()
+    assert db_rom_handler.get_roms(collection_id=collection.id) == []
+
+    collection = db_collection_handler.update_collection(
+        collection.id, {"name": "test_collection_2"}, rom_ids=[rom.id]
+    )
+    assert collection.name == "test_collection_2"
+    assert collection.roms == {rom.id}
+
 
 def test_users(admin_user):
     db_user_handler.add_user(
@@ -117,6 +355,44 @@ def test_users(admin_user):
         assert "Duplicate entry 'test_admin' for key" in str(e)
 
 
+def test_cached_users(admin_user: User):
+    user = db_user_handler.get_cached_user_by_username(admin_user.username)
+    assert user.id == admin_user.id
+
+    # Cache hits don't query the database
+    with patch.object(db_user_handler, "get_user_by_username") as get_user_mock:
+        assert db_user_handler.get_cached_user_by_username(admin_user.username) is user
+    get_user_mock.assert_not_called()
+
+    db_user_handler.update_user(admin_user.id, {"role": Role.EDITOR})
+    user = db_user_handler.get_cached_user_by_username(admin_user.username)
+    assert user.role == Role.EDITOR
+
+    # Users changed by another process are loaded again
+    cache.incr(USERS_VERSION_KEY)
+    with patch.object(
+        db_user_handler,
+        "get_user_by_username",
+        wraps=db_user_handler.get_user_by_username,
+    ) as get_user_mock:
+        db_user_handler.get_cached_user_by_username(admin_user.username)
+    get_user_mock.assert_called_once()
+
+    db_user_handler.delete_user(admin_user.id)
+    assert db_user_handler.get_cached_user_by_username(admin_user.username) is None
+
+
+def test_last_active(admin_user: User):
+    assert db_user_handler.get_user(admin_user.id).last_active is None
+
+    db_user_handler.record_last_active(admin_user.id)
+    db_user_handler.record_last_active(admin_user.id)
+    assert db_user_handler.get_user(admin_user.id).last_active is None
+
+    db_user_handler.flush_last_active()
+    assert db_user_handler.get_user(admin_user.id).last_active is not None
+
+
 def test_saves(save: Save, platform: Platform, admin_user: User):
     db_save_handler.add_save(
         Save(
@@ -3,11 +3,13 @@ from exceptions.fs_exceptions import RomsNotFoundException
 from handler.scan_handler import ScanType, scan_platform, scan_rom
 from models.platform import Platform
 from models.rom import Rom
+from utils.context import initialize_context
 
 
 @pytest.mark.vcr
-def test_scan_platform():
-    platform = scan_platform("n64", ["n64"])
+async def test_scan_platform():
+    async with initialize_context():
+        platform = await scan_platform("n64", ["n64"])
 
     assert platform.__class__ == Platform
     assert platform.fs_slug == "n64"
@@ -16,7 +18,8 @@ def test_scan_platform():
     assert platform.igdb_id == 4
 
     try:
-        platform = scan_platform("", [])
+        async with initialize_context():
+            platform = await scan_platform("", [])
     except RomsNotFoundException as e:
         assert "Roms not found for platform" in str(e)
 
@@ -24,15 +27,16 @@ def test_scan_platform():
 @pytest.mark.vcr
 async def test_scan_rom():
     platform = Platform(fs_slug="n64", igdb_id=4)
-    rom = await scan_rom(
-        platform,
-        {
-            "file_name": "Paper Mario (USA).z64",
-            "multi": False,
-            "files": ["Paper Mario (USA).z64"],
-        },
-        ScanType.QUICK,
-    )
+    async with initialize_context():
+        rom = await scan_rom(
+            platform,
+            {
+                "file_name": "Paper Mario (USA).z64",
+                "multi": False,
+                "files": ["Paper Mario (USA).z64"],
+            },
+            ScanType.QUICK,
+        )
 
     assert rom.__class__ == Rom
     assert rom.file_name == "Paper Mario (USA).z64"
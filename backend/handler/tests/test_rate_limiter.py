@@ -0,0 +1,28 @@
+from handler.metadata.rate_limiter import RateLimiter
+from handler.metrics_handler import metrics_handler
+from handler.redis_handler import cache
+
+
+def test_rate_limiter_bucket():
+    cache.delete("romm:rate_limit:test")
+    rate_limiter = RateLimiter("test", rate=2)
+
+    # The bucket starts full
+    assert rate_limiter._take_token() == 0
+    assert rate_limiter._take_token() == 0
+
+    # Empty bucket must wait for the next token
+    assert 0 < rate_limiter._take_token() <= 0.5
+
+
+async def test_rate_limiter_metrics():
+    cache.delete("romm:rate_limit:test_metrics", "romm:metrics:rate_limit:test_metrics")
+    rate_limiter = RateLimiter("test_metrics", rate=100)
+
+    await rate_limiter.acquire()
+    await rate_limiter.acquire()
+    metrics_handler.flush()
+
+    metrics = metrics_handler.get("rate_limit:test_metrics")
+    assert metrics["requests"] == 2
+    assert metrics["throttled"] == 0
@@ -28,13 +28,14 @@ from endpoints import (
 )
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from handler.auth.base_handler import ALGORITHM
 from handler.auth.hybrid_auth import HybridAuthBackend
 from handler.auth.middleware import CustomCSRFMiddleware, SessionMiddleware
 from handler.socket_handler import socket_handler
 from starlette.middleware.authentication import AuthenticationMiddleware
 from utils import get_version
+from utils.context import ContextMiddleware
+from utils.gzip import CustomGZipMiddleware
 
 
 @asynccontextmanager
@@ -63,7 +64,7 @@ if "pytest" not in sys.modules and not DISABLE_CSRF_PROTECTION:
     )
 
 # Enable GZip compression for responses
-app.add_middleware(GZipMiddleware, minimum_size=1024)
+app.add_middleware(CustomGZipMiddleware, minimum_size=1024)
 
 # Handles both basic and oauth authentication
 app.add_middleware(
@@ -81,6 +82,9 @@ app.add_middleware(
     jwt_alg=ALGORITHM,
 )
 
+# Exposes the shared HTTP client to metadata handlers
+app.add_middleware(ContextMiddleware)
+
 app.include_router(heartbeat.router)
 app.include_router(auth.router)
 app.include_router(user.router)
@@ -4,7 +4,7 @@ from functools import cached_property
 from typing import TYPE_CHECKING
 
 from models.base import BaseModel
-from sqlalchemy import BigInteger, ForeignKey, String
+from sqlalchemy import BigInteger, ForeignKey, Index, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 if TYPE_CHECKING:
@@ -41,7 +41,10 @@ class RomAsset(BaseAsset):
 
 class Save(RomAsset):
     __tablename__ = "saves"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index("saves_rom_id_user_id_file_name_idx", "rom_id", "user_id", "file_name"),
+        {"extend_existing": True},
+    )
 
     emulator: Mapped[str | None] = mapped_column(String(length=50))
 
@@ -65,7 +68,10 @@ class Save(RomAsset):
 
 class State(RomAsset):
     __tablename__ = "states"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index("states_rom_id_user_id_file_name_idx", "rom_id", "user_id", "file_name"),
+        {"extend_existing": True},
+    )
 
     emulator: Mapped[str | None] = mapped_column(String(length=50))
 
@@ -89,7 +95,15 @@ class State(RomAsset):
 
 class Screenshot(RomAsset):
     __tablename__ = "screenshots"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index(
+            "screenshots_rom_id_user_id_file_name_idx",
+            "rom_id",
+            "user_id",
+            "file_name",
+        ),
+        {"extend_existing": True},
+    )
 
     rom: Mapped[Rom] = relationship(lazy="joined", back_populates="screenshots")
     user: Mapped[User] = relationship(lazy="joined", back_populates="screenshots")
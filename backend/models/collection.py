@@ -4,7 +4,7 @@ from functools import cached_property
 
 from models.base import BaseModel
 from models.user import User
-from sqlalchemy import JSON, ForeignKey, String, Text
+from sqlalchemy import ForeignKey, Index, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
@@ -23,8 +23,8 @@ class Collection(BaseModel):
         Text, default="", doc="URL to cover image stored in IGDB"
     )
 
-    roms: Mapped[set[int]] = mapped_column(
-        JSON, default=[], doc="Rom id's that belong to this collection"
+    collection_roms: Mapped[list[CollectionRom]] = relationship(
+        lazy="selectin", passive_deletes=True
     )
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
@@ -35,6 +35,11 @@ class Collection(BaseModel):
     def user__username(self) -> str:
         return self.user.username
 
+    @property
+    def roms(self) -> set[int]:
+        """Rom id's that belong to this collection"""
+        return {collection_rom.rom_id for collection_rom in self.collection_roms}
+
     @property
     def rom_count(self) -> int:
         return len(self.roms)
@@ -49,3 +54,17 @@ class Collection(BaseModel):
 
     def __repr__(self) -> str:
         return self.name
+
+
+class CollectionRom(BaseModel):
+    __tablename__ = "collection_roms"
+    __table_args__ = (
+        Index("collection_roms_rom_id_collection_id_idx", "rom_id", "collection_id"),
+    )
+
+    collection_id: Mapped[int] = mapped_column(
+        ForeignKey("collections.id", ondelete="CASCADE"), primary_key=True
+    )
+    rom_id: Mapped[int] = mapped_column(
+        ForeignKey("roms.id", ondelete="CASCADE"), primary_key=True
+    )
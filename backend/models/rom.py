@@ -5,7 +5,15 @@ from typing import TYPE_CHECKING, Any
 
 from config import FRONTEND_RESOURCES_PATH
 from models.base import BaseModel
-from sqlalchemy import JSON, BigInteger, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    ForeignKey,
+    Index,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.dialects.mysql.json import JSON as MySQLJSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -18,6 +26,14 @@ if TYPE_CHECKING:
 
 class Rom(BaseModel):
     __tablename__ = "roms"
+    __table_args__ = (
+        Index("roms_search_text_idx", "search_text", mysql_prefix="FULLTEXT"),
+        Index("roms_platform_id_file_name_idx", "platform_id", "file_name"),
+        Index("roms_platform_id_igdb_id_idx", "platform_id", "igdb_id"),
+        Index("roms_platform_id_moby_id_idx", "platform_id", "moby_id"),
+        Index("roms_file_name_no_tags_idx", "file_name_no_tags"),
+        Index("roms_file_name_no_ext_idx", "file_name_no_ext"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
@@ -35,6 +51,9 @@ class Rom(BaseModel):
     name: Mapped[str | None] = mapped_column(String(length=350))
     slug: Mapped[str | None] = mapped_column(String(length=400))
     summary: Mapped[str | None] = mapped_column(Text)
+    search_text: Mapped[str | None] = mapped_column(
+        Text, default="", doc="Names and alternative names, full-text indexed"
+    )
     igdb_metadata: Mapped[dict[str, Any] | None] = mapped_column(
         MySQLJSON, default=dict
     )
@@ -60,6 +79,9 @@ class Rom(BaseModel):
 
     multi: Mapped[bool] = mapped_column(default=False)
     files: Mapped[list[str] | None] = mapped_column(JSON, default=[])
+    # Size, mtime and CRC32 of each file of multi-file roms, so their zip
+    # can be laid out on download without reading the files first
+    file_crcs: Mapped[dict[str, dict] | None] = mapped_column(JSON, default={})
 
     platform_id: Mapped[int] = mapped_column(
         ForeignKey("platforms.id", ondelete="CASCADE")
@@ -98,7 +120,7 @@ class Rom(BaseModel):
             f"{FRONTEND_RESOURCES_PATH}/{s}" for s in self.path_screenshots
         ]
 
-    # This is an expensive operation so don't call it on a list of roms
+    # Reads the sibling pairs stored by the scans, one query per rom
     def get_sibling_roms(self) -> list[Rom]:
         from handler.database import db_rom_handler
 
@@ -176,3 +198,32 @@ class RomUser(BaseModel):
     @property
     def user__username(self) -> str:
         return self.user.username
+
+
+class RomSnapshot(BaseModel):
+    """Filesystem stats of a rom the last time it was scanned"""
+
+    __tablename__ = "rom_snapshots"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    st_size: Mapped[int] = mapped_column(BigInteger())
+    st_mtime_ns: Mapped[int] = mapped_column(BigInteger())
+    st_ino: Mapped[int] = mapped_column(BigInteger())
+
+    rom_id: Mapped[int] = mapped_column(
+        ForeignKey("roms.id", ondelete="CASCADE"), unique=True
+    )
+
+
+class SiblingRom(BaseModel):
+    """Pairs of roms of a platform sharing their IGDB or MobyGames id"""
+
+    __tablename__ = "sibling_roms"
+
+    rom_id: Mapped[int] = mapped_column(
+        ForeignKey("roms.id", ondelete="CASCADE"), primary_key=True
+    )
+    sibling_rom_id: Mapped[int] = mapped_column(
+        ForeignKey("roms.id", ondelete="CASCADE"), primary_key=True
+    )
@@ -61,4 +61,4 @@ class User(BaseModel, SimpleUser):
     def set_last_active(self):
         from handler.database import db_user_handler
 
-        db_user_handler.update_user(self.id, {"last_active": datetime.now()})
+        db_user_handler.record_last_active(self.id)
@@ -0,0 +1,245 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import watcher
+from config import SCAN_TIMEOUT
+from handler.scan_handler import ScanType
+from models.platform import Platform
+from watchdog.events import (
+    DirCreatedEvent,
+    DirModifiedEvent,
+    FileClosedEvent,
+    FileCreatedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
+    FileOpenedEvent,
+)
+from watcher import EventHandler, _parse_event_path, path
+
+DELAY = 300
+PLATFORMS = {
+    "n64": Platform(id=1, name="Nintendo 64", slug="n64", fs_slug="n64"),
+    "psx": Platform(id=2, name="PlayStation", slug="psx", fs_slug="psx"),
+}
+
+
+@pytest.fixture
+def queue():
+    with patch("watcher.low_prio_queue") as queue:
+        queue.get_jobs.return_value = []
+        yield queue
+
+
+@pytest.fixture(autouse=True)
+def platforms():
+    with patch("watcher.db_platform_handler") as db_platform_handler:
+        db_platform_handler.get_platform_by_fs_slug.side_effect = PLATFORMS.get
+        yield
+
+
+def _at(seconds: float):
+    return patch("watcher.time.monotonic", return_value=seconds)
+
+
+def _send(event_handler: EventHandler, seconds: float, *events) -> None:
+    with _at(seconds):
+        for event in events:
+            event_handler.on_any_event(event)
+
+
+def _flush(event_handler: EventHandler, seconds: float) -> None:
+    with _at(seconds):
+        event_handler.flush()
+
+
+def test_parse_event_path():
+    assert _parse_event_path(f"{path}/n64/roms/Paper Mario (USA).z64") == (
+        "n64",
+        "Paper Mario (USA).z64",
+    )
+    # Files of multi-file roms belong to their folder
+    assert _parse_event_path(f"{path}/n64/roms/Super Mario 64/disc 1.z64") == (
+        "n64",
+        "Super Mario 64",
+    )
+    assert _parse_event_path(f"{path}/n64/roms") == ("n64", None)
+    assert _parse_event_path(f"{path}/n64/bios/pifdata.bin") == ("n64", None)
+    assert _parse_event_path(f"{path}/n64") == ("n64", None)
+    assert _parse_event_path(path) is None
+    assert _parse_event_path("/elsewhere/n64/roms/rom.z64") is None
+
+    # Roms are right under the platform folders with the high priority structure
+    with patch.object(watcher, "high_prio_structure", True):
+        assert _parse_event_path(f"{path}/n64/Paper Mario (USA).z64") == (
+            "n64",
+            "Paper Mario (USA).z64",
+        )
+        assert _parse_event_path(f"{path}/n64/Super Mario 64/disc 1.z64") == (
+            "n64",
+            "Super Mario 64",
+        )
+        assert _parse_event_path(f"{path}/n64") == ("n64", None)
+
+
+def test_ignored_events(queue):
+    event_handler = EventHandler(delay=DELAY)
+    _send(
+        event_handler,
+        0,
+        FileCreatedEvent(f"{path}/n64/roms/.DS_Store"),
+        FileCreatedEvent(f"{path}/n64/roms/.rom.z64.romm-part"),
+        FileModifiedEvent(f"{path}/n64/roms/.rom.z64.romm-part"),
+        FileOpenedEvent(f"{path}/n64/roms/Paper Mario (USA).z64"),
+        FileClosedEvent(f"{path}/n64/roms/Paper Mario (USA).z64"),
+        DirModifiedEvent(f"{path}/n64/roms"),
+    )
+
+    _flush(event_handler, DELAY + 1)
+    queue.enqueue.assert_not_called()
+
+
+def test_flush_debounces_each_rom(queue):
+    event_handler = EventHandler(delay=DELAY)
+    _send(
+        event_handler,
+        0,
+        FileCreatedEvent(f"{path}/n64/roms/a.z64"),
+        FileCreatedEvent(f"{path}/n64/roms/b.z64"),
+        # A finished upload is scanned under its final name
+        FileMovedEvent(f"{path}/n64/roms/.c.z64.romm-part", f"{path}/n64/roms/c.z64"),
+        FileCreatedEvent(f"{path}/psx/roms/d.bin"),
+    )
+    # Still being written
+    _send(event_handler, 100, FileModifiedEvent(f"{path}/n64/roms/b.z64"))
+
+    _flush(event_handler, DELAY - 1)
+    queue.enqueue.assert_not_called()
+
+    # A single targeted scan per platform, for the roms left alone long enough
+    _flush(event_handler, DELAY)
+    assert queue.enqueue.call_count == 2
+    queue.enqueue.assert_any_call(
+        watcher.scan_roms, 1, ["a.z64", "c.z64"], job_timeout=SCAN_TIMEOUT
+    )
+    queue.enqueue.assert_any_call(
+        watcher.scan_roms, 2, ["d.bin"], job_timeout=SCAN_TIMEOUT
+    )
+
+    queue.enqueue.reset_mock()
+    _flush(event_handler, DELAY + 100)
+    queue.enqueue.assert_called_once_with(
+        watcher.scan_roms, 1, ["b.z64"], job_timeout=SCAN_TIMEOUT
+    )
+
+    queue.enqueue.reset_mock()
+    _flush(event_handler, DELAY * 10)
+    queue.enqueue.assert_not_called()
+
+
+def test_flush_waits_for_large_copies(queue):
+    event_handler = EventHandler(delay=DELAY)
+    _send(
+        event_handler,
+        0,
+        FileCreatedEvent(f"{path}/n64/roms/big.z64"),
+        FileCreatedEvent(f"{path}/n64/roms/Multi/disc 1.z64"),
+    )
+
+    # Copies taking much longer than the delay keep modifying their files
+    for seconds in range(60, DELAY * 4, 60):
+        _send(
+            event_handler,
+            seconds,
+            FileModifiedEvent(f"{path}/n64/roms/big.z64"),
+            FileModifiedEvent(f"{path}/n64/roms/Multi/disc 1.z64"),
+        )
+        _flush(event_handler, seconds)
+        queue.enqueue.assert_not_called()
+
+    last_event_at = seconds
+    _flush(event_handler, last_event_at + DELAY - 1)
+    queue.enqueue.assert_not_called()
+
+    # Scanned once, when the copies are done
+    _flush(event_handler, last_event_at + DELAY)
+    queue.enqueue.assert_called_once_with(
+        watcher.scan_roms, 1, ["Multi", "big.z64"], job_timeout=SCAN_TIMEOUT
+    )
+
+
+def test_flush_platform_scan_covers_its_roms(queue):
+    event_handler = EventHandler(delay=DELAY)
+    _send(
+        event_handler,
+        0,
+        FileCreatedEvent(f"{path}/n64/roms/a.z64"),
+        FileCreatedEvent(f"{path}/n64/bios/pifdata.bin"),
+        FileCreatedEvent(f"{path}/psx/roms/d.bin"),
+    )
+
+    _flush(event_handler, DELAY)
+    assert queue.enqueue.call_count == 2
+    queue.enqueue.assert_any_call(
+        watcher.scan_platforms, [1], ScanType.QUICK, job_timeout=SCAN_TIMEOUT
+    )
+    queue.enqueue.assert_any_call(
+        watcher.scan_roms, 2, ["d.bin"], job_timeout=SCAN_TIMEOUT
+    )
+
+
+def test_flush_full_rescan_covers_everything(queue):
+    event_handler = EventHandler(delay=DELAY)
+    _send(
+        event_handler,
+        0,
+        FileCreatedEvent(f"{path}/n64/roms/a.z64"),
+        FileCreatedEvent(f"{path}/n64/bios/pifdata.bin"),
+    )
+    _send(event_handler, 100, DirCreatedEvent(f"{path}/snes"))
+
+    # The other changes wait for the full rescan
+    _flush(event_handler, DELAY)
+    queue.enqueue.assert_not_called()
+
+    _flush(event_handler, DELAY + 100)
+    queue.enqueue.assert_called_once_with(
+        watcher.scan_platforms, [], job_timeout=SCAN_TIMEOUT
+    )
+
+    queue.enqueue.reset_mock()
+    _flush(event_handler, DELAY * 10)
+    queue.enqueue.assert_not_called()
+
+
+def test_flush_skips_queued_scans(queue):
+    queue.get_jobs.return_value = [
+        MagicMock(func_name="endpoints.sockets.scan.scan_platforms", args=([1],))
+    ]
+    event_handler = EventHandler(delay=DELAY)
+    _send(
+        event_handler,
+        0,
+        FileCreatedEvent(f"{path}/n64/roms/a.z64"),
+        FileCreatedEvent(f"{path}/psx/roms/d.bin"),
+    )
+
+    _flush(event_handler, DELAY)
+    queue.enqueue.assert_called_once_with(
+        watcher.scan_roms, 2, ["d.bin"], job_timeout=SCAN_TIMEOUT
+    )
+
+
+def test_flush_keeps_changes_on_failure(queue):
+    queue.enqueue.side_effect = ConnectionError
+    event_handler = EventHandler(delay=DELAY)
+    _send(event_handler, 0, FileCreatedEvent(f"{path}/n64/roms/a.z64"))
+
+    with pytest.raises(ConnectionError):
+        _flush(event_handler, DELAY)
+
+    # Submitted again on the next flush
+    queue.enqueue.side_effect = None
+    _flush(event_handler, DELAY + 1)
+    queue.enqueue.assert_called_with(
+        watcher.scan_roms, 1, ["a.z64"], job_timeout=SCAN_TIMEOUT
+    )
@@ -0,0 +1,176 @@
+# poetry run python3 -m utils.benchmark_queries [--roms 100000] [--keep]
+import argparse
+import random
+import time
+from typing import Final
+
+from handler.database.base_handler import sync_engine
+from models.assets import Save
+from models.platform import Platform
+from models.rom import Rom
+from models.user import User
+from sqlalchemy import Connection, delete, insert, select, text
+from utils.iterators import batched
+
+BENCHMARK_SLUG: Final = "romm-benchmark"
+SEED_CHUNK_SIZE: Final = 5000
+QUERY_RUNS: Final = 20
+
+# Lookups done while scanning and serving roms, with the indexes they rely on
+QUERIES: Final = (
+    (
+        "rom by platform and file name",
+        ["roms_platform_id_file_name_idx"],
+        "SELECT id FROM roms {hint} WHERE platform_id = :platform_id AND file_name = :file_name",
+    ),
+    (
+        "rom by file name without tags",
+        ["roms_file_name_no_tags_idx"],
+        "SELECT id FROM roms {hint} WHERE file_name_no_tags = :file_name_no_tags",
+    ),
+    (
+        "rom by file name without extension",
+        ["roms_file_name_no_ext_idx"],
+        "SELECT id FROM roms {hint} WHERE file_name_no_ext = :file_name_no_ext",
+    ),
+    (
+        "sibling roms",
+        ["roms_platform_id_igdb_id_idx", "roms_platform_id_moby_id_idx"],
+        "SELECT id FROM roms {hint} WHERE platform_id = :platform_id AND id != :id "
+        "AND (igdb_id = :igdb_id OR moby_id = :moby_id)",
+    ),
+    (
+        "save by rom, user and file name",
+        ["saves_rom_id_user_id_file_name_idx"],
+        "SELECT id FROM saves {hint} WHERE rom_id = :rom_id AND user_id = :user_id "
+        "AND file_name = :save_file_name",
+    ),
+)
+
+
+def seed(conn: Connection, roms_count: int) -> dict:
+    platform_id = conn.execute(
+        insert(Platform).values(
+            slug=BENCHMARK_SLUG, fs_slug=BENCHMARK_SLUG, name=BENCHMARK_SLUG
+        )
+    ).inserted_primary_key[0]
+    user_id = conn.execute(
+        insert(User).values(username=BENCHMARK_SLUG, enabled=False)
+    ).inserted_primary_key[0]
+
+    for chunk in batched(range(roms_count), SEED_CHUNK_SIZE):
+        conn.execute(
+            insert(Rom),
+            [
+                {
+                    "platform_id": platform_id,
+                    # A few roms share their ids, like the versions of a game
+                    "igdb_id": random.randint(1, roms_count // 4),
+                    "moby_id": random.randint(1, roms_count // 4),
+                    "name": f"Benchmark Game {i}",
+                    "file_name": f"Benchmark Game {i} (USA).zip",
+                    "file_name_no_tags": f"Benchmark Game {i}",
+                    "file_name_no_ext": f"Benchmark Game {i} (USA)",
+                    "file_extension": "zip",
+                    "file_path": f"{BENCHMARK_SLUG}/roms",
+                }
+                for i in chunk
+            ],
+        )
+
+    rom_ids = (
+        conn.execute(select(Rom.id).where(Rom.platform_id == platform_id))
+        .scalars()
+        .all()
+    )
+    for chunk in batched(rom_ids, SEED_CHUNK_SIZE):
+        conn.execute(
+            insert(Save),
+            [
+                {
+                    "rom_id": rom_id,
+                    "user_id": user_id,
+                    "file_name": f"{rom_id}.srm",
+                    "file_name_no_tags": str(rom_id),
+                    "file_name_no_ext": str(rom_id),
+                    "file_extension": "srm",
+                    "file_path": f"{BENCHMARK_SLUG}/saves",
+                }
+                for rom_id in chunk
+            ],
+        )
+
+    conn.execute(text("ANALYZE TABLE roms, saves"))
+
+    rom = conn.execute(
+        select(Rom).where(Rom.platform_id == platform_id).limit(1)
+    ).first()
+    return {
+        "platform_id": platform_id,
+        "user_id": user_id,
+        "id": rom.id,
+        "rom_id": rom.id,
+        "igdb_id": rom.igdb_id,
+        "moby_id": rom.moby_id,
+        "file_name": rom.file_name,
+        "file_name_no_tags": rom.file_name_no_tags,
+        "file_name_no_ext": rom.file_name_no_ext,
+        "save_file_name": f"{rom.id}.srm",
+    }
+
+
+def explain(conn: Connection, sql: str, params: dict) -> tuple[str, float]:
+    plans = conn.execute(text(f"EXPLAIN {sql}"), params).mappings().all()
+    plan = ", ".join(
+        f"{p['table']}: type={p['type']} key={p['key']} rows={p['rows']}"
+        for p in plans
+    )
+
+    start = time.perf_counter()
+    for _ in range(QUERY_RUNS):
+        conn.execute(text(sql), params).all()
+
+    return plan, (time.perf_counter() - start) / QUERY_RUNS * 1000
+
+
+def cleanup(conn: Connection) -> None:
+    # Roms and saves are removed by the foreign keys
+    conn.execute(delete(User).where(User.username == BENCHMARK_SLUG))
+    conn.execute(delete(Platform).where(Platform.fs_slug == BENCHMARK_SLUG))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the query plans of the hot lookups without and with their indexes"
+    )
+    parser.add_argument("--roms", type=int, default=100_000)
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the seeded rows afterwards"
+    )
+    args = parser.parse_args()
+
+    with sync_engine.begin() as conn:
+        cleanup(conn)
+        print(f"Seeding {args.roms} roms and saves...")
+        params = seed(conn, args.roms)
+
+    try:
+        with sync_engine.connect() as conn:
+            for name, indexes, sql in QUERIES:
+                ignore_hint = f"IGNORE INDEX ({', '.join(indexes)})"
+                before_plan, before_ms = explain(
+                    conn, sql.format(hint=ignore_hint), params
+                )
+                after_plan, after_ms = explain(conn, sql.format(hint=""), params)
+
+                print(f"\n{name}")
+                print(f"  before: {before_plan} ({before_ms:.2f} ms)")
+                print(f"  after:  {after_plan} ({after_ms:.2f} ms)")
+    finally:
+        if not args.keep:
+            with sync_engine.begin() as conn:
+                cleanup(conn)
+
+
+if __name__ == "__main__":
+    main()
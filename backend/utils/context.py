@@ -0,0 +1,47 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import httpx
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+ctx_httpx_client: ContextVar[httpx.AsyncClient] = ContextVar("httpx_client")
+
+
+@asynccontextmanager
+async def initialize_context() -> AsyncGenerator[None, None]:
+    """Initialize the context for code running outside of a request (worker jobs, scripts)
+
+    Can also be used as a decorator on async functions.
+    """
+    async with httpx.AsyncClient() as httpx_client:
+        token = ctx_httpx_client.set(httpx_client)
+        try:
+            yield
+        finally:
+            ctx_httpx_client.reset(token)
+
+
+class ContextMiddleware:
+    """Exposes the app-wide HTTP client created in the lifespan to every request"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):  # pragma: no cover
+            await self.app(scope, receive, send)
+            return
+
+        requests_client = getattr(scope["app"], "requests_client", None)
+        if requests_client is None:
+            # Lifespan didn't run (e.g. TestClient not used as a context manager)
+            async with initialize_context():
+                await self.app(scope, receive, send)
+            return
+
+        token = ctx_httpx_client.set(requests_client)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ctx_httpx_client.reset(token)
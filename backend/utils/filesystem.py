@@ -1,6 +1,15 @@
 import os
 from collections.abc import Iterator
 from pathlib import Path
+from typing import NamedTuple
+
+
+class FileRange(NamedTuple):
+    """Bytes of a file from start up to stop (excluded)"""
+
+    path: str
+    start: int
+    stop: int
 
 
 def iter_files(path: str, recursive: bool = False) -> Iterator[tuple[Path, str]]:
@@ -27,3 +36,15 @@ def iter_directories(path: str, recursive: bool = False) -> Iterator[tuple[Path,
             yield Path(root), directory
         if not recursive:
             break
+
+
+def iter_file_range(
+    path: str, start: int, stop: int, chunk_size: int = 1024 * 1024
+) -> Iterator[bytes]:
+    """Read a file from start up to stop (excluded) in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0 and (chunk := f.read(min(chunk_size, remaining))):
+            remaining -= len(chunk)
+            yield chunk
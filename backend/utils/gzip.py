@@ -0,0 +1,18 @@
+import re
+from typing import Final
+
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+# Downloads are served by byte ranges, which compressing would break, and raw
+# assets are files sent as they are or handed over to nginx
+UNCOMPRESSED_PATHS: Final = re.compile(r"^/((roms|firmware)/\d+/content/|raw/assets/)")
+
+
+class CustomGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and UNCOMPRESSED_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        await super().__call__(scope, receive, send)
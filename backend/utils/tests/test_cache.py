@@ -0,0 +1,30 @@
+import time
+
+from utils.cache import TTLCache
+
+
+def test_ttl_cache():
+    cache: TTLCache[str, int] = TTLCache(ttl=60, maxsize=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is the least recently used entry
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    cache.pop_where(lambda value: value == 3)
+    assert cache.get("c") is None
+
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+
+
+def test_ttl_cache_disabled():
+    cache: TTLCache[str, int] = TTLCache(ttl=0)
+
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,38 @@
+from starlette.responses import PlainTextResponse
+from starlette.types import Message
+from utils.gzip import CustomGZipMiddleware
+
+
+async def _get(path: str) -> list[Message]:
+    app = CustomGZipMiddleware(PlainTextResponse("x" * 2048), minimum_size=1024)
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    messages: list[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+def _content_encoding(messages: list[Message]) -> bytes | None:
+    return dict(messages[0]["headers"]).get(b"content-encoding")
+
+
+async def test_gzip_middleware():
+    assert _content_encoding(await _get("/roms/1")) == b"gzip"
+
+    for path in (
+        "/roms/1/content/rom.zip",
+        "/firmware/1/content/bios.bin",
+        "/raw/assets/users/1/saves/n64/game.sav",
+    ):
+        assert _content_encoding(await _get(path)) is None
@@ -0,0 +1,52 @@
+import io
+import zipfile
+import zlib
+
+from utils.zip import StoredZip, ZipMember
+
+
+def test_stored_zip(tmp_path):
+    (tmp_path / "disc 1.bin").write_bytes(b"1" * 3000)
+    (tmp_path / "disc 2.bin").write_bytes(b"2" * 5000)
+
+    stored_zip = StoredZip(
+        [
+            ZipMember.from_path("disc 1.bin", str(tmp_path / "disc 1.bin")),
+            ZipMember.from_path("disc 2.bin", str(tmp_path / "disc 2.bin")),
+            ZipMember.from_bytes("game.m3u", b"disc 1.bin\ndisc 2.bin\n", mtime=0),
+        ]
+    )
+    content = b"".join(stored_zip.iter_range(0, stored_zip.size))
+    assert len(content) == stored_zip.size
+
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == ["disc 1.bin", "disc 2.bin", "game.m3u"]
+        assert zip_file.read("disc 2.bin") == b"2" * 5000
+        assert all(
+            info.compress_type == zipfile.ZIP_STORED for info in zip_file.infolist()
+        )
+
+    # Ranges are slices of the whole archive, whichever segments they span
+    assert b"".join(stored_zip.iter_range(2000, 4000)) == content[2000:4000]
+    assert b"".join(stored_zip.iter_range(7000, stored_zip.size)) == content[7000:]
+
+
+def test_zip_member_scanned_crc(tmp_path):
+    (tmp_path / "disc 1.bin").write_bytes(b"1" * 3000)
+    stat = (tmp_path / "disc 1.bin").stat()
+
+    member = ZipMember.from_path(
+        "disc 1.bin",
+        str(tmp_path / "disc 1.bin"),
+        {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "crc": 1},
+    )
+    assert member.crc32() == 1
+
+    # The file changed since it was scanned
+    member = ZipMember.from_path(
+        "disc 1.bin",
+        str(tmp_path / "disc 1.bin"),
+        {"size": 10, "mtime_ns": stat.st_mtime_ns, "crc": 1},
+    )
+    assert member.crc32() == zlib.crc32(b"1" * 3000)
@@ -0,0 +1,320 @@
+import hashlib
+import os
+import struct
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from stat import S_IFREG
+from typing import Final
+
+from utils.cache import TTLCache
+from utils.filesystem import FileRange, iter_file_range
+
+ZIP64_LIMIT: Final = 0xFFFFFFFF
+ZIP64_ENTRIES_LIMIT: Final = 0xFFFF
+CRC_CHUNK_SIZE: Final = 1024 * 1024
+
+# Names are UTF-8 encoded
+UTF8_FLAG: Final = 0x0800
+STORED: Final = 0
+VERSION_NEEDED: Final = 20
+VERSION_NEEDED_ZIP64: Final = 45
+VERSION_MADE_BY: Final = (3 << 8) | VERSION_NEEDED_ZIP64  # Unix
+EXTERNAL_ATTR: Final = (S_IFREG | 0o644) << 16
+
+LOCAL_HEADER_SIZE: Final = 30
+CENTRAL_HEADER_SIZE: Final = 46
+END_OF_CENTRAL_DIR_SIZE: Final = 22
+ZIP64_END_OF_CENTRAL_DIR_SIZE: Final = 56
+ZIP64_END_OF_CENTRAL_DIR_LOCATOR_SIZE: Final = 20
+
+# CRCs of the files already zipped, by path, size and modification time
+_file_crcs: TTLCache[tuple[str, int, float], int] = TTLCache(
+    ttl=24 * 60 * 60, maxsize=4096
+)
+
+
+def file_crc32(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CRC_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _dos_datetime(mtime: float) -> tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+
+    year = min(t.tm_year, 2107)
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+@dataclass
+class ZipMember:
+    """A file stored uncompressed in a zip, read from disk or given as bytes"""
+
+    name: str
+    size: int
+    mtime: float
+    path: str | None = None
+    data: bytes | None = None
+    crc: int | None = None
+
+    @classmethod
+    def from_path(
+        cls, name: str, path: str, file_crc: dict | None = None
+    ) -> "ZipMember":
+        """The CRC found by a scan is only used if the file didn't change since"""
+        stat = os.stat(path)
+        crc = None
+        if (
+            file_crc
+            and file_crc.get("size") == stat.st_size
+            and file_crc.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            crc = file_crc.get("crc")
+
+        return cls(
+            name=name, size=stat.st_size, mtime=stat.st_mtime, path=path, crc=crc
+        )
+
+    @classmethod
+    def from_bytes(cls, name: str, data: bytes, mtime: float) -> "ZipMember":
+        return cls(name=name, size=len(data), mtime=mtime, data=data)
+
+    def crc32(self) -> int:
+        # Only computed once a header holding it is requested
+        if self.crc is not None:
+            return self.crc
+
+        if self.data is not None:
+            self.crc = zlib.crc32(self.data)
+            return self.crc
+
+        key = (str(self.path), self.size, self.mtime)
+        self.crc = _file_crcs.get(key)
+        if self.crc is None:
+            self.crc = file_crc32(str(self.path))
+            _file_crcs.set(key, self.crc)
+        return self.crc
+
+    def range(self, start: int, stop: int) -> bytes | FileRange:
+        if self.data is not None:
+            return self.data[start:stop]
+
+        return FileRange(str(self.path), start, stop)
+
+
+Segment = tuple[int, int, ZipMember | Callable[[], bytes]]
+
+
+class StoredZip:
+    """Zip archive of uncompressed members, laid out before any byte is read
+
+    Every offset only depends on the names and sizes of the members, so the
+    archive has a known length and any byte range of it can be served, which a
+    streamed zip with data descriptors doesn't allow.
+    """
+
+    def __init__(self, members: list[ZipMember]) -> None:
+        self.members = members
+        self.segments: list[Segment] = []
+
+        offset = 0
+        offsets = []
+        for member in members:
+            offsets.append(offset)
+            header_size = LOCAL_HEADER_SIZE + len(member.name.encode())
+            if member.size >= ZIP64_LIMIT:
+                header_size += 20
+
+            self.segments.append(
+                (offset, header_size, lambda m=member: self._local_header(m))
+            )
+            offset += header_size
+            self.segments.append((offset, member.size, member))
+            offset += member.size
+
+        central_dir_offset = offset
+        for member, member_offset in zip(members, offsets, strict=True):
+            header_size = CENTRAL_HEADER_SIZE + len(member.name.encode())
+            header_size += len(self._central_extra(member, member_offset))
+            self.segments.append(
+                (
+                    offset,
+                    header_size,
+                    lambda m=member, o=member_offset: self._central_header(m, o),  # type: ignore[misc]
+                )
+            )
+            offset += header_size
+
+        central_dir_size = offset - central_dir_offset
+        end_size = END_OF_CENTRAL_DIR_SIZE
+        if (
+            len(members) >= ZIP64_ENTRIES_LIMIT
+            or central_dir_offset >= ZIP64_LIMIT
+            or central_dir_size >= ZIP64_LIMIT
+        ):
+            end_size += (
+                ZIP64_END_OF_CENTRAL_DIR_SIZE + ZIP64_END_OF_CENTRAL_DIR_LOCATOR_SIZE
+            )
+
+        self.segments.append(
+            (
+                offset,
+                end_size,
+                lambda: self._end_of_central_dir(
+                    central_dir_offset, central_dir_size, end_size
+                ),
+            )
+        )
+        self.size = offset + end_size
+
+    @property
+    def mtime(self) -> float:
+        return max((member.mtime for member in self.members), default=0)
+
+    @property
+    def etag(self) -> str:
+        digest = hashlib.md5(usedforsecurity=False)
+        for member in self.members:
+            digest.update(f"{member.name}\0{member.size}\0{member.mtime}\0".encode())
+        return f'"{digest.hexdigest()}"'
+
+    def _local_header(self, member: ZipMember) -> bytes:
+        name = member.name.encode()
+        dos_time, dos_date = _dos_datetime(member.mtime)
+        zip64 = member.size >= ZIP64_LIMIT
+        extra = (
+            struct.pack("<HHQQ", 0x0001, 16, member.size, member.size)
+            if zip64
+            else b""
+        )
+        size = ZIP64_LIMIT if zip64 else member.size
+
+        return (
+            struct.pack(
+                "<IHHHHHIIIHH",
+                0x04034B50,
+                VERSION_NEEDED_ZIP64 if zip64 else VERSION_NEEDED,
+                UTF8_FLAG,
+                STORED,
+                dos_time,
+                dos_date,
+                member.crc32(),
+                size,
+                size,
+                len(name),
+                len(extra),
+            )
+            + name
+            + extra
+        )
+
+    def _central_extra(self, member: ZipMember, offset: int) -> bytes:
+        fields = []
+        if member.size >= ZIP64_LIMIT:
+            fields += [member.size, member.size]
+        if offset >= ZIP64_LIMIT:
+            fields.append(offset)
+        if not fields:
+            return b""
+
+        return struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields)
+
+    def _central_header(self, member: ZipMember, offset: int) -> bytes:
+        name = member.name.encode()
+        dos_time, dos_date = _dos_datetime(member.mtime)
+        extra = self._central_extra(member, offset)
+        size = min(member.size, ZIP64_LIMIT)
+
+        return (
+            struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                VERSION_MADE_BY,
+                VERSION_NEEDED_ZIP64 if extra else VERSION_NEEDED,
+                UTF8_FLAG,
+                STORED,
+                dos_time,
+                dos_date,
+                member.crc32(),
+                size,
+                size,
+                len(name),
+                len(extra),
+                0,
+                0,
+                0,
+                EXTERNAL_ATTR,
+                min(offset, ZIP64_LIMIT),
+            )
+            + name
+            + extra
+        )
+
+    def _end_of_central_dir(
+        self, central_dir_offset: int, central_dir_size: int, end_size: int
+    ) -> bytes:
+        entries = len(self.members)
+        end = b""
+        if end_size > END_OF_CENTRAL_DIR_SIZE:
+            zip64_end_offset = central_dir_offset + central_dir_size
+            end = struct.pack(
+                "<IQHHIIQQQQ",
+                0x06064B50,
+                ZIP64_END_OF_CENTRAL_DIR_SIZE - 12,
+                VERSION_MADE_BY,
+                VERSION_NEEDED_ZIP64,
+                0,
+                0,
+                entries,
+                entries,
+                central_dir_size,
+                central_dir_offset,
+            ) + struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+
+        return end + struct.pack(
+            "<IHHHHIIH",
+            0x06054B50,
+            0,
+            0,
+            min(entries, ZIP64_ENTRIES_LIMIT),
+            min(entries, ZIP64_ENTRIES_LIMIT),
+            min(central_dir_size, ZIP64_LIMIT),
+            min(central_dir_offset, ZIP64_LIMIT),
+            0,
+        )
+
+    def iter_parts(self, start: int, stop: int) -> Iterator[bytes | FileRange]:
+        """Yields the parts of the archive from start up to stop (excluded)
+
+        Headers are yielded as bytes, while the bodies of the members read from
+        disk are yielded as file ranges, for them to be sent without a copy.
+        """
+        for offset, size, source in self.segments:
+            if offset + size <= start or size == 0:
+                continue
+            if offset >= stop:
+                break
+
+            segment_start = max(start - offset, 0)
+            segment_stop = min(stop - offset, size)
+            if isinstance(source, ZipMember):
+                yield source.range(segment_start, segment_stop)
+            else:
+                yield source()[segment_start:segment_stop]
+
+    def iter_range(self, start: int, stop: int) -> Iterator[bytes]:
+        """Yields the bytes of the archive from start up to stop (excluded)"""
+        for part in self.iter_parts(start, stop):
+            if isinstance(part, FileRange):
+                yield from iter_file_range(*part)
+            else:
+                yield part
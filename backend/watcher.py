@@ -1,29 +1,71 @@
 import os
-from datetime import timedelta
+import threading
+import time
 
 from config import (
     ENABLE_RESCAN_ON_FILESYSTEM_CHANGE,
     LIBRARY_BASE_PATH,
     RESCAN_ON_FILESYSTEM_CHANGE_DELAY,
+    SCAN_TIMEOUT,
 )
 from config.config_manager import config_manager as cm
-from endpoints.sockets.scan import scan_platforms
+from endpoints.sockets.scan import scan_platforms, scan_roms
 from handler.database import db_platform_handler
+from handler.filesystem.base_handler import UPLOAD_PART_SUFFIX
+from handler.redis_handler import low_prio_queue
 from handler.scan_handler import ScanType
 from logger.logger import log
-from tasks.tasks import tasks_scheduler
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
-path = (
+high_prio_structure = os.path.exists(cm.get_config().HIGH_PRIO_STRUCTURE_PATH)
+path = os.path.normpath(
     cm.get_config().HIGH_PRIO_STRUCTURE_PATH
-    if os.path.exists(cm.get_config().HIGH_PRIO_STRUCTURE_PATH)
+    if high_prio_structure
     else LIBRARY_BASE_PATH
 )
 
+IGNORED_EVENT_TYPES = {"opened", "closed", "closed_no_write"}
+IGNORED_SUFFIXES = (".DS_Store", UPLOAD_PART_SUFFIX)
+
+
+def _parse_event_path(src_path: str) -> tuple[str, str | None] | None:
+    """Platform folder and rom an event path belongs to
+
+    Returns:
+        the platform fs_slug and the file name of the rom, which is None for
+        changes that aren't tied to a single rom, or None for paths to ignore
+    """
+    parts = os.path.relpath(src_path, path).split(os.sep)
+    if parts[0] in (os.curdir, os.pardir):
+        return None
+
+    fs_slug, *rom_parts = parts
+    if not high_prio_structure:
+        # Firmware and other folders of the platform get the platform scanned
+        if not rom_parts or rom_parts[0] != cm.get_config().ROMS_FOLDER_NAME:
+            return fs_slug, None
+        rom_parts = rom_parts[1:]
+
+    return fs_slug, rom_parts[0] if rom_parts else None
+
 
 class EventHandler(FileSystemEventHandler):
-    """Filesystem event handler"""
+    """Filesystem event handler
+
+    Events are only buffered, by platform and by rom, as a copy produces many of
+    them. Once a path is left alone for the rescan delay, flush() submits a
+    single scan job for the changes that settled down.
+    """
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+        self._lock = threading.Lock()
+        # Time of the last event of each pending change
+        self._full_rescan_at: float | None = None
+        self._platforms: dict[str, float] = {}
+        self._roms: dict[str, dict[str, float]] = {}
 
     def on_any_event(self, event):
         """Catch-all event handler.
@@ -34,52 +76,195 @@ class EventHandler(FileSystemEventHandler):
         if not ENABLE_RESCAN_ON_FILESYSTEM_CHANGE:
             return
 
-        # Ignore .DS_Store files
-        if event.src_path.endswith(".DS_Store"):
+        # Ignore some event types, new entries also change their parent folder
+        if event.event_type in IGNORED_EVENT_TYPES or (
+            event.event_type == "modified" and event.is_directory
+        ):
             return
 
-        # Ignore some event types
-        if event.event_type in ["modified", "opened", "closed"]:
-            return
+        # Moves are tracked on both ends
+        src_paths = [event.src_path]
+        if getattr(event, "dest_path", ""):
+            src_paths.append(event.dest_path)
 
-        event_src = event.src_path.split(path)[-1]
-        fs_slug = event_src.split("/")[1]
-        db_platform = db_platform_handler.get_platform_by_fs_slug(fs_slug)
+        now = time.monotonic()
+        with self._lock:
+            for src_path in src_paths:
+                if src_path.endswith(IGNORED_SUFFIXES):
+                    continue
 
-        log.info(f"Filesystem event: {event.event_type} {event_src}")
+                parsed_path = _parse_event_path(src_path)
+                if not parsed_path:
+                    continue
 
-        # Skip if a scan is already scheduled
-        for job in tasks_scheduler.get_jobs():
-            if job.func_name == "endpoints.scan.scan_platforms":
-                if job.args[0] == []:
-                    log.info("Full rescan already scheduled")
-                    return
+                fs_slug, file_name = parsed_path
+                if file_name and file_name.endswith(IGNORED_SUFFIXES):
+                    continue
+
+                # Any change to a platform directory should trigger a full rescan
+                is_platform_dir = os.path.dirname(os.path.normpath(src_path)) == path
+                if event.is_directory and is_platform_dir:
+                    self._full_rescan_at = now
+                elif file_name is None:
+                    self._platforms[fs_slug] = now
+                else:
+                    self._roms.setdefault(fs_slug, {})[file_name] = now
+
+    def flush(self) -> None:
+        """Submit the scans of the changes left alone for the whole delay
+
+        The changes are put back in the buffer if their scans can't be
+        submitted, so they're submitted again on the next flush.
+        """
+        settled_at = time.monotonic() - self.delay
 
-                if db_platform and db_platform.id in job.args[0]:
-                    log.info(f"Scan already scheduled for {fs_slug}")
+        platforms: dict[str, float]
+        roms: dict[str, dict[str, float]]
+        with self._lock:
+            full_rescan_at = self._full_rescan_at
+            if full_rescan_at is not None:
+                if full_rescan_at > settled_at:
                     return
 
-        time_delta = timedelta(minutes=RESCAN_ON_FILESYSTEM_CHANGE_DELAY)
-        rescan_in_msg = f"rescanning in {RESCAN_ON_FILESYSTEM_CHANGE_DELAY} minutes."
-
-        # Any change to a platform directory should trigger a full rescan
-        if event.is_directory and event_src.count("/") == 1:
-            log.info(f"Platform directory changed, {rescan_in_msg}")
-            tasks_scheduler.enqueue_in(time_delta, scan_platforms, [])
-        elif db_platform:
-            # Otherwise trigger a rescan for the specific platform
-            log.info(f"Change detected in {fs_slug} folder, {rescan_in_msg}")
-            return tasks_scheduler.enqueue_in(
-                time_delta,
+                # A full rescan covers every other change
+                platforms, roms = self._platforms, self._roms
+                self._full_rescan_at = None
+                self._platforms, self._roms = {}, {}
+            else:
+                platforms = {
+                    fs_slug: changed_at
+                    for fs_slug, changed_at in self._platforms.items()
+                    if changed_at <= settled_at
+                }
+                roms = {}
+                for fs_slug in platforms:
+                    del self._platforms[fs_slug]
+                    # A platform scan covers the changes to its roms
+                    if fs_slug in self._roms:
+                        roms[fs_slug] = self._roms.pop(fs_slug)
+
+                for fs_slug, changes in self._roms.items():
+                    settled_changes = {
+                        file_name: changed_at
+                        for file_name, changed_at in changes.items()
+                        if changed_at <= settled_at
+                    }
+                    for file_name in settled_changes:
+                        del changes[file_name]
+                    if settled_changes:
+                        roms[fs_slug] = settled_changes
+                self._roms = {
+                    fs_slug: changes
+                    for fs_slug, changes in self._roms.items()
+                    if changes
+                }
+
+        if full_rescan_at is None and not platforms and not roms:
+            return
+
+        try:
+            if full_rescan_at is not None:
+                self._enqueue_full_rescan()
+            else:
+                self._enqueue_scans(
+                    list(platforms),
+                    {
+                        fs_slug: sorted(changes)
+                        for fs_slug, changes in roms.items()
+                        if fs_slug not in platforms
+                    },
+                )
+        except Exception:
+            self._restore(full_rescan_at, platforms, roms)
+            raise
+
+    def _restore(
+        self,
+        full_rescan_at: float | None,
+        platforms: dict[str, float],
+        roms: dict[str, dict[str, float]],
+    ) -> None:
+        """Put back changes taken out of the buffer, keeping the newer events"""
+        with self._lock:
+            if full_rescan_at is not None and self._full_rescan_at is None:
+                self._full_rescan_at = full_rescan_at
+
+            for fs_slug, changed_at in platforms.items():
+                self._platforms.setdefault(fs_slug, changed_at)
+
+            for fs_slug, changes in roms.items():
+                pending_changes = self._roms.setdefault(fs_slug, {})
+                for file_name, changed_at in changes.items():
+                    pending_changes.setdefault(file_name, changed_at)
+
+    def _queued_platform_scans(self) -> list[list[int]]:
+        """Platform ids of the platform scans waiting to run"""
+        return [
+            job.args[0]
+            for job in low_prio_queue.get_jobs()
+            if job.func_name == "endpoints.sockets.scan.scan_platforms"
+        ]
+
+    def _enqueue_full_rescan(self) -> None:
+        if [] in self._queued_platform_scans():
+            log.info("Full rescan already scheduled")
+            return
+
+        log.info("Platform directory changed, rescanning all platforms")
+        low_prio_queue.enqueue(scan_platforms, [], job_timeout=SCAN_TIMEOUT)
+
+    def _enqueue_scans(
+        self, platforms: list[str], roms: dict[str, list[str]]
+    ) -> None:
+        queued_platform_scans = self._queued_platform_scans()
+        if [] in queued_platform_scans:
+            log.info("Full rescan already scheduled")
+            return
+
+        queued_platform_ids = {
+            platform_id
+            for platform_ids in queued_platform_scans
+            for platform_id in platform_ids
+        }
+
+        platform_ids = []
+        for fs_slug in platforms:
+            db_platform = db_platform_handler.get_platform_by_fs_slug(fs_slug)
+            if not db_platform:
+                continue
+            if db_platform.id in queued_platform_ids:
+                log.info(f"Scan already scheduled for {fs_slug}")
+                continue
+
+            log.info(f"Change detected in {fs_slug} folder, rescanning platform")
+            platform_ids.append(db_platform.id)
+
+        if platform_ids:
+            low_prio_queue.enqueue(
                 scan_platforms,
-                [db_platform.id],
-                scan_type=ScanType.QUICK,
+                platform_ids,
+                ScanType.QUICK,
+                job_timeout=SCAN_TIMEOUT,
+            )
+
+        for fs_slug, file_names in roms.items():
+            db_platform = db_platform_handler.get_platform_by_fs_slug(fs_slug)
+            if not db_platform:
+                continue
+            if db_platform.id in queued_platform_ids:
+                log.info(f"Scan already scheduled for {fs_slug}")
+                continue
+
+            log.info(f"{len(file_names)} roms changed in {fs_slug}, scanning them")
+            low_prio_queue.enqueue(
+                scan_roms, db_platform.id, file_names, job_timeout=SCAN_TIMEOUT
             )
 
 
 if __name__ == "__main__":
+    event_handler = EventHandler(delay=RESCAN_ON_FILESYSTEM_CHANGE_DELAY * 60)
     observer = Observer()
-    observer.schedule(EventHandler(), path, recursive=True)
+    observer.schedule(event_handler, path, recursive=True)
     observer.start()
 
     log.info(f"Watching {path} for changes")
@@ -87,6 +272,11 @@ if __name__ == "__main__":
     try:
         while observer.is_alive():
             observer.join(1)
+
+            try:
+                event_handler.flush()
+            except Exception as e:
+                log.error(f"Unable to schedule the rescan: {e}")
     finally:
         observer.stop()
         observer.join()
@@ -8,9 +8,51 @@ import socket from "@/services/socket";
 import storeDownload from "@/stores/download";
 import type { DetailedRom, SimpleRom } from "@/stores/roms";
 import { getDownloadLink } from "@/utils";
+import { isAxiosError } from "axios";
 
 export const romApi = api;
 
+// Size of the chunks sent by resumable uploads
+const UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024;
+const UPLOAD_CONCURRENCY = 3;
+
+async function uploadRom({
+  platformId,
+  rom,
+}: {
+  platformId: number;
+  rom: File;
+}): Promise<boolean> {
+  const url = `/roms/upload/${platformId}/${encodeURIComponent(rom.name)}`;
+
+  // Resumes from the bytes received by a previous attempt
+  let offset: number;
+  try {
+    const { headers } = await api.head(url);
+    offset = Number(headers["upload-offset"] ?? 0);
+  } catch (error) {
+    if (isAxiosError(error) && error.response?.status === 409) return false;
+    throw error;
+  }
+
+  do {
+    const { headers } = await api.patch(
+      url,
+      rom.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+      {
+        headers: {
+          "Content-Type": "application/offset+octet-stream",
+          "Upload-Offset": offset,
+          "Upload-Length": rom.size,
+        },
+      },
+    );
+    offset = Number(headers["upload-offset"]);
+  } while (offset < rom.size);
+
+  return true;
+}
+
 async function uploadRoms({
   platformId,
   romsToUpload,
@@ -18,15 +60,26 @@ async function uploadRoms({
   platformId: number;
   romsToUpload: File[];
 }): Promise<{ data: AddRomsResponse }> {
-  const formData = new FormData();
-  romsToUpload.forEach((rom) => formData.append("roms", rom));
-
-  return api.post("/roms", formData, {
-    headers: {
-      "Content-Type": "multipart/form-data",
-    },
-    params: { platform_id: platformId },
-  });
+  const data: AddRomsResponse = { uploaded_roms: [], skipped_roms: [] };
+  const queue = [...romsToUpload];
+
+  // A few files are uploaded at the same time, each one chunk after chunk
+  await Promise.all(
+    Array.from(
+      { length: Math.min(UPLOAD_CONCURRENCY, queue.length) },
+      async () => {
+        for (let rom = queue.shift(); rom; rom = queue.shift()) {
+          if (await uploadRom({ platformId, rom })) {
+            data.uploaded_roms.push(rom.name);
+          } else {
+            data.skipped_roms.push(rom.name);
+          }
+        }
+      },
+    ),
+  );
+
+  return { data };
 }
 
 async function getRoms({